@@ -26,9 +26,13 @@ class CSVResponder(Responder, Generic[ProcT]):
         proc = self.proc
         response.setContentType('text/x-csv; charset=UTF-8')
         response.setFileName(page.getFileName(proc))
+        # Exports can be large: send rows while they are being formatted.
+        response.startStreaming()
         sepChar = proc.args.sep.value
-        for row in page.iterRows(proc):
+        for index, row in enumerate(page.iterRows(proc), 1):
             response.write(sepChar.join(row) + '\r\n')
+            if index % 1000 == 0:
+                await response.returnToReactor()
 
 class CSVPage(FabResource['CSVPage.Arguments', ProcT]):
     authenticator = LoginAuthPage.instance
@@ -2,13 +2,14 @@
 
 from collections import defaultdict
 from typing import (
-    TYPE_CHECKING, Any, ClassVar, DefaultDict, Dict, Generic, Iterator,
-    Optional, Set, TypeVar
+    TYPE_CHECKING, Any, ClassVar, DefaultDict, Dict, Generic, Iterable,
+    Iterator, Optional, Set, TypeVar, Union
 )
 import logging
 
 from twisted.internet.defer import Deferred
 
+from softfab.databaselib import Database, DatabaseElem
 from softfab.datawidgets import DataTable, TableData
 from softfab.pageargs import ArgsT, PageArgs
 from softfab.projectlib import Project
@@ -147,6 +148,23 @@ class PageProcessor(Generic[ArgsT]):
         The default implementation of this method does nothing.
         '''
 
+    def getDependencies(self
+                        ) -> Optional[Iterable[Union[Database[Any],
+                                                     DatabaseElem]]]:
+        '''Returns the databases and records that the presentation of the
+        widgets of this page depends on, or None if that is not known.
+        This is called after argument parsing and before process(), so it
+        can only use the arguments and the user.
+        If the dependencies are known, a widget request is answered with
+        "304 Not Modified" if none of the dependencies changed since the
+        client last fetched that widget, without processing or presenting.
+        Time-dependent content, such as the duration of an unfinished job,
+        cannot be described by dependencies; return None if such content
+        is presented.
+        The default implementation returns None.
+        '''
+        return None
+
     def processTables(self) -> None:
         # While processing, perform a sanity check against multiple tables
         # using the same arguments.
@@ -1,7 +1,7 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from typing import (
-    AbstractSet, ClassVar, Iterator, Optional, Set, TypeVar, cast
+    AbstractSet, ClassVar, Iterable, Iterator, Optional, Set, TypeVar, cast
 )
 
 from softfab.Page import PageProcessor
@@ -12,7 +12,7 @@ from softfab.formlib import (
 from softfab.joblib import JobDB
 from softfab.pageargs import ArgsCorrected
 from softfab.pagelinks import ExecutionState, ReportArgs
-from softfab.querylib import CustomFilter, RecordFilter, SetFilter
+from softfab.querylib import CustomFilter, Record, RecordFilter, SetFilter
 from softfab.request import Request
 from softfab.timeview import formatTime
 from softfab.userlib import User, UserDB
@@ -57,6 +57,36 @@ def emptyToNone(values: AbstractSet[str]) -> AbstractSet[Optional[str]]:
     else:
         return values
 
+class CreateTimeFilter(RecordFilter[Record]):
+    '''Passes records that were created in the given time range.
+    Both bounds are inclusive; None means unbounded.
+    When filtering the full job database, the create time index is used
+    instead of checking every job.
+    '''
+
+    def __init__(self,
+                 minTime: Optional[int],
+                 maxTime: Optional[int],
+                 jobDB: JobDB
+                 ):
+        super().__init__()
+        self.__minTime = minTime
+        self.__maxTime = maxTime
+        self.__jobDB = jobDB
+
+    def __call__(self, records: Iterable[Record]) -> Iterable[Record]:
+        minTime = self.__minTime
+        maxTime = self.__maxTime
+        if records is self.__jobDB:
+            return cast(Iterable[Record],
+                        self.__jobDB.getCreatedBetween(minTime, maxTime))
+
+        def inRange(record: Record) -> bool:
+            createTime = cast(int, record['timestamp'])
+            return (minTime is None or minTime <= createTime) and \
+                   (maxTime is None or createTime <= maxTime)
+        return filter(inRange, records)
+
 ReportArgsT = TypeVar('ReportArgsT', bound=ReportArgs)
 
 class ReportProcessor(PageProcessor[ReportArgsT]):
@@ -96,22 +126,12 @@ class ReportProcessor(PageProcessor[ReportArgsT]):
         self.uiOwners = uiOwners
 
     def iterFilters(self) -> Iterator[RecordFilter]:
-        cTimeAboveInt = self.args.ctabove
-        cTimeBelowInt = self.args.ctbelow
-
-        if cTimeAboveInt is not None:
-            if cTimeBelowInt is not None:
-                yield CustomFilter(lambda record:
-                    cTimeAboveInt <= record['timestamp'] <= cTimeBelowInt
-                    )
-            else:
-                yield CustomFilter(lambda record:
-                    cTimeAboveInt <= record['timestamp']
-                    )
-        elif cTimeBelowInt is not None:
-            yield CustomFilter(lambda record:
-                record['timestamp'] <= cTimeBelowInt
-                )
+        cTimeAbove = self.args.ctabove
+        cTimeBelow = self.args.ctbelow
+        if cTimeAbove is not None or cTimeBelow is not None:
+            # This filter must come first, since it can only use the index
+            # when it is given the full job database.
+            yield CreateTimeFilter(cTimeAbove, cTimeBelow, self.jobDB)
 
         # TODO: These casts are lies.
         #       None is not Comparable and that is an issue while sorting;
@@ -1,62 +1,214 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from collections import defaultdict
 from time import localtime
-from typing import ClassVar, DefaultDict, Iterable, List, Optional
+from typing import (
+    ClassVar, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple,
+    cast
+)
+
+import attr
 
 from softfab.CSVPage import CSVPage
 from softfab.Page import PageProcessor
+from softfab.databaselib import RecordObserver
 from softfab.joblib import DateRangeMonitor, Job, JobDB, Task
 from softfab.pageargs import ArgsCorrected, IntArg, PageArgs, StrArg, dynamic
-from softfab.querylib import CustomFilter, runQuery
 from softfab.request import Request
-from softfab.timelib import getWeekNr, secondsPerDay, weekRange, weeksInYear
+from softfab.resultcode import ResultCode
+from softfab.taskview import getTaskStatus
+from softfab.timelib import (
+    getWeekNr, secondsPerDay, startOfWeek, weekRange, weeksInYear
+)
 from softfab.userlib import User
 
+decidedResults = frozenset((ResultCode.OK, ResultCode.WARNING, ResultCode.ERROR))
+"""Results that tell whether a task passed or failed."""
 
-def filterJobs(jobs: Iterable[Job],
-               beginWeek: int,
-               endWeek: int,
-               configFilter: Optional[str]
-               ) -> List[Job]:
-    '''Returns a new list containing those jobs from the given list
-    which match the configuration and time filter.
-    '''
-    query = []
+@attr.s(auto_attribs=True)
+class TaskStats:
+    """Summary of a group of tasks, as shown in one cell of the task matrix.
+    """
 
-    if configFilter:
-        def configMatches(job: Job) -> bool:
-            return job.configId == configFilter
-        query.append(CustomFilter(configMatches))
+    statusCounts: Dict[str, int] = attr.Factory(dict)
+    """Number of tasks for each task status."""
 
-    def timeMatches(job: Job) -> bool:
-        return beginWeek <= job.getCreateTime() < endWeek
-    query.append(CustomFilter(timeMatches))
+    latest: Optional[Tuple[int, ResultCode]] = None
+    """Start time and result of the most recently started task that has
+    a result in `decidedResults`.
+    """
 
-    return runQuery(query, jobs)
+    @classmethod
+    def combine(cls, statsList: Iterable['TaskStats']) -> 'TaskStats':
+        combined = cls()
+        for stats in statsList:
+            combined.addStats(stats)
+        return combined
 
-def groupTasks(jobs: Iterable[Job],
-               beginWeek: int
-               ) -> List[DefaultDict[str, List[Task]]]:
-    '''Returns a list with 7 entries, one for each day of the week.
-    Each entry is a dictionary with task name as key and a list of
-    corresponding tasks as the value.
-    '''
-    taskData: List[DefaultDict[str, List[Task]]] = [
-        defaultdict(list) for _ in range(7)
-        ]
+    @property
+    def count(self) -> int:
+        return sum(self.statusCounts.values())
+
+    @property
+    def latestResult(self) -> Optional[ResultCode]:
+        latest = self.latest
+        return None if latest is None else latest[1]
+
+    def addTask(self, task: Task) -> None:
+        statusCounts = self.statusCounts
+        status = getTaskStatus(task)
+        statusCounts[status] = statusCounts.get(status, 0) + 1
+        result = task.result
+        if result in decidedResults:
+            assert result is not None
+            startTime = cast(Optional[int], task['starttime'])
+            self.__addLatest((-1 if startTime is None else startTime, result))
+
+    def addStats(self, stats: 'TaskStats') -> None:
+        statusCounts = self.statusCounts
+        for status, count in stats.statusCounts.items():
+            statusCounts[status] = statusCounts.get(status, 0) + count
+        latest = stats.latest
+        if latest is not None:
+            self.__addLatest(latest)
+
+    def __addLatest(self, latest: Tuple[int, ResultCode]) -> None:
+        # Of tasks that started at the same time, the first one added wins.
+        current = self.latest
+        if current is None or latest[0] > current[0]:
+            self.latest = latest
+
+WeekData = Sequence[Mapping[str, TaskStats]]
+"""Task statistics for one week: for each day of the week, a mapping
+from task name to the statistics of the tasks with that name in jobs
+that were created on that day.
+"""
+
+def _newWeekData() -> List[Dict[str, TaskStats]]:
+    return [{} for _ in range(7)]
+
+def _addJob(weekData: List[Dict[str, TaskStats]],
+            beginWeek: int,
+            job: Job
+            ) -> None:
     # In the transition from summer time to winter time,
     # the week is 1 hour longer.
-    # By assigning the 7th day dictionary to the 8th day,
-    # tasks run in this extra hour are assigned to Sunday.
+    # By clipping the day index, tasks run in this extra hour are
+    # assigned to Sunday.
     # TODO: Is it OK to assume the extra hour is always on Sunday?
-    taskData.append(taskData[6])
-    for job in jobs:
-        taskDict = taskData[(job.getCreateTime() - beginWeek) // secondsPerDay]
-        for task in job.getTasks():
-            taskDict[task.getName()].append(task)
-    del taskData[7]
-    return taskData
+    day = min((job.getCreateTime() - beginWeek) // secondsPerDay, 6)
+    taskDict = weekData[day]
+    for task in job.getTasks():
+        name = task.getName()
+        stats = taskDict.get(name)
+        if stats is None:
+            stats = taskDict[name] = TaskStats()
+        stats.addTask(task)
+
+class _WeekStats:
+    """Task statistics for the jobs that were created in one week.
+
+    Jobs that have a final result will not change anymore, so their tasks
+    are aggregated once. Other jobs are aggregated when requested.
+    """
+
+    def __init__(self, jobDB: JobDB, beginWeek: int, endWeek: int):
+        super().__init__()
+        self.__beginWeek = beginWeek
+        self.__final: Dict[str, List[Dict[str, TaskStats]]] = {}
+        self.__pending: Set[str] = set()
+        for job in jobDB.getCreatedBetween(beginWeek, endWeek - 1):
+            self.add(job)
+
+    def add(self, job: Job) -> None:
+        if job.hasFinalResult():
+            self.__addFinal(job)
+        else:
+            self.__pending.add(job.getId())
+
+    def update(self, job: Job) -> None:
+        jobId = job.getId()
+        if jobId in self.__pending and job.hasFinalResult():
+            self.__pending.remove(jobId)
+            self.__addFinal(job)
+
+    def __addFinal(self, job: Job) -> None:
+        beginWeek = self.__beginWeek
+        final = self.__final
+        configId = job.configId
+        # The empty string is used for all configurations combined.
+        for key in ('', configId) if configId else ('',):
+            weekData = final.get(key)
+            if weekData is None:
+                weekData = final[key] = _newWeekData()
+            _addJob(weekData, beginWeek, job)
+
+    def getWeekData(self, jobDB: JobDB, configFilter: str) -> WeekData:
+        """Returns the task statistics for the jobs created from the given
+        configuration, or from any configuration if the filter is empty.
+        """
+        finalData = self.__final.get(configFilter)
+        pendingData = _newWeekData()
+        beginWeek = self.__beginWeek
+        for jobId in self.__pending:
+            job = jobDB[jobId]
+            if not configFilter or job.configId == configFilter:
+                _addJob(pendingData, beginWeek, job)
+        if finalData is None:
+            return pendingData
+        weekData: List[Mapping[str, TaskStats]] = []
+        for finalDict, pendingDict in zip(finalData, pendingData):
+            if pendingDict:
+                # Combine into new objects, to leave the stored ones intact.
+                taskDict = dict(finalDict)
+                for name, stats in pendingDict.items():
+                    finalStats = finalDict.get(name)
+                    if finalStats is not None:
+                        stats.addStats(finalStats)
+                    taskDict[name] = stats
+                weekData.append(taskDict)
+            else:
+                weekData.append(finalDict)
+        return weekData
+
+class WeeklyTaskStats(RecordObserver[Job]):
+    """Keeps task statistics per week, for the task matrix.
+
+    The statistics of a week are computed when they are first requested
+    and from then on updated when jobs are added or finish.
+    """
+
+    def __init__(self, jobDB: JobDB):
+        super().__init__()
+        self.__jobDB = jobDB
+        self.__weeks: Dict[int, _WeekStats] = {}
+        jobDB.addObserver(self)
+
+    def getWeekData(self,
+                    beginWeek: int,
+                    endWeek: int,
+                    configFilter: str
+                    ) -> WeekData:
+        """Returns the task statistics for jobs created in the given week,
+        filtered by configuration ID if `configFilter` is not empty.
+        """
+        week = self.__weeks.get(beginWeek)
+        if week is None:
+            week = _WeekStats(self.__jobDB, beginWeek, endWeek)
+            self.__weeks[beginWeek] = week
+        return week.getWeekData(self.__jobDB, configFilter)
+
+    def added(self, record: Job) -> None:
+        week = self.__weeks.get(startOfWeek(record.getCreateTime()))
+        if week is not None:
+            week.add(record)
+
+    def removed(self, record: Job) -> None:
+        assert False, 'jobs should not be removed'
+
+    def updated(self, record: Job) -> None:
+        week = self.__weeks.get(startOfWeek(record.getCreateTime()))
+        if week is not None:
+            week.update(record)
 
 class TaskMatrixArgs(PageArgs):
     '''The filters used in the task matrix (HTML and CSV version).
@@ -72,6 +224,7 @@ class TaskMatrixProcessor(PageProcessor[TaskMatrixArgs]):
 
     jobDB: ClassVar[JobDB]
     dateRange: ClassVar[DateRangeMonitor]
+    weeklyTaskStats: ClassVar[WeeklyTaskStats]
 
     async def process(self, req: Request[TaskMatrixArgs], user: User) -> None:
         # TODO: It would be useful to have these as method arguments.
@@ -104,7 +257,6 @@ class TaskMatrixProcessor(PageProcessor[TaskMatrixArgs]):
         # pylint: disable=attribute-defined-outside-init
         self.beginWeek = beginWeek
         self.endWeek = endWeek
-        self.taskData = groupTasks(
-            filterJobs(self.jobDB, beginWeek, endWeek, req.args.config),
-            beginWeek
+        self.taskData = self.weeklyTaskStats.getWeekData(
+            beginWeek, endWeek, req.args.config
             )
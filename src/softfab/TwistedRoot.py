@@ -16,6 +16,7 @@ from softfab import static
 from softfab.Page import FabResource, PageProcessor, Responder
 from softfab.SplashPage import SplashPage, startupMessages
 from softfab.StyleResources import styleRoot
+from softfab.TaskMatrixCommon import WeeklyTaskStats
 from softfab.TwistedUtil import PageRedirect
 from softfab.UIPage import UIResponder
 from softfab.artifacts import populateArtifacts
@@ -24,19 +25,26 @@ from softfab.compat import importlib_resources
 from softfab.configlib import ConfigDB
 from softfab.databaselib import Database, SingletonWrapper
 from softfab.databases import initDatabases, injectDependencies
+from softfab.dispatcher import Dispatcher
 from softfab.docserve import DocPage, DocResource
 from softfab.joblib import (
-    DateRangeMonitor, JobDB, ResultlessJobs, TaskToJobs, UnfinishedJobs
+    DateRangeMonitor, JobDB, RecentJobs, ResultlessJobs, TaskToJobs,
+    UnfinishedJobs
 )
 from softfab.jobview import JobNotificationObserver
 from softfab.newapi import APIRoot
 from softfab.pageargs import PageArgs
 from softfab.projectlib import Project, ProjectDB, TimezoneUpdater
+from softfab.querylib import TrigramIndex
 from softfab.render import NotFoundPage, renderAuthenticated
-from softfab.resourcelib import ResourceDB, TaskRunnerTokenProvider
+from softfab.resourcelib import (
+    RepositoryLocatorIndex, ResourceDB, TaskRunnerMonitor,
+    TaskRunnerTokenProvider
+)
 from softfab.resultlib import ResultStorage
 from softfab.schedulelib import ScheduleDB, ScheduleManager
 from softfab.selectlib import ObservingTagCache
+from softfab.taskrunlib import TaskRunDB, TaskRunsByRunner
 from softfab.tokens import TokenDB
 from softfab.userlib import User
 from softfab.utils import iterModules
@@ -267,6 +275,8 @@ class SoftFabRoot(Resource):
             await preload(databases.values())
 
             jobDB = cast(JobDB, databases['jobDB'])
+            unfinishedJobs = UnfinishedJobs(jobDB)
+            dispatcher = Dispatcher(resourceDB, unfinishedJobs, self.reactor)
             # TODO: resultStorage and artifactsPath were already injected into
             #       factories by initDatabases(), but we have to construct them
             #       again to inject into pages.
@@ -277,8 +287,16 @@ class SoftFabRoot(Resource):
                 resultStorage=ResultStorage(self.dbDir / 'results'),
                 artifactsPath=self.dbDir / 'artifacts',
                 dateRange=DateRangeMonitor(jobDB),
-                unfinishedJobs=UnfinishedJobs(jobDB),
-                taskToJobs=TaskToJobs(jobDB)
+                jobDescriptions=TrigramIndex(jobDB, 'description'),
+                recentJobs=RecentJobs(jobDB),
+                unfinishedJobs=unfinishedJobs,
+                dispatcher=dispatcher,
+                repoLocators=RepositoryLocatorIndex(resourceDB),
+                taskToJobs=TaskToJobs(jobDB),
+                taskRunsByRunner=TaskRunsByRunner(
+                    cast(TaskRunDB, databases['taskRunDB'])
+                    ),
+                weeklyTaskStats=WeeklyTaskStats(jobDB)
                 )
 
             resultlessJobs = ResultlessJobs(jobDB)
@@ -299,6 +317,10 @@ class SoftFabRoot(Resource):
             reactor = self.reactor
             if reactor is not None:
                 ScheduleManager(configDB, jobDB, scheduleDB, reactor).trigger()
+                TaskRunnerMonitor(resourceDB, reactor).start()
+
+            # Start assigning tasks to Task Runners.
+            dispatcher.start()
         except Exception:
             startupLogger.exception('Error during startup:')
             # Try to run the part of the Control Center that did start up
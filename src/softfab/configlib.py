@@ -634,6 +634,11 @@ class ConfigDB(Database[Config]):
         super().__init__(baseDir, ConfigFactory())
 
     def iterConfigsByTag(self, key: str, value: str) -> Iterator[Config]:
-        for config in self:
-            if config.tags.hasTagValue(key, value):
-                yield config
+        tagCache = cast(Optional[TagCache], self.tagCache)
+        if tagCache is None:
+            for config in self:
+                if config.tags.hasTagValue(key, value):
+                    yield config
+        else:
+            for configId in tuple(tagCache.getRecordIds(key, value)):
+                yield self[configId]
@@ -4,9 +4,9 @@ from abc import ABC
 from operator import itemgetter
 from pathlib import Path
 from typing import (
-    TYPE_CHECKING, Callable, ClassVar, Dict, FrozenSet, Generic, Iterable,
-    Iterator, KeysView, List, Mapping, Optional, Sequence, Set, Tuple, TypeVar,
-    cast
+    TYPE_CHECKING, Callable, ClassVar, Collection, Dict, FrozenSet, Generic,
+    Iterable, Iterator, KeysView, List, Mapping, Optional, Sequence, Set, Tuple,
+    TypeVar, cast
 )
 import logging
 import os
@@ -47,6 +47,12 @@ class DatabaseElem:
     '''Abstract base class for database elements.
     '''
 
+    changeCount = 0
+    '''Value of the change counter of the database when this record was
+    last added or updated, or 0 if it was not changed since the database
+    was loaded.
+    '''
+
     def __init__(self: DBRecord) -> None:
         super().__init__()
         self.__observers: List[Callable[[DBRecord], None]] = []
@@ -159,6 +165,14 @@ class RecordObserver(Generic[DBRecord]):
         '''
         raise NotImplementedError
 
+    def addedMany(self, records: Sequence[DBRecord]) -> None:
+        '''Called when multiple new records were added to a table at once.
+        The default implementation calls added() for each record; override
+        it if the batch can be handled more efficiently as a whole.
+        '''
+        for record in records:
+            self.added(record)
+
 class RecordSubjectMixin(Generic[DBRecord]):
 
     def __init__(self) -> None:
@@ -169,6 +183,10 @@ class RecordSubjectMixin(Generic[DBRecord]):
         for observer in self._observers:
             observer.added(record)
 
+    def _notifyAddedMany(self, records: Sequence[DBRecord]) -> None:
+        for observer in self._observers:
+            observer.addedMany(records)
+
     def _notifyRemoved(self, record: DBRecord) -> None:
         for observer in self._observers:
             observer.removed(record)
@@ -226,6 +244,12 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
     """Contains optimized value retriever functions for certain column keys.
     """
 
+    volatileKeys: ClassVar[Collection[str]] = ()
+    """Column keys for which the value can change without the record being
+    updated in the database, for example because it depends on the current
+    time. Values for these keys must not be cached.
+    """
+
     __reKey = re.compile('^[@A-Za-z0-9+_-][@A-Za-z0-9.+_ -]*$')
     """Regular expression with defines all valid database keys."""
 
@@ -254,6 +278,15 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
         self.tagCache: Optional[TagCache] = None
         """Tracks the tagging of records in this database."""
 
+        self.writeCount = 0
+        """Number of records written to disk since this database was
+        created."""
+
+        self.changeCount = 0
+        """Number of times records were added, removed or updated since
+        this database was created.
+        This can be used to cheaply detect whether anything changed."""
+
         self._cache: Dict[str, DBRecord] = {}
         self.__uniqueValuesFor: Dict[str, Set[object]] = {
             key: set() for key in self.cachedUniqueValues
@@ -274,6 +307,26 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
     def __contains__(self, key: object) -> bool:
         return key in self._cache
 
+    def _notifyAdded(self, record: DBRecord) -> None:
+        self.changeCount += 1
+        record.changeCount = self.changeCount
+        super()._notifyAdded(record)
+
+    def _notifyAddedMany(self, records: Sequence[DBRecord]) -> None:
+        self.changeCount += 1
+        for record in records:
+            record.changeCount = self.changeCount
+        super()._notifyAddedMany(records)
+
+    def _notifyRemoved(self, record: DBRecord) -> None:
+        self.changeCount += 1
+        super()._notifyRemoved(record)
+
+    def _notifyUpdated(self, record: DBRecord) -> None:
+        self.changeCount += 1
+        record.changeCount = self.changeCount
+        super()._notifyUpdated(record)
+
     @cachedProperty
     def name(self) -> str:
         """Unique identifier for this database, derived from baseDir."""
@@ -302,13 +355,25 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
         assert self.get(value.getId()) is value, value.getId()
         self.update(value)
 
+    def _removeFiles(self, key: str) -> None:
+        """Removes the files that store the record with the given key."""
+        os.remove(self._fileNameForKey(key))
+
     def _write(self, key: str, value: DBRecord) -> None:
+        self.writeCount += 1
         path = Path(self._fileNameForKey(key))
         with atomicWrite(path, 'wb', fsync=dbAtomicWrites) as out:
             out.write(
                 value.toXML().flattenXML().encode('ascii', 'xmlcharrefreplace')
                 )
 
+    def _writeUpdate(self, key: str, value: DBRecord) -> None:
+        """Stores a new version of an existing record.
+        The default implementation rewrites the entire record; subclasses
+        can override this to store only the parts that changed.
+        """
+        self._write(key, value)
+
     def get(self, key: str) -> Optional[DBRecord]:
         if key in self._cache:
             return self[key]
@@ -398,16 +463,47 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
         If the added record has the same ID as an existing record,
         KeyError is raised.
         """
+        self._checkNew((value,))
+        self._insert(value)
+
+        # Tell observers.
+        self._notifyAdded(value)
+
+    def addMany(self, values: Sequence[DBRecord]) -> None:
+        """Adds multiple records to this database.
+        The IDs of all records are checked before any record is written,
+        so if KeyError is raised for the same reasons as in add(), none of
+        the records are added.
+        Observers are notified once about the entire batch, which is
+        a lot cheaper than notifying them about every record separately.
+        """
+        self._checkNew(values)
+        for value in values:
+            self._insert(value)
+
+        # Tell observers.
+        if values:
+            self._notifyAddedMany(values)
+
+    def _checkNew(self, values: Iterable[DBRecord]) -> None:
+        """Raises KeyError if any of the given records cannot be added,
+        because its ID is invalid or is already in use.
+        """
+        keys: Set[str] = set()
+        for value in values:
+            key = value.getId()
+            self.checkId(key)
+            if key in keys or self.get(key) is not None:
+                raise KeyError(f'duplicate ID "{key}"')
+            keys.add(key)
+
+    def _insert(self, value: DBRecord) -> None:
+        """Writes and registers a new record that was checked by _checkNew().
+        """
         key = value.getId()
-        self.checkId(key)
-        if self.get(key) is not None:
-            raise KeyError(f'duplicate ID "{key}"')
         self._write(key, value)
         self._register(key, value)
-
-        # Tell observers.
         _changeLogger.info('datachange/%s/add/%s', self.name, key)
-        self._notifyAdded(value)
 
     def remove(self, value: DBRecord) -> None:
         """Removes record from this database.
@@ -418,7 +514,7 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
         # Do lookup from cache first, to trigger KeyError for non-existing IDs.
         cachedValue = self._cache[key]
 
-        os.remove(self._fileNameForKey(key))
+        self._removeFiles(key)
         if cachedValue is None:
             # Not registered yet.
             del self._cache[key]
@@ -444,7 +540,7 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
             raise KeyError(f'unknown ID "{key}"')
 
         # Store new version in database.
-        self._write(key, value)
+        self._writeUpdate(key, value)
         if oldValue is not value:
              # pylint: disable=protected-access
             self._unregister(key, oldValue)
@@ -506,13 +602,12 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
         failedRecordCount = 0
         for key in keys:
             try:
-                value = cast(DBRecord,
-                             parse(self.factory, self._fileNameForKey(key)))
+                value = self._parseRecord(key)
                 self._register(key, value)
             except ObsoleteRecordError:
                 if migrationInProgress:
                     logging.warning('Removing obsolete record: %s', key)
-                    os.remove(self._fileNameForKey(key))
+                    self._removeFiles(key)
                 else:
                     if failedRecordCount < 3:
                         logger.warning(
@@ -541,6 +636,13 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
             yield
             tagCache._refreshCache() # pylint: disable=protected-access
 
+    def _parseRecord(self, key: str) -> DBRecord:
+        """Parses the stored record with the given key.
+        Subclasses can override this to combine the record with data that
+        is stored outside of its XML file.
+        """
+        return cast(DBRecord, parse(self.factory, self._fileNameForKey(key)))
+
     def convert(self) -> None:
         '''Converts the XML files that store this database's data to a new
         XML format.
@@ -562,7 +664,7 @@ class Database(Generic[DBRecord], RecordSubjectMixin[DBRecord], ABC):
                 except ObsoleteRecordError:
                     logging.warning('Removing obsolete record: %s', key)
                     del self._cache[key]
-                    os.remove(self._fileNameForKey(key))
+                    self._removeFiles(key)
                 else:
                     try:
                         self._write(key, value)
@@ -686,11 +788,8 @@ class VersionedDatabase(Database[DBRecord]):
             for key, versionedKey in self.__latestVersionOf.items()
             )
 
-    def add(self, value: DBRecord) -> None:
+    def _insert(self, value: DBRecord) -> None:
         key = value.getId()
-        self.checkId(key)
-        if key in self.__latestVersionOf:
-            raise KeyError(f'duplicate ID "{key}"')
 
         # Determine latest existing version.
         latest = self.__removedRecords.get(key)
@@ -704,10 +803,7 @@ class VersionedDatabase(Database[DBRecord]):
         if resurrected:
             del self.__removedRecords[key]
             os.remove(self._fileNameForRemovedKey(key))
-
-        # Tell observers.
         _changeLogger.info('datachange/%s/add/%s', self.name, versionedKey)
-        self._notifyAdded(value)
 
     def remove(self, value: DBRecord) -> None:
         key = value.getId()
@@ -1,21 +1,26 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from collections.abc import Sized as SizedABC
+from collections.abc import Sequence as SequenceABC, Sized as SizedABC
+from functools import partial
+from itertools import islice
 from operator import itemgetter
 from typing import (
-    TYPE_CHECKING, Any, Callable, ClassVar, Dict, Generic, Iterable, Iterator,
-    List, Mapping, Optional, Sequence, Tuple, Union, cast
+    TYPE_CHECKING, Any, Callable, ClassVar, Collection, Dict, Generic, Hashable,
+    Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union, cast
 )
 
+from softfab.config import rowCacheSize, sortCacheSize
 from softfab.databaselib import DBRecord, Database, Retriever
 from softfab.pageargs import ArgsCorrected
 from softfab.querylib import (
-    KeySorter, Record, RecordFilter, RecordProcessor, runQuery,
-    substMissingForNone
+    KeySorter, Record, RecordFilter, RecordProcessor, SortedOrderCache,
+    runQuery
 )
 from softfab.timeview import formatDuration, formatTime
 from softfab.utils import Comparable, abstract, escapeURL, pluralize
-from softfab.webgui import Column, Table, cell, pageLink, pageURL, row
+from softfab.webgui import (
+    CachedRow, Column, FragmentCache, Table, cell, pageLink, pageURL, row
+)
 from softfab.xmlgen import XMLContent, XMLNode, XMLSubscriptable, xhtml
 
 if TYPE_CHECKING:
@@ -192,6 +197,7 @@ class TableData(Generic[Record]):
             unfilteredNrRecords = None
 
         sortField = table.sortField
+        sorter: Optional[KeySorter[Record]] = None
         if sortField is None:
             # We don't know if getRecordsToQuery() has filtered or not.
             filtered = None
@@ -212,7 +218,7 @@ class TableData(Generic[Record]):
             query: List[RecordProcessor] = list(table.iterFilters(proc))
             filtered = bool(query)
             keyMap = _buildKeyMap(columns, proc)
-            sortKeys = (keyMap.get(key, key) for key in cleanSortOrder)
+            sortKeys = [keyMap.get(key, key) for key in cleanSortOrder]
             # TODO: Maybe we should have a class (RecordCollection?) for
             #       records that are not DBRecords or to keep track of
             #       a subset of a full DB. Then 'uniqueKeys' could be moved
@@ -226,22 +232,51 @@ class TableData(Generic[Record]):
                 assert table.uniqueKeys is None, "table's uniqueKeys is ignored"
                 uniqueKeys = db.uniqueKeys
             retrievers: List[Retriever[Record, Comparable]] = []
+            keyNames: Optional[List[str]] = []
             for key in sortKeys:
                 if callable(key):
-                    retrievers.append(substMissingForNone(key))
+                    retrievers.append(key)
+                    keyNames = None
                 else:
-                    retrievers.append(substMissingForNone(getRetriever(key)))
+                    retrievers.append(getRetriever(key))
+                    if keyNames is not None:
+                        keyNames.append(key)
                     if key in uniqueKeys:
                         break
             else:
                 retrievers.append(cast(Callable[[Record], Comparable],
                                        lambda record: record))
-            query.append(KeySorter(retrievers))
-            records = runQuery(query, records)
+            presorted: Optional[Collection[Record]] = None
+            # Filters may use an index when they are given the full database,
+            # after which selecting the visible page of the filtered records
+            # is cheap. So presorted records are only used when unfiltered.
+            if not query and sortKeys:
+                firstKey = sortKeys[0]
+                if isinstance(firstKey, str) and firstKey in uniqueKeys:
+                    # The order is fully determined by the first key.
+                    presorted = table.getPresortedRecords(proc, firstKey)
+            if presorted is None and db is not None and records is db \
+                    and keyNames:
+                # Sorting a full database on its own keys: the sorted
+                # order might be cached.
+                if query:
+                    rankRetriever = sortCache.getRankRetriever(db, keyNames)
+                    if rankRetriever is not None:
+                        retrievers = [rankRetriever]
+                else:
+                    presorted = sortCache.get(db, keyNames)
+            if presorted is None:
+                sorter = KeySorter(retrievers)
+                records = runQuery(query, records)
+            else:
+                records = presorted
 
         totalNrRecords = len(records)
         tabOffsetField = table.tabOffsetField
-        if tabOffsetField is not None:
+        if tabOffsetField is None:
+            first = 0
+            last: Optional[int] = None
+        else:
             tabOffset: int = getattr(proc.args, tabOffsetField)
             recordsPerPage = table.recordsPerPage
             if tabOffset < 0:
@@ -261,7 +296,22 @@ class TableData(Generic[Record]):
                 raise ArgsCorrected(proc.args.override(
                     **{ tabOffsetField: newOffset }
                     ))
-            records = records[tabOffset : tabOffset + table.recordsPerPage]
+            first = tabOffset
+            last = tabOffset + recordsPerPage
+
+        # Only sort as far as the last record we are going to show,
+        # so the cost depends on the offset instead of the total number
+        # of records.
+        if sorter is not None:
+            if last is None:
+                records = sorter(records)
+            else:
+                records = sorter.select(records, last)
+        if isinstance(records, SequenceABC) and not isinstance(records, list):
+            # Sequences can skip directly to the first record on the page.
+            records = list(records[first:last])
+        elif last is not None or not isinstance(records, list):
+            records = list(islice(records, first, last))
 
         objectName = table.objectName
         if objectName is None:
@@ -298,6 +348,14 @@ class TableData(Generic[Record]):
                 cleanSortOrder.append(key)
         return tuple(cleanSortOrder)
 
+sortCache = SortedOrderCache(sortCacheSize)
+"""Sorted orders of databases that can be reused between requests."""
+
+rowCache = FragmentCache(rowCacheSize)
+"""Presentations of data table rows that can be reused between requests.
+See `DataTable.getRowCacheKey()`.
+"""
+
 def _buildKeyMap(columns: Iterable[DataColumn[Record]],
                  proc: PageProcessor
                  ) -> Mapping[str, Union[str, Retriever[Record, Comparable]]]:
@@ -368,6 +426,20 @@ class DataTable(Table, Generic[Record]):
         assert dbName is not None
         return getattr(proc, dbName)
 
+    def getPresortedRecords(self,
+                            proc: PageProcessor, # pylint: disable=unused-argument
+                            key: str # pylint: disable=unused-argument
+                            ) -> Optional[Collection[Record]]:
+        '''Returns the initial record set already sorted on the given key,
+        or None if no such sorted collection is readily available.
+        This is only called for keys that are unique, so the returned order
+        is the complete sort order. Tables that show large databases can
+        override this to avoid sorting all records on every request.
+        The returned collection must contain the same records as the one
+        returned by getRecordsToQuery().
+        '''
+        return None
+
     def iterFilters(self,
                     proc: PageProcessor
                     ) -> Iterator[RecordFilter[Record]]:
@@ -404,17 +476,61 @@ class DataTable(Table, Generic[Record]):
         '''
         return iter(())
 
+    def getRowCacheKey(self,
+                       record: Record,
+                       **kwargs: object
+                       ) -> Optional[Hashable]:
+        '''Returns a key that identifies the presentation of the row for
+        the given record, or None if that row should not be cached.
+        The key must change whenever the presentation of the row changes,
+        so it should contain the record ID and version plus any state
+        outside the record that is presented in the row. The table, its
+        columns and the URLs used by the page are added to the key by
+        the caller.
+        Rows that contain time-dependent content, such as the duration
+        of something that is still running, or that are styled depending
+        on the row number should not be cached.
+        Note that the columns are compared by identity, so tables that
+        use row caching should not create new column objects per request.
+        The default implementation returns None.
+        '''
+        return None
+
     def iterRows(self, **kwargs: object) -> Iterator[XMLContent]:
         data = cast(TableData[Record], kwargs['data'])
         columns = data.columns
-        for rowNr, record in enumerate(data.records):
-            style = self.joinStyles(
-                self.iterRowStyles(rowNr, record, **kwargs)
+        cacheRows = rowCache.maxEntries > 0
+        if cacheRows:
+            proc = cast(PageProcessor, kwargs['proc'])
+            project = getattr(proc, 'project', None)
+            tableKey = (
+                self.__class__, tuple(columns),
+                kwargs.get('ccURL'), kwargs.get('styleURL'),
+                # Project settings such as the time zone affect presentation.
+                None if project is None else project.changeCount
                 )
-            yield row(class_ = style)[(
-                column.presentCell(record, **kwargs)
-                for column in columns
-                )]
+        for rowNr, record in enumerate(data.records):
+            presentRow = partial(self.__presentRow, rowNr, record, **kwargs)
+            rowKey = self.getRowCacheKey(record, **kwargs) \
+                     if cacheRows else None
+            if rowKey is None:
+                yield presentRow()
+            else:
+                yield CachedRow(presentRow, rowCache, (tableKey, rowKey))
+
+    def __presentRow(self,
+                     rowNr: int,
+                     record: Record,
+                     **kwargs: object
+                     ) -> XMLContent:
+        columns = cast(TableData[Record], kwargs['data']).columns
+        style = self.joinStyles(
+            self.iterRowStyles(rowNr, record, **kwargs)
+            )
+        return row(class_ = style)[(
+            column.presentCell(record, **kwargs)
+            for column in columns
+            )]
 
     def __presentNrRecords(self, data: TableData[Record]) -> XMLContent:
         '''Generate a piece of text displaying the total record count.
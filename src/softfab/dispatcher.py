@@ -0,0 +1,223 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Assignment of waiting tasks to idle Task Runners.
+
+Instead of searching for work inside every Task Runner's sync request,
+the dispatcher periodically, and whenever the set of unfinished jobs
+changes, runs a dispatch cycle: one pass over the unfinished jobs that
+assigns work to all idle Task Runners at once. The assigned runs are
+staged on the Task Runners and handed over on their next sync.
+"""
+
+from time import perf_counter
+from typing import AbstractSet, List, Optional, Tuple
+
+from twisted.internet.interfaces import IDelayedCall, IReactorTime
+import attr
+
+from softfab.connection import ConnectionStatus
+from softfab.databaselib import RecordObserver
+from softfab.joblib import Job, UnfinishedJobs
+from softfab.resourcelib import ResourceDB, TaskRunner
+from softfab.taskrunlib import TaskRun
+
+
+def assignExecutionRun(taskRunner: TaskRunner,
+                       unfinishedJobs: UnfinishedJobs
+                       ) -> Optional[TaskRun]:
+    # Find oldest unassigned task.
+    capabilities = taskRunner.capabilities
+    # TODO: It would be more efficient to keep non-fixed tasks instead of
+    #       jobs, but the code for that would be more complex.
+    for job in unfinishedJobs:
+        # Note that we will accept capabilities that were targets earlier
+        # but are no longer marked as targets. This is deliberate, to match
+        # the "reason for waiting" logic.
+        target = job.getTarget()
+        if target is None or target in capabilities:
+            # Try to assign this job, might fail for various
+            # reasons, such as:
+            # - all tasks done
+            # - dependencies not ready yet
+            # - not enough resources are available
+            # - capabilities do not match
+            newRun = job.assignTask(taskRunner)
+            if newRun:
+                return newRun
+    return None
+
+def isIdle(taskRunner: TaskRunner) -> bool:
+    """Returns True iff the given Task Runner is connected and available
+    to accept a new execution run.
+    """
+    return (
+        not taskRunner.isReserved()
+        and not taskRunner.isSuspended()
+        and not taskRunner.shouldExit()
+        and taskRunner.getConnectionStatus() is ConnectionStatus.CONNECTED
+        )
+
+@attr.s(auto_attribs=True)
+class DispatchStats:
+    """Measurements of the dispatch cycles performed so far.
+    Durations are in seconds.
+    """
+
+    cycles: int = 0
+    assigned: int = 0
+    lastDuration: float = 0.0
+    maxDuration: float = 0.0
+    totalDuration: float = 0.0
+
+    def record(self, duration: float, assigned: int) -> None:
+        self.cycles += 1
+        self.assigned += assigned
+        self.lastDuration = duration
+        self.maxDuration = max(self.maxDuration, duration)
+        self.totalDuration += duration
+
+class Dispatcher(RecordObserver[Job]):
+    """Assigns waiting tasks to idle Task Runners in dispatch cycles.
+
+    Without a reactor, no dispatch cycles are scheduled and every Task Runner
+    searches for work on its own when it syncs.
+    """
+
+    interval = 5
+    """Number of seconds between periodic dispatch cycles."""
+
+    def __init__(self,
+                 resourceDB: ResourceDB,
+                 unfinishedJobs: UnfinishedJobs,
+                 reactor: Optional[IReactorTime]
+                 ):
+        super().__init__()
+        self.__resourceDB = resourceDB
+        self.__unfinishedJobs = unfinishedJobs
+        self.__reactor = reactor
+        self.__pendingCall: Optional[IDelayedCall] = None
+        self.__dispatching = False
+        self.__considered: AbstractSet[str] = frozenset()
+        """IDs of the Task Runners that were idle during the last cycle."""
+        self.stats = DispatchStats()
+
+        unfinishedJobs.addObserver(self)
+
+    def start(self) -> None:
+        """Starts periodic dispatch cycles.
+        """
+        reactor = self.__reactor
+        if reactor is not None:
+            reactor.callLater(self.interval, self.__periodic)
+
+    def __periodic(self) -> None:
+        reactor = self.__reactor
+        assert reactor is not None
+        try:
+            self.dispatch()
+        finally:
+            reactor.callLater(self.interval, self.__periodic)
+
+    def trigger(self) -> None:
+        """Requests a dispatch cycle as soon as possible.
+        Multiple requests made before the cycle runs are combined.
+        """
+        reactor = self.__reactor
+        if reactor is not None and self.__pendingCall is None \
+                and not self.__dispatching:
+            self.__pendingCall = reactor.callLater(0, self.__triggered)
+
+    def __triggered(self) -> None:
+        self.__pendingCall = None
+        self.dispatch()
+
+    def dispatch(self) -> int:
+        """Performs a dispatch cycle: assigns work to as many idle
+        Task Runners as possible, in a single pass over the unfinished jobs.
+        Returns the number of runs that were assigned.
+        """
+        start = perf_counter()
+        # Prefer the Task Runners with the fewest capabilities, to keep
+        # the more versatile ones available for tasks only they can run.
+        idle: List[TaskRunner] = sorted(
+            (runner
+             for runner in self.__resourceDB.iterTaskRunners()
+             if isIdle(runner)),
+            key=lambda runner: (runner.cost, runner.getId())
+            )
+        self.__considered = frozenset(runner.getId() for runner in idle)
+
+        assigned = 0
+        self.__dispatching = True
+        try:
+            for job in self.__unfinishedJobs:
+                if not idle:
+                    break
+                target = job.getTarget()
+                remaining = []
+                for runner in idle:
+                    # Note that we will accept capabilities that were targets
+                    # earlier but are no longer marked as targets.
+                    # This is deliberate, to match the "reason for waiting"
+                    # logic.
+                    if (target is None or target in runner.capabilities) \
+                            and runner.stageRun(job) is not None:
+                        assigned += 1
+                    else:
+                        remaining.append(runner)
+                idle = remaining
+        finally:
+            self.__dispatching = False
+
+        self.stats.record(perf_counter() - start, assigned)
+        return assigned
+
+    def assignOnSync(self, taskRunner: TaskRunner) -> Optional[TaskRun]:
+        """Called when an idle Task Runner syncs and no run was staged for it.
+        Returns a run assigned to the Task Runner, or None if there is no
+        work for it.
+        If dispatch cycles are active, an immediate cycle is performed only
+        if this Task Runner was not considered in the last cycle, since
+        otherwise that cycle already concluded there is no work for it.
+        """
+        if self.__reactor is None:
+            return assignExecutionRun(taskRunner, self.__unfinishedJobs)
+        if taskRunner.getId() in self.__considered:
+            return None
+        self.dispatch()
+        return taskRunner.takeStagedRun()
+
+    def handOver(self,
+                 taskRunner: TaskRunner,
+                 abort: bool
+                 ) -> Tuple[Optional[TaskRun], bool]:
+        """Determines what a Task Runner that just synced should do next.
+        The 'abort' flag is the result of the sync: True iff the Task Runner
+        was told to abort the run it reported.
+        Returns a pair of the run that the Task Runner should start, if any,
+        and a flag that is True iff the Task Runner should exit.
+        """
+        # Hand over a run staged by the dispatcher, or try to assign
+        # a new run if the Task Runner is available.
+        # Or exit if the Task Runner exit flag is set.
+        if taskRunner.isReserved():
+            if not abort:
+                return taskRunner.takeStagedRun(), False
+        elif taskRunner.shouldExit():
+            taskRunner.setExitFlag(False)
+            return None, True
+        elif not taskRunner.isSuspended():
+            return self.assignOnSync(taskRunner), False
+        return None, False
+
+    def added(self, record: Job) -> None:
+        self.trigger()
+
+    def removed(self, record: Job) -> None:
+        # A finished job might have freed resources other jobs are
+        # waiting for.
+        self.trigger()
+
+    def updated(self, record: Job) -> None:
+        self.trigger()
@@ -1,24 +1,29 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from io import BytesIO
 from pathlib import Path
 from time import localtime
 from typing import (
     TYPE_CHECKING, AbstractSet, Callable, DefaultDict, Dict, Iterable,
-    Iterator, List, Mapping, MutableSet, Optional, Sequence, Tuple, Union, cast
+    Iterator, List, Mapping, MutableSet, Optional, Sequence, Set, Tuple,
+    Union, cast
 )
+import os
 
+from softfab.config import dbAtomicWrites
 from softfab.databaselib import (
     Database, DatabaseElem, RecordObserver, Retriever, createUniqueId
 )
 from softfab.dispatchlib import pickResources
-from softfab.paramlib import specialParameters
+from softfab.paramlib import ResolvedParams, specialParameters
 from softfab.productlib import Product, ProductDB
 from softfab.resourcelib import ResourceDB
 from softfab.resreq import ResourceClaim, ResourceSpec
 from softfab.restypelib import ResTypeDB
 from softfab.sortedqueue import SortedQueue
-from softfab.taskgroup import PriorityMixin, TaskSet
+from softfab.taskgroup import PriorityMixin, TaskGraph, TaskSet
 from softfab.tasklib import (
     ResourceRequirementsMixin, TaskRunnerSet, TaskStateMixin
 )
@@ -28,7 +33,7 @@ from softfab.waiting import (
     InputReason, ReasonForWaiting, ResourceMissingReason, StatusLevel,
     TRStateReason, checkRunners
 )
-from softfab.xmlbind import XMLTag
+from softfab.xmlbind import XMLTag, parse
 from softfab.xmlgen import XMLAttributeValue, XMLContent, xml
 
 if TYPE_CHECKING:
@@ -54,6 +59,48 @@ else:
     TaskRunDB = object
 
 
+cachedTaskProperties = ('state', 'result', 'starttime', 'stoptime')
+"""The task properties that Task copies from its latest TaskRun."""
+
+class TaskState(XMLTag):
+    """The cached properties of a task at one point in time.
+    Task state changes are appended to a log per job, so the full job
+    file does not have to be rewritten every time a task finishes.
+    Each logged state carries the generation of the full job record
+    it was logged after, so states that are already included in
+    a newer full record can be recognized.
+    """
+    tagName = 'task'
+    intProperties = (*TaskStateMixin.intProperties, 'generation')
+    enumProperties = TaskStateMixin.enumProperties
+
+    def getName(self) -> str:
+        return cast(str, self._properties['name'])
+
+    def getGeneration(self) -> int:
+        return cast(int, self._properties.get('generation', 0))
+
+    def getProperties(self) -> Mapping[str, object]:
+        return self._properties
+
+class TaskStateLog:
+    """Parse target for the task states that were logged for a job."""
+
+    def __init__(self, attributes: Mapping[str, str]):
+        super().__init__()
+        self.states: Dict[str, TaskState] = {}
+
+    def _addTask(self, attributes: Mapping[str, str]) -> None:
+        # Later states replace earlier states of the same task.
+        state = TaskState(attributes)
+        self.states[state.getName()] = state
+
+class TaskStateLogFactory:
+
+    @staticmethod
+    def createTasks(attributes: Mapping[str, str]) -> TaskStateLog:
+        return TaskStateLog(attributes)
+
 class Task(XMLTag, TaskRunnerSet, PriorityMixin, ResourceRequirementsMixin,
            TaskStateMixin):
     tagName = 'task'
@@ -96,6 +143,7 @@ class Task(XMLTag, TaskRunnerSet, PriorityMixin, ResourceRequirementsMixin,
         super().__init__(attributes)
         self._properties.setdefault('priority', 0)
         self._parameters: Dict[str, str] = {}
+        self.__resolved: Optional[Tuple[ResolvedParams, ResolvedParams]] = None
         self.__taskRun: Optional[TaskRun] = None
         self.__job = job
         self.__taskDef = taskDef
@@ -129,6 +177,7 @@ class Task(XMLTag, TaskRunnerSet, PriorityMixin, ResourceRequirementsMixin,
         getParent = lambda key: framework
         if self.getDef().getParameter(key, getParent) != value:
             self._parameters[key] = value
+            self.__resolved = None
 
     def initCached(self, resultOnly: bool) -> None:
         '''Store selected data items from TaskRun in Task, so we do not have
@@ -147,7 +196,27 @@ class Task(XMLTag, TaskRunnerSet, PriorityMixin, ResourceRequirementsMixin,
         result = taskRun['result']
         if result is not None:
             self._properties['result'] = cast(ResultCode, result)
-        self.__job._notify() # pylint: disable=protected-access
+        self.__job._taskStateChanged(self) # pylint: disable=protected-access
+
+    def _applyState(self, state: TaskState) -> None:
+        """Restores cached properties from a logged task state."""
+        properties = state.getProperties()
+        for key in cachedTaskProperties:
+            value = properties.get(key)
+            if value is not None:
+                self._properties[key] = cast(Union[str, int, ResultCode], value)
+
+    def getState(self, generation: int) -> TaskState:
+        """Returns the cached properties of this task, to be logged
+        with the given generation.
+        """
+        properties = self._properties
+        state: Dict[str, XMLAttributeValue] = dict(
+            (key, properties.get(key))
+            for key in ('name', ) + cachedTaskProperties
+            )
+        state['generation'] = generation
+        return TaskState(state)
 
     def getJob(self) -> 'Job':
         return self.__job
@@ -200,48 +269,50 @@ class Task(XMLTag, TaskRunnerSet, PriorityMixin, ResourceRequirementsMixin,
         # TODO: Different terminology: input/dependency and output/produced.
         return [ self.__job.getProduct(inp) for inp in self.getInputs() ]
 
+    def getResolved(self) -> ResolvedParams:
+        '''Returns the parameters of this task merged with those inherited
+        from its task definition and framework.
+        Since a task refers to fixed versions of its task definition and
+        framework, the result is computed once and then reused.
+        '''
+        framework = self.getFramework()
+        parentResolved = self.getDef().getResolved(lambda key: framework)
+        cached = self.__resolved
+        if cached is not None and cached[0] is parentResolved:
+            return cached[1]
+        parameters = dict(parentResolved.parameters)
+        parameters.update(self._parameters)
+        resolved = ResolvedParams(parameters, parentResolved.finals)
+        self.__resolved = (parentResolved, resolved)
+        return resolved
+
     def getParameter(self, name: str) -> Optional[str]:
         '''Gets the value of the parameter with the given name in this task run.
         Returns None in case no parameter with that name exists.
         A parameter is a key-value pair that is interpreted by the wrapper.
         '''
-        value = self._parameters.get(name)
-        if value is None:
-            framework = self.getFramework()
-            getParent = lambda key: framework
-            return self.getDef().getParameter(name, getParent)
-        else:
-            return value
+        return self.getResolved().parameters.get(name)
 
     def isFinal(self, name: str) -> bool:
         '''Returns True iff the given parameter is final.
         '''
-        framework = self.getFramework()
-        getParent = lambda key: framework
-        return self.getDef().isFinal(name, getParent)
+        return name in self.getResolved().finals
 
     def getParameters(self) -> Mapping[str, str]:
         '''Returns the parameters of this task.
         '''
-        framework = self.getFramework()
-        getParent = lambda key: framework
-        parameters = self.getDef().getParameters(getParent)
-        parameters.update(self._parameters)
-        return parameters
+        return dict(self.getResolved().parameters)
 
     def getVisibleParameters(self) -> Mapping[str, str]:
         '''Returns the parameters to be shown to the user:
         final and reserved parameters are not included.
         '''
-        taskDef = self.getDef()
-        framework = self.getFramework()
-        getParent = lambda key: framework
-        parameters = taskDef.getParameters(getParent)
-        parameters.update(self._parameters)
+        resolved = self.getResolved()
+        finals = resolved.finals
         return {
             key: value
-            for key, value in parameters.items()
-            if not key.startswith('sf.') and not taskDef.isFinal(key, getParent)
+            for key, value in resolved.parameters.items()
+            if not key.startswith('sf.') and key not in finals
             }
 
     def getNeededCaps(self) -> AbstractSet[str]:
@@ -387,7 +458,7 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
     what has been executed and what the result was.
     '''
     tagName = 'job'
-    intProperties = ('timestamp', )
+    intProperties = ('timestamp', 'generation')
 
     def __init__(self,
                  properties: Mapping[str, XMLAttributeValue],
@@ -402,6 +473,7 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
         self.__products: Dict[str, str] = {}
         self._params: Dict[str, str] = {}
         self.__mainGroup: Optional[TaskGroup] = None
+        self.__graph: Optional[TaskGraph[Task]] = None
         self.__description: Optional[str] = None
         self.__result: Optional[ResultCode] = None
         self.__leadTime: Optional[int] = None
@@ -411,6 +483,9 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
         self.__inputs: Optional[Sequence[Product]] = None
         self.__produced: Optional[List[Product]] = None
         self.__notifyFlag: Optional[bool] = None
+        # Names of tasks whose state changed since the job was last written,
+        # or None if the job has to be rewritten entirely.
+        self.__stateChanges: Optional[Set[str]] = None
         self.__taskSequence: List[str] = []
         # __resources: { ref: [set(tasks), set(caps), id], ... }
         self.__resources: DefaultDict[str, List] = defaultdict(
@@ -449,6 +524,7 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
         name = task.getName()
         self._tasks[name] = task
         self.__taskSequence.append(name)
+        self.__graph = None
         # Examine task resource requirements
         resTypeDB = self.__jobFactory.resTypeDB
         for spec in task.resourceClaim:
@@ -487,6 +563,61 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
         else:
             self.__notifyFlag = True
 
+    def _markModified(self) -> None:
+        """Marks this job as changed in a way that requires the entire
+        job to be written again.
+        """
+        self.__stateChanges = None
+
+    def _taskStateChanged(self, task: Task) -> None:
+        """Called by a task when its cached properties have changed."""
+        stateChanges = self.__stateChanges
+        if stateChanges is not None:
+            stateChanges.add(task.getName())
+        self._notify()
+
+    def _takeStateChanges(self) -> Optional[AbstractSet[str]]:
+        """Returns the names of the tasks of which the state changed since
+        the last call, or None if the job changed in another way as well.
+        From now on, changes are tracked relative to the current job state.
+        """
+        stateChanges = self.__stateChanges
+        self.__stateChanges = set()
+        return stateChanges
+
+    def getGeneration(self) -> int:
+        """Returns the number of times this job has been written entirely.
+        """
+        return cast(int, self._properties.get('generation', 0))
+
+    def _nextGeneration(self) -> None:
+        """Called before this job is written entirely."""
+        self._properties['generation'] = self.getGeneration() + 1
+
+    def _applyTaskStates(self, states: Iterable[TaskState]) -> None:
+        """Restores logged task states after the job has been loaded.
+        States that were logged before the last time the job was written
+        entirely are ignored.
+        """
+        generation = self.getGeneration()
+        finished = set()
+        for state in states:
+            if state.getGeneration() <= generation:
+                # Already included in the job record.
+                continue
+            task = self._tasks.get(state.getName())
+            if task is not None:
+                # pylint: disable=protected-access
+                task._applyState(state)
+                # Only look at the cached state: the task run must not be
+                # loaded yet, for the same reason as in __addTask().
+                if task._properties.get('state') is not None \
+                        and task.isExecutionFinished():
+                    finished.add(task.getName())
+        # Finished tasks no longer hold job-exclusive resources.
+        for tasks, _, _ in self.__resources.values():
+            tasks -= finished
+
     def _textComment(self, text: str) -> None:
         self.__comment = text
 
@@ -633,6 +764,13 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
                 )
         return self.__resultFinal
 
+    def _getGraph(self) -> TaskGraph[Task]:
+        graph = self.__graph
+        if graph is None:
+            graph = super()._getGraph()
+            self.__graph = graph
+        return graph
+
     def _getMainGroup(self) -> TaskGroup:
         mainGroup = self.__mainGroup
         if mainGroup is None:
@@ -926,6 +1064,8 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
             if reserved is not None:
                 for ref in keepPerJob:
                     self.__resources[ref][2] = reserved[ref].getId()
+                if keepPerJob:
+                    self._markModified()
                 reserved.update(reservedPerJob)
             return reserved
         else:
@@ -947,6 +1087,7 @@ class Job(XMLTag, TaskRunnerSet, TaskSet[Task], DatabaseElem):
                     if not tasks:
                         toRelease[ref] = resId
                         info[2] = None
+                        self._markModified()
                     elif ref in toRelease:
                         del toRelease[ref]
                     if reserved is not None:
@@ -1039,6 +1180,7 @@ class JobDB(Database[Job]):
     description = 'job'
     cachedUniqueValues = ( 'owner', 'target' )
     uniqueKeys = ( 'recent', 'jobId' )
+    volatileKeys = ( 'leadtime', )
 
     # TODO: These casts are lies to paper over the fact that these retrievers
     #       can return None, which is not a Comparable.
@@ -1054,50 +1196,201 @@ class JobDB(Database[Job]):
 
     def __init__(self, baseDir: Path):
         super().__init__(baseDir, JobFactory())
+        self.__logged: Set[str] = set()
+        # Index of jobs ordered by create time, as two parallel lists.
+        self.__createTimes: List[int] = []
+        self.__jobsByCreateTime: List[Job] = []
+
+    def _register(self, key: str, value: Job) -> None:
+        super()._register(key, value)
+        createTime = value.getCreateTime()
+        createTimes = self.__createTimes
+        # Job IDs start with the create time, so jobs are almost always
+        # registered in time order.
+        if not createTimes or createTimes[-1] <= createTime:
+            createTimes.append(createTime)
+            self.__jobsByCreateTime.append(value)
+        else:
+            index = bisect_right(createTimes, createTime)
+            createTimes.insert(index, createTime)
+            self.__jobsByCreateTime.insert(index, value)
+
+    def _unregister(self, key: str, value: Job) -> None:
+        super()._unregister(key, value)
+        createTimes = self.__createTimes
+        jobs = self.__jobsByCreateTime
+        createTime = value.getCreateTime()
+        index = bisect_left(createTimes, createTime)
+        while jobs[index] is not value:
+            index += 1
+        del createTimes[index]
+        del jobs[index]
+
+    def getCreatedBetween(self,
+                          minTime: Optional[int] = None,
+                          maxTime: Optional[int] = None
+                          ) -> Sequence[Job]:
+        """Returns the jobs created in the given time range, ordered by
+        create time. Both bounds are inclusive; None means unbounded.
+        """
+        createTimes = self.__createTimes
+        begin = 0 if minTime is None else bisect_left(createTimes, minTime)
+        end = len(createTimes) if maxTime is None \
+                else bisect_right(createTimes, maxTime)
+        return self.__jobsByCreateTime[begin:end]
+
+    def _fileNameForStateLog(self, key: str) -> str:
+        return self.baseDir + '/' + key + '.tasks'
+
+    def _parseRecord(self, key: str) -> Job:
+        job = super()._parseRecord(key)
+        try:
+            with open(self._fileNameForStateLog(key), 'rb') as inp:
+                logged = inp.read()
+        except FileNotFoundError:
+            pass
+        else:
+            # The log is a sequence of elements without a root element.
+            log = cast(TaskStateLog, parse(
+                TaskStateLogFactory,
+                BytesIO(b'<tasks>' + logged + b'</tasks>')
+                ))
+            job._applyTaskStates(log.states.values()) # pylint: disable=protected-access
+            self.__logged.add(key)
+        job._takeStateChanges() # pylint: disable=protected-access
+        return job
+
+    def _write(self, key: str, value: Job) -> None:
+        # The log is removed after the job is written, so it might survive
+        # a crash. By increasing the generation, the log is ignored when
+        # the job is loaded again.
+        value._nextGeneration() # pylint: disable=protected-access
+        super()._write(key, value)
+        value._takeStateChanges() # pylint: disable=protected-access
+        if key in self.__logged:
+            self.__removeStateLog(key)
+
+    def _removeFiles(self, key: str) -> None:
+        super()._removeFiles(key)
+        self.__removeStateLog(key)
+
+    def __removeStateLog(self, key: str) -> None:
+        self.__logged.discard(key)
+        try:
+            os.remove(self._fileNameForStateLog(key))
+        except FileNotFoundError:
+            pass
+
+    def _writeUpdate(self, key: str, value: Job) -> None:
+        # Task state changes are appended to a log instead of rewriting the
+        # entire job, except when the job is final: a finished job is
+        # rewritten once and its log is removed.
+        stateChanges = value._takeStateChanges() # pylint: disable=protected-access
+        if stateChanges is None or value.hasFinalResult():
+            self._write(key, value)
+        elif stateChanges:
+            self.writeCount += 1
+            generation = value.getGeneration() + 1
+            logged = ''.join(
+                cast(Task, value.getTask(name))
+                    .getState(generation).toXML().flattenXML() + '\n'
+                for name in sorted(stateChanges)
+                )
+            with open(self._fileNameForStateLog(key), 'ab') as out:
+                out.write(logged.encode('ascii', 'xmlcharrefreplace'))
+                if dbAtomicWrites:
+                    out.flush()
+                    os.fsync(out.fileno())
+            self.__logged.add(key)
 
 class TaskToJobs(RecordObserver[Job]):
     '''For each task ID, keep track of the IDs of all jobs containing that task.
+    The jobs are kept in create time order, so a time range can be looked up
+    without checking every job.
     '''
     def __init__(self, jobDB: JobDB):
         super().__init__()
         self.__taskToJobs: DefaultDict[str, List[Job]] = defaultdict(list)
+        self.__taskToTimes: DefaultDict[str, List[int]] = defaultdict(list)
 
-        for job in jobDB:
+        for job in jobDB.getCreatedBetween():
             self.added(job)
         jobDB.addObserver(self)
 
     def __getitem__(self, taskName: str) -> Iterable[Job]:
         return self.__taskToJobs.get(taskName, [])
 
-    def iterTasksWithId(self, taskName: str) -> Iterator[Task]:
-        for job in self[taskName]:
+    def iterTasksWithId(self,
+                        taskName: str,
+                        minTime: Optional[int] = None,
+                        maxTime: Optional[int] = None
+                        ) -> Iterator[Task]:
+        """Iterates through the tasks with the given name, from jobs that
+        were created in the given time range, in create time order.
+        Both bounds are inclusive; None means unbounded.
+        """
+        jobs = self.__taskToJobs.get(taskName)
+        if jobs is None:
+            return
+        if minTime is not None or maxTime is not None:
+            createTimes = self.__taskToTimes[taskName]
+            begin = 0 if minTime is None \
+                    else bisect_left(createTimes, minTime)
+            end = len(createTimes) if maxTime is None \
+                    else bisect_right(createTimes, maxTime)
+            jobs = jobs[begin:end]
+        for job in jobs:
             task = job.getTask(taskName)
             assert task is not None
             yield task
 
-    def iterAllTasks(self, taskFilter: Iterable[str]) -> Iterator[Task]:
+    def iterAllTasks(self,
+                     taskFilter: Iterable[str],
+                     minTime: Optional[int] = None,
+                     maxTime: Optional[int] = None
+                     ) -> Iterator[Task]:
         for taskId in taskFilter:
-            yield from self.iterTasksWithId(taskId)
-
-    def iterDoneTasks(self, taskFilter: Iterable[str]) -> Iterator[Task]:
-        for task in self.iterAllTasks(taskFilter):
+            yield from self.iterTasksWithId(taskId, minTime, maxTime)
+
+    def iterDoneTasks(self,
+                      taskFilter: Iterable[str],
+                      minTime: Optional[int] = None,
+                      maxTime: Optional[int] = None
+                      ) -> Iterator[Task]:
+        for task in self.iterAllTasks(taskFilter, minTime, maxTime):
             if task.isDone():
                 yield task
 
-    def iterFinishedTasks(self, taskFilter: Iterable[str]) -> Iterator[Task]:
-        for task in self.iterAllTasks(taskFilter):
+    def iterFinishedTasks(self,
+                          taskFilter: Iterable[str],
+                          minTime: Optional[int] = None,
+                          maxTime: Optional[int] = None
+                          ) -> Iterator[Task]:
+        for task in self.iterAllTasks(taskFilter, minTime, maxTime):
             if task.hasResult():
                 yield task
 
-    def iterUnfinishedTasks(self, taskFilter: Iterable[str]) -> Iterator[Task]:
-        for task in self.iterAllTasks(taskFilter):
+    def iterUnfinishedTasks(self,
+                            taskFilter: Iterable[str],
+                            minTime: Optional[int] = None,
+                            maxTime: Optional[int] = None
+                            ) -> Iterator[Task]:
+        for task in self.iterAllTasks(taskFilter, minTime, maxTime):
             if not task.hasResult():
                 yield task
 
     def added(self, record: Job) -> None:
-        taskToJobs = self.__taskToJobs
+        createTime = record.getCreateTime()
         for taskName in record.iterTaskNames():
-            taskToJobs[taskName].append(record)
+            jobs = self.__taskToJobs[taskName]
+            createTimes = self.__taskToTimes[taskName]
+            if not createTimes or createTimes[-1] <= createTime:
+                jobs.append(record)
+                createTimes.append(createTime)
+            else:
+                index = bisect_right(createTimes, createTime)
+                jobs.insert(index, record)
+                createTimes.insert(index, createTime)
 
     def removed(self, record: Job) -> None:
         assert False, 'jobs should not be removed'
@@ -1154,6 +1447,11 @@ class DateRangeMonitor(RecordObserver[Job]):
         # Create time cannot change, so we don't care.
         pass
 
+class RecentJobs(SortedQueue[Job]):
+    '''All jobs, with the most recent job first.
+    '''
+    compareField = 'recent'
+
 class UnfinishedJobs(SortedQueue[Job]):
     compareField = 'timestamp'
 
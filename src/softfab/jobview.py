@@ -1,8 +1,8 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from typing import (
-    ClassVar, Dict, Iterable, Iterator, Optional, Sequence, Tuple, TypeVar,
-    cast
+    ClassVar, Dict, Hashable, Iterable, Iterator, Mapping, Optional, Sequence,
+    Tuple, TypeVar, cast
 )
 
 from softfab.StyleResources import styleRoot
@@ -103,19 +103,27 @@ def createStatusBar(tasks: Sequence[Task], length: int = 10) -> XMLContent:
         statusFreq = dict.fromkeys(statusList, 0)
         for task in tasks:
             statusFreq[getTaskStatus(task)] += 1
-        def iterBars() -> Iterator[XMLContent]:
-            for status in statusList:
-                freq = statusFreq[status]
-                if freq != 0:
-                    yield xhtml.td(
-                        style=f'width:{100 * freq // len(tasks):d}%',
-                        class_=status
-                        )[ str(freq) ]
-        return xhtml.table(class_ = 'statusmany')[
-            xhtml.tbody[
-                xhtml.tr[ iterBars() ]
-                ]
+        return createStatusFreqBar(statusFreq)
+
+def createStatusFreqBar(statusFreq: Mapping[str, int]) -> XMLContent:
+    '''Creates a status bar from the number of tasks for each status.
+    '''
+    total = sum(statusFreq.values())
+    if total == 0:
+        return None
+    def iterBars() -> Iterator[XMLContent]:
+        for status in statusList:
+            freq = statusFreq.get(status, 0)
+            if freq != 0:
+                yield xhtml.td(
+                    style=f'width:{100 * freq // total:d}%',
+                    class_=status
+                    )[ str(freq) ]
+    return xhtml.table(class_ = 'statusmany')[
+        xhtml.tbody[
+            xhtml.tr[ iterBars() ]
             ]
+        ]
 
 _scheduleIcon = styleRoot.addIcon('ScheduleSmall')
 _scheduleIconGray = styleRoot.addIcon('ScheduleSmallD')
@@ -186,6 +194,20 @@ class JobsTable(DataTable[Job]):
                       ) -> Iterator[str]:
         yield getJobStatus(record)
 
+    def getRowCacheKey(self,
+                       record: Job,
+                       **kwargs: object
+                       ) -> Optional[Hashable]:
+        if not record.isExecutionFinished():
+            # The lead time keeps increasing until the job stops.
+            return None
+        scheduleId = record.getScheduledBy()
+        if scheduleId is not None:
+            # The schedule icon is grayed out if the schedule is deleted.
+            scheduleDB: ScheduleDB = getattr(kwargs['proc'], 'scheduleDB')
+            scheduleId += ':' + str(scheduleId in scheduleDB)
+        return record.getId(), record.changeCount, scheduleId
+
     def iterColumns(self, **kwargs: object) -> Iterator[DataColumn[Job]]:
         userDB = cast(UserDB, getattr(kwargs['proc'], 'userDB'))
         yield CreateTimeColumn[Job].instance
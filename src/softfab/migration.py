@@ -19,6 +19,7 @@ from softfab.joblib import JobDB
 from softfab.productlib import ProductDB
 from softfab.projectlib import ProjectDB
 from softfab.resourcelib import ResourceDB, recomputeRunning
+from softfab.resultlib import ResultStorage
 from softfab.taskrunlib import TaskRunDB
 from softfab.utils import parseVersion
 from softfab.version import VERSION
@@ -75,6 +76,10 @@ def _convertAll() -> None:
     taskRunDB = cast(TaskRunDB, databases['taskRunDB'])
     recomputeRunning(resourceDB, taskRunDB)
 
+    echo('Converting extracted data...')
+    numValues = ResultStorage(softfab.config.dbDir / 'results').convert()
+    echo(f'Moved {numValues} value(s) to column files.')
+
     echo('Updating database version tag...')
     projectDB = cast(ProjectDB, databases['projectDB'])
     project = projectDB['singleton']
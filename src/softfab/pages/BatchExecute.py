@@ -297,12 +297,10 @@ class BatchExecute_POST(BatchExecute_GET):
 
                 if not notices:
                     # Commit created jobs to database and show them to user.
-                    jobDB = self.jobDB
-                    jobIds = []
-                    for job in jobs:
-                        jobDB.add(job)
-                        jobIds.append(job.getId())
-                    raise Redirect(createJobsURL(jobIds))
+                    self.jobDB.addMany(jobs)
+                    raise Redirect(createJobsURL(
+                        [job.getId() for job in jobs]
+                        ))
 
 class BatchInputTable(InputTable):
 
@@ -20,7 +20,7 @@ from softfab.formlib import (
     CheckBoxesTable, RadioTable, SingleCheckBoxTable, selectionList, textArea,
     textInput
 )
-from softfab.joblib import JobDB
+from softfab.joblib import Job, JobDB
 from softfab.pageargs import (
     ArgsCorrected, BoolArg, DictArg, DictArgInstance, EnumArg, IntArg,
     PageArgs, SetArg, StrArg
@@ -285,12 +285,11 @@ class StartStep(DialogStep):
             # this extra check is still useful.
             raise InvalidRequest('No tasks selected')
         config = proc.getConfig()
-        jobIds = []
+        jobs: List[Job] = []
         for _ in range(proc.args.multi):
-            for job in config.createJobs(proc.user.name):
-                proc.jobDB.add(job)
-                jobIds.append(job.getId())
-        raise Redirect(createJobsURL(jobIds))
+            jobs += config.createJobs(proc.user.name)
+        proc.jobDB.addMany(jobs)
+        raise Redirect(createJobsURL([job.getId() for job in jobs]))
 
     def verify(self, proc: 'Execute_POST.Processor') -> NoReturn:
         # Unreachable because process() never returns normally.
@@ -2,8 +2,8 @@
 
 from collections import defaultdict
 from typing import (
-    Any, ClassVar, Collection, DefaultDict, Dict, Iterable, Iterator, List,
-    Mapping, Sequence, Tuple, cast
+    Any, ClassVar, Collection, DefaultDict, Dict, Hashable, Iterable,
+    Iterator, List, Mapping, Optional, Sequence, Tuple, cast
 )
 
 from softfab.CSVPage import presentCSVLink
@@ -195,6 +195,14 @@ class ExtractedDataTable(TaskRunsTable):
     def getRecordsToQuery(self, proc: PageProcessor) -> Collection[Task]:
         return cast(ExtractedData_GET.Processor, proc).tasks
 
+    def getRowCacheKey(self,
+                       record: Task,
+                       **kwargs: object
+                       ) -> Optional[Hashable]:
+        # The data columns are created per request, so cached rows would
+        # never be reused.
+        return None
+
     def iterColumns(self, **kwargs: object) -> Iterator[DataColumn[Task]]:
         proc = cast(ExtractedData_GET.Processor, kwargs['proc'])
         yield CreateTimeColumn[Task].instance
@@ -245,7 +253,9 @@ class ExtractedData_GET(FabPage['ExtractedData_GET.Processor',
             # Query DB.
             query: List[RecordProcessor[Task]] = list(self.iterFilters())
             query.append(KeySorter[Task].forCustom([ 'starttime' ]))
-            tasks = runQuery(query, self.taskToJobs.iterDoneTasks(taskNames))
+            tasks = runQuery(query, self.taskToJobs.iterDoneTasks(
+                taskNames, req.args.ctabove, req.args.ctbelow
+                ))
             dataByRunId = gatherData(taskRunDB, taskNames, tasks, activeKeys)
 
             # pylint: disable=attribute-defined-outside-init
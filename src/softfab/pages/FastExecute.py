@@ -1,7 +1,7 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from enum import Enum
-from typing import Any, ClassVar, Collection, Iterator, cast
+from typing import Any, ClassVar, Collection, Iterator, List, cast
 
 from softfab.FabPage import FabPage
 from softfab.Page import PageProcessor, PresentableError, Redirect
@@ -9,7 +9,7 @@ from softfab.configlib import Config, ConfigDB
 from softfab.configview import SimpleConfigTable
 from softfab.datawidgets import DataTable
 from softfab.formlib import actionButtons, makeForm
-from softfab.joblib import JobDB
+from softfab.joblib import Job, JobDB
 from softfab.pageargs import EnumArg, PageArgs, RefererArg, SetArg, StrArg
 from softfab.pagelinks import createJobsURL
 from softfab.request import Request
@@ -176,8 +176,8 @@ class FastExecute_POST(FabPage['FastExecute_POST.Processor',
                 checkPrivilege(user, 'j/c', 'create jobs')
 
                 # Create jobs.
-                jobIds = []
                 userName = user.name
+                jobs: List[Job] = []
                 for configId in sorted(req.args.confirmedId):
                     # TODO: Configs that have disappeared or become invalid are
                     #       silently ignored. Since this is a rare situation,
@@ -188,11 +188,9 @@ class FastExecute_POST(FabPage['FastExecute_POST.Processor',
                         pass
                     else:
                         if config.hasValidInputs():
-                            jobDB = self.jobDB
-                            for job in config.createJobs(userName):
-                                jobDB.add(job)
-                                jobIds.append(job.getId())
-                raise Redirect(createJobsURL(jobIds))
+                            jobs += config.createJobs(userName)
+                self.jobDB.addMany(jobs)
+                raise Redirect(createJobsURL([job.getId() for job in jobs]))
 
             assert False, action
 
@@ -48,6 +48,7 @@ class GetJobHistory_GET(ControlPage['GetJobHistory_GET.Arguments',
 
     async def writeReply(self, response: Response, proc: Processor) -> None:
         jobs = proc.jobs
+        response.startStreaming()
         response.write('<jobrefs>')
         for chunk in chop(jobs, 1000):
             # Measurements have shown that a single write with a big XML
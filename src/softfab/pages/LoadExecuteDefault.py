@@ -45,12 +45,12 @@ class LoadExecuteDefault_POST(ControlPage['LoadExecuteDefault_POST.Arguments',
                     f'Configuration "{args.config}" does not exist'
                     )
             else:
-                jobDB = self.jobDB
-                for job in jobConfig.createJobs(
-                        user.name, None, products, params, localAt
-                        ):
+                jobs = list(jobConfig.createJobs(
+                    user.name, None, products, params, localAt
+                    ))
+                for job in jobs:
                     job.comment += '\n' + args.comment
-                    jobDB.add(job)
+                self.jobDB.addMany(jobs)
 
     def checkAccess(self, user: User) -> None:
         checkPrivilege(user, 'j/c', 'start jobs')
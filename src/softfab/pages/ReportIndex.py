@@ -1,17 +1,17 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Any, ClassVar, Iterator, cast
+from typing import Any, ClassVar, Collection, Iterator, Optional, cast
 
 from softfab.FabPage import FabPage
 from softfab.Page import PageProcessor
 from softfab.ReportMixin import JobReportProcessor, ReportFilterForm
 from softfab.datawidgets import DataTable
 from softfab.formlib import textInput
-from softfab.joblib import JobDB
+from softfab.joblib import Job, JobDB, RecentJobs
 from softfab.jobview import JobsTable
 from softfab.pageargs import IntArg, SortArg, StrArg
 from softfab.pagelinks import ReportArgs
-from softfab.querylib import RecordFilter, WildcardFilter
+from softfab.querylib import RecordFilter, TrigramIndex
 from softfab.schedulelib import ScheduleDB
 from softfab.users import User, checkPrivilege
 from softfab.xmlgen import XMLContent, xhtml
@@ -24,6 +24,15 @@ class FilteredJobsTable(JobsTable):
         return super().showTargetColumn(**kwargs) \
             or bool(jobDB.uniqueValues('target'))
 
+    def getPresortedRecords(self,
+                            proc: PageProcessor,
+                            key: str
+                            ) -> Optional[Collection[Job]]:
+        if key == 'recent':
+            return cast(ReportIndex_GET.Processor, proc).recentJobs
+        else:
+            return None
+
     def iterFilters(self, proc: PageProcessor) -> Iterator[RecordFilter]:
         return cast(ReportIndex_GET.Processor, proc).iterFilters()
 
@@ -54,12 +63,14 @@ class ReportIndex_GET(FabPage['ReportIndex_GET.Processor',
     class Processor(JobReportProcessor[Arguments]):
 
         jobDB: ClassVar[JobDB]
+        jobDescriptions: ClassVar[TrigramIndex[Job]]
+        recentJobs: ClassVar[RecentJobs]
         scheduleDB: ClassVar[ScheduleDB]
 
         def iterFilters(self) -> Iterator[RecordFilter]:
             yield from super().iterFilters()
             if self.args.desc:
-                yield WildcardFilter('description', self.args.desc, self.db)
+                yield self.jobDescriptions.createFilter(self.args.desc)
 
     def checkAccess(self, user: User) -> None:
         checkPrivilege(user, 'j/l', 'view the report list')
@@ -39,7 +39,7 @@ class FilteredTaskRunsTable(TaskRunsTable):
             ExecutionState.COMPLETED: taskToJobs.iterDoneTasks,
             ExecutionState.FINISHED: taskToJobs.iterFinishedTasks,
             ExecutionState.UNFINISHED: taskToJobs.iterUnfinishedTasks,
-            }[args.execState](args.task)
+            }[args.execState](args.task, args.ctabove, args.ctbelow)
 
     def iterFilters(self, proc: PageProcessor) -> Iterator[RecordFilter]:
         return cast(ReportTasks_GET.Processor, proc).iterFilters()
@@ -36,7 +36,9 @@ class ReportTasksCSV_GET(CSVPage['ReportTasksCSV_GET.Processor']):
             query: List[RecordProcessor] = list(self.iterFilters())
             query.append(KeySorter.forCustom(['recent']))
             taskName = self.args.task
-            tasks = runQuery(query, self.taskToJobs.iterDoneTasks(taskName))
+            tasks = runQuery(query, self.taskToJobs.iterDoneTasks(
+                taskName, self.args.ctabove, self.args.ctbelow
+                ))
 
             # pylint: disable=attribute-defined-outside-init
             self.tasks = tasks
@@ -1,21 +1,25 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from enum import Enum
-from typing import Any, ClassVar, Iterator, Mapping, cast
+from typing import Any, ClassVar, Iterator, Mapping, Sequence, Union, cast
 
 from softfab.FabPage import FabPage
 from softfab.Page import PageProcessor, Redirect
 from softfab.configlib import ConfigDB
-from softfab.databaselib import Retriever
+from softfab.databaselib import Database, DatabaseElem, Retriever
 from softfab.datawidgets import DataColumn, DataTable, LinkColumn
 from softfab.formlib import makeForm
+from softfab.frameworklib import FrameworkDB
+from softfab.joblib import JobDB
 from softfab.pageargs import DictArg, EnumArg, IntArg, PageArgs, SortArg
+from softfab.productdeflib import ProductDefDB
 from softfab.request import Request
 from softfab.schedulelib import ScheduleDB, Scheduled
 from softfab.schedulerefs import createScheduleDetailsLink
 from softfab.scheduleview import (
     createLastJobLink, describeNextRun, getScheduleStatus
 )
+from softfab.taskdeflib import TaskDefDB
 from softfab.userlib import UserDB
 from softfab.users import User, checkPrivilege, checkPrivilegeForOwned
 from softfab.userview import OwnerColumn
@@ -116,6 +120,19 @@ class ScheduleIndex_GET(FabPage['ScheduleIndex_GET.Processor',
         scheduleDB: ClassVar[ScheduleDB]
         configDB: ClassVar[ConfigDB]
         userDB: ClassVar[UserDB]
+        jobDB: ClassVar[JobDB]
+        frameworkDB: ClassVar[FrameworkDB]
+        taskDefDB: ClassVar[TaskDefDB]
+        productDefDB: ClassVar[ProductDefDB]
+
+        def getDependencies(self) -> Sequence[Union[Database[Any],
+                                                    DatabaseElem]]:
+            # Whether a schedule is running depends on the state of the jobs
+            # it created; whether its configurations are valid depends on
+            # the definitions they use.
+            return (self.scheduleDB, self.configDB, self.userDB, self.jobDB,
+                    self.frameworkDB, self.taskDefDB, self.productDefDB,
+                    self.project)
 
         async def process(self,
                           req: Request['ScheduleIndex_GET.Arguments'],
@@ -1,12 +1,14 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from typing import (
-    Any, ClassVar, Collection, Iterator, List, Mapping, Sequence, Tuple, cast
+    Any, ClassVar, Collection, Iterator, List, Mapping, Optional, Sequence,
+    Tuple, Union, cast
 )
 
 from softfab.FabPage import FabPage
 from softfab.Page import PageProcessor
 from softfab.configlib import ConfigDB
+from softfab.databaselib import Database, DatabaseElem
 from softfab.datawidgets import DataTable
 from softfab.formlib import checkBox
 from softfab.joblib import Job
@@ -63,6 +65,22 @@ class ShowReport_GET(FabPage['ShowReport_GET.Processor',
         scheduleDB: ClassVar[ScheduleDB]
         userDB: ClassVar[UserDB]
 
+        def getDependencies(self
+                            ) -> Optional[List[Union[Database[Any],
+                                                     DatabaseElem]]]:
+            job = self.jobDB.get(self.args.jobId)
+            if job is None or not job.hasFinalResult():
+                # Durations and Task Runner status change over time.
+                return None
+            dependencies: List[Union[Database[Any], DatabaseElem]] = [
+                self.configDB, self.scheduleDB, self.userDB, self.project, job
+                ]
+            dependencies += job.getInputs()
+            dependencies += job.getProduced()
+            for task in job.iterTasks():
+                dependencies.append(task.getLatestRun())
+            return dependencies
+
     def checkAccess(self, user: User) -> None:
         checkPrivilege(user, 'j/a')
 
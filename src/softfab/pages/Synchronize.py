@@ -1,47 +1,23 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import ClassVar, Optional, cast
+from typing import ClassVar, cast
 
 from softfab.ControlPage import ControlPage
 from softfab.Page import InvalidRequest, PageProcessor
 from softfab.authentication import TokenAuthPage
-from softfab.joblib import JobDB, UnfinishedJobs
+from softfab.dispatcher import Dispatcher
+from softfab.joblib import JobDB
 from softfab.request import Request
 from softfab.resourcelib import (
     RequestFactory, ResourceDB, TaskRunner, TaskRunnerData
 )
 from softfab.response import Response
-from softfab.taskrunlib import TaskRun
 from softfab.tokens import TokenRole, TokenUser
 from softfab.users import User, checkPrivilege
 from softfab.xmlbind import parse
 from softfab.xmlgen import XMLContent, xml
 
 
-def assignExecutionRun(taskRunner: TaskRunner,
-                       unfinishedJobs: UnfinishedJobs
-                       ) -> Optional[TaskRun]:
-    # Find oldest unassigned task.
-    capabilities = taskRunner.capabilities
-    # TODO: It would be more efficient to keep non-fixed tasks instead of
-    #       jobs, but the code for that would be more complex.
-    for job in unfinishedJobs:
-        # Note that we will accept capabilities that were targets earlier
-        # but are no longer marked as targets. This is deliberate, to match
-        # the "reason for waiting" logic.
-        target = job.getTarget()
-        if target is None or target in capabilities:
-            # Try to assign this job, might fail for various
-            # reasons, such as:
-            # - all tasks done
-            # - dependencies not ready yet
-            # - not enough resources are available
-            # - capabilities do not match
-            newRun = job.assignTask(taskRunner)
-            if newRun:
-                return newRun
-    return None
-
 class Synchronize_POST(ControlPage[ControlPage.Arguments,
                                    'Synchronize_POST.Processor']):
     authenticator = TokenAuthPage(TokenRole.RESOURCE)
@@ -50,7 +26,7 @@ class Synchronize_POST(ControlPage[ControlPage.Arguments,
 
         resourceDB: ClassVar[ResourceDB]
         jobDB: ClassVar[JobDB]
-        unfinishedJobs: ClassVar[UnfinishedJobs]
+        dispatcher: ClassVar[Dispatcher]
 
         async def process(self,
                           req: Request[ControlPage.Arguments],
@@ -71,17 +47,8 @@ class Synchronize_POST(ControlPage[ControlPage.Arguments,
             self.taskRunner = taskRunner
             self.abort = taskRunner.sync(self.jobDB, request)
 
-            # Try to assign a new run if the Task Runner is available.
-            # Or exit if the Task Runner exit flag is set.
-            self.exit = False
-            self.newRun = None
-            if not taskRunner.isReserved():
-                if taskRunner.shouldExit():
-                    self.exit = True
-                    taskRunner.setExitFlag(False)
-                elif not taskRunner.isSuspended():
-                    self.newRun = assignExecutionRun(taskRunner,
-                                                     self.unfinishedJobs)
+            self.newRun, self.exit = \
+                self.dispatcher.handOver(taskRunner, self.abort)
 
         def createResponse(self) -> XMLContent:
             taskRunner = self.taskRunner
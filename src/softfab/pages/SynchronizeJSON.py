@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""
+Compact sync protocol for Task Runners, using JSON instead of XML.
+
+The request body is a JSON object with the following fields:
+
+- "digest": the digest of the static state of the Task Runner,
+  computed as described in `softfab.resourcelib.syncStateDigest()`
+- "state": optional; the static state itself: an object containing
+  the "runnerVersion" and "host" strings
+- "run": optional; an object containing the "jobId", "taskId" and "runId"
+  strings of the execution run the Task Runner is currently executing
+
+The state only has to be sent when it changed since the last sync.
+If the Control Center does not know the state that matches the digest,
+for example because it was restarted, it replies with ``{"state": true}``
+and the Task Runner should sync again including its state.
+
+Otherwise the reply contains "wait", the number of seconds until the next sync,
+and optionally "abort": true, "exit": true and "start", which contains
+the description of the run to start in the same format as the XML sync reply.
+"""
+
+from typing import ClassVar, Collection, Dict, Mapping, Optional
+import json
+
+from softfab.ControlPage import ControlPage
+from softfab.Page import InvalidRequest, PageProcessor
+from softfab.authentication import TokenAuthPage
+from softfab.dispatcher import Dispatcher
+from softfab.joblib import JobDB
+from softfab.request import Request
+from softfab.resourcelib import ResourceDB, TaskRunnerData, syncStateDigest
+from softfab.response import Response
+from softfab.tokens import TokenRole, TokenUser
+from softfab.users import User, checkPrivilege
+from softfab.utils import parseVersion
+
+
+def _parseStrings(node: object,
+                  name: str,
+                  keys: Collection[str]
+                  ) -> Dict[str, str]:
+    """Checks that a JSON node is an object with string values that
+    contains exactly the given keys and returns it as a dictionary.
+    Raises InvalidRequest otherwise.
+    """
+    if not isinstance(node, dict):
+        raise InvalidRequest(f'Expected object for "{name}"')
+    # The keys end up as XML attribute names, so only known keys are
+    # accepted.
+    unknown = [key for key in node if key not in keys]
+    if unknown:
+        raise InvalidRequest(
+            f'Unknown values in "{name}": {", ".join(map(repr, unknown))}'
+            )
+    missing = [key for key in keys if key not in node]
+    if missing:
+        raise InvalidRequest(
+            f'Missing values in "{name}": {", ".join(missing)}'
+            )
+    values = {}
+    for key in keys:
+        value = node[key]
+        if not isinstance(value, str):
+            raise InvalidRequest(f'Expected string value for "{name}.{key}"')
+        values[key] = value
+    return values
+
+class SynchronizeJSON_POST(ControlPage[ControlPage.Arguments,
+                                       'SynchronizeJSON_POST.Processor']):
+    authenticator = TokenAuthPage(TokenRole.RESOURCE)
+    contentType = 'application/json; charset=UTF-8'
+
+    class Processor(PageProcessor[ControlPage.Arguments]):
+
+        resourceDB: ClassVar[ResourceDB]
+        jobDB: ClassVar[JobDB]
+        dispatcher: ClassVar[Dispatcher]
+
+        async def process(self,
+                          req: Request[ControlPage.Arguments],
+                          user: User
+                          ) -> None:
+            # pylint: disable=attribute-defined-outside-init
+
+            # Parse posted JSON request.
+            try:
+                jsonNode = json.load(req.rawInput())
+            except ValueError as ex:
+                raise InvalidRequest(f'Invalid JSON: {ex}') from ex
+            if not isinstance(jsonNode, dict):
+                raise InvalidRequest('Expected JSON object')
+            digest = jsonNode.get('digest')
+            if not isinstance(digest, str):
+                raise InvalidRequest('Expected string value for "digest"')
+            stateNode = jsonNode.get('state')
+            runNode = jsonNode.get('run')
+            run: Optional[Mapping[str, str]] = None
+            if runNode is not None:
+                run = _parseStrings(runNode, 'run',
+                                    ('jobId', 'taskId', 'runId'))
+
+            # Sync Task Runner database.
+            assert isinstance(user, TokenUser), user
+            try:
+                taskRunner = self.resourceDB.runnerFromToken(user)
+            except KeyError as ex:
+                raise InvalidRequest(*ex.args) from ex
+            self.taskRunner = taskRunner
+            self.newRun = None
+            self.exit = False
+            if stateNode is None:
+                abort = taskRunner.syncDigest(self.jobDB, digest, run)
+                self.needState = abort is None
+                if abort is None:
+                    return
+            else:
+                state = _parseStrings(stateNode, 'state',
+                                      ('runnerVersion', 'host'))
+                if syncStateDigest(state) != digest:
+                    raise InvalidRequest('Digest does not match state')
+                try:
+                    parseVersion(state['runnerVersion'])
+                except ValueError as ex:
+                    raise InvalidRequest(
+                        f'Invalid runner version: {ex}'
+                        ) from ex
+                self.needState = False
+                abort = taskRunner.sync(self.jobDB,
+                                        TaskRunnerData(state).withRun(run))
+            self.abort = abort
+
+            self.newRun, self.exit = \
+                self.dispatcher.handOver(taskRunner, abort)
+
+        def createResponse(self) -> Dict[str, object]:
+            if self.needState:
+                return {'state': True}
+            taskRunner = self.taskRunner
+            reply: Dict[str, object] = {}
+            if self.abort:
+                reply['abort'] = True
+            if self.exit:
+                reply['exit'] = True
+            else:
+                newRun = self.newRun
+                if newRun is None:
+                    waitSecs = taskRunner.getSyncWaitDelay()
+                else:
+                    reply['start'] = \
+                        newRun.externalize(self.resourceDB).flattenXML()
+                    waitSecs = taskRunner.getMinimalDelay()
+                reply['wait'] = waitSecs
+            return reply
+
+    def checkAccess(self, user: User) -> None:
+        checkPrivilege(user, 'tr/*', 'sync a Task Runner')
+
+    async def writeReply(self, response: Response, proc: Processor) -> None:
+        response.write(json.dumps(proc.createResponse(),
+                                  separators=(',', ':')))
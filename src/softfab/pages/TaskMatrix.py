@@ -1,20 +1,16 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from collections import defaultdict
-from typing import (
-    ClassVar, DefaultDict, Iterable, Iterator, List, Optional, Sequence, cast
-)
+from typing import ClassVar, Dict, Iterable, Iterator, Optional, cast
 import time
 
 from softfab.CSVPage import presentCSVLink
 from softfab.FabPage import FabPage
 from softfab.TaskMatrixCommon import (
-    TaskMatrixArgs, TaskMatrixCSVArgs, TaskMatrixProcessor
+    TaskMatrixArgs, TaskMatrixCSVArgs, TaskMatrixProcessor, TaskStats
 )
 from softfab.configlib import ConfigDB
 from softfab.formlib import dropDownList, emptyOption, makeForm, submitButton
-from softfab.joblib import Task
-from softfab.jobview import createStatusBar
+from softfab.jobview import createStatusFreqBar
 from softfab.pagelinks import ReportTaskArgs
 from softfab.request import Request
 from softfab.timelib import iterDays, normalizeWeek, secondsPerDay, weeksInYear
@@ -137,13 +133,13 @@ class Matrix(Table):
                 )
 
         def createCell(taskName: Optional[str],
-                       tasks: Optional[Sequence[Task]],
+                       stats: Optional[TaskStats],
                        beginTime: int,
                        endTime: int
                        ) -> XMLContent:
-            if tasks is None:
+            if stats is None:
                 return ''
-            bar = createStatusBar(tasks, length = 0)
+            bar = createStatusFreqBar(stats.statusCounts)
             if taskName is None:
                 return bar
             url = makeURL(taskName, beginTime, endTime)
@@ -153,8 +149,8 @@ class Matrix(Table):
 
         def iterCells(taskName: Optional[str],
                       rowHeader: XMLContent,
-                      weekTasks: Iterable[Optional[Sequence[Task]]],
-                      totalTasks: Optional[Sequence[Task]]
+                      weekStats: Iterable[Optional[TaskStats]],
+                      totalStats: Optional[TaskStats]
                       ) -> Iterator[XMLContent]:
             # pylint: disable=stop-iteration-return
             # https://github.com/PyCQA/pylint/issues/2158
@@ -163,15 +159,14 @@ class Matrix(Table):
 
             dayStartGen = iterDays(beginWeek)
             todayStart = next(dayStartGen)
-            for tasks in weekTasks:
+            for stats in weekStats:
                 tomorrowStart = next(dayStartGen)
-                yield createCell(taskName, tasks, todayStart, tomorrowStart)
+                yield createCell(taskName, stats, todayStart, tomorrowStart)
                 todayStart = tomorrowStart
 
-            yield cell(class_ = 'rightalign')[
-                str(len(totalTasks)) if totalTasks else ''
-                ]
-            yield createCell(taskName, totalTasks, beginWeek, endWeek)
+            count = 0 if totalStats is None else totalStats.count
+            yield cell(class_ = 'rightalign')[ str(count) if count else '' ]
+            yield createCell(taskName, totalStats, beginWeek, endWeek)
 
         if len(taskNames) == 0:
             yield iterCells(
@@ -192,10 +187,9 @@ class Matrix(Table):
                     )
         def presentTotals() -> Iterator[XMLContent]:
             yield xhtml.b[ 'Total' ]
-            for tasks in tasksByDay:
-                yield cell(class_ = 'rightalign')[
-                    str(len(tasks)) if tasks else ''
-                    ]
+            for stats in tasksByDay:
+                count = stats.count
+                yield cell(class_ = 'rightalign')[ str(count) if count else '' ]
             yield ''
             yield ''
         yield presentTotals()
@@ -224,16 +218,16 @@ class TaskMatrix_GET(FabPage['TaskMatrix_GET.Processor',
                           ) -> None:
             await super().process(req, user)
 
-            tasksByName: DefaultDict[str, List[Task]] = defaultdict(list)
+            tasksByName: Dict[str, TaskStats] = {}
             tasksByDay = []
-            allTasks = []
             for dayTasks in self.taskData:
-                combinedDayTasks = []
-                for name, tasks in dayTasks.items():
-                    combinedDayTasks.extend(tasks)
-                    tasksByName[name].extend(tasks)
-                tasksByDay.append(combinedDayTasks)
-                allTasks.extend(combinedDayTasks)
+                for name, stats in dayTasks.items():
+                    nameStats = tasksByName.get(name)
+                    if nameStats is None:
+                        nameStats = tasksByName[name] = TaskStats()
+                    nameStats.addStats(stats)
+                tasksByDay.append(TaskStats.combine(dayTasks.values()))
+            allTasks = TaskStats.combine(tasksByDay)
 
             # pylint: disable=attribute-defined-outside-init
             self.tasksByName = tasksByName
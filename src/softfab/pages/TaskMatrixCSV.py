@@ -1,12 +1,10 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import ClassVar, Iterator, Mapping, Optional, Sequence, Set, cast
+from typing import ClassVar, Iterator, Mapping, Sequence, Set, cast
 import time
 
 from softfab.CSVPage import CSVPage
 from softfab.TaskMatrixCommon import TaskMatrixCSVArgs, TaskMatrixProcessor
-from softfab.joblib import Task
-from softfab.querylib import KeySorter
 from softfab.resultcode import ResultCode
 from softfab.taskdeflib import TaskDefDB
 from softfab.timelib import secondsPerDay
@@ -69,22 +67,17 @@ class TaskMatrixCSV_GET(CSVPage['TaskMatrixCSV_GET.Processor']):
             ]
         # Take the result of the most recent execution of each task, since that
         # is most likely to be representative.
-        sorter: KeySorter[Task] = KeySorter.forCustom(['-starttime'])
         for taskName in sorted(taskNames):
             resultCells = [ taskName ]
             for taskDict in taskData:
-                tasks = taskDict.get(taskName, ())
-                for taskRun in sorter(tasks):
-                    taskResult = RESULT_MAP.get(taskRun.result)
-                    if taskResult is not None:
-                        result = taskResult
-                        break
-                else:
-                    result = 'X'
-                resultCells.append(result)
+                stats = taskDict.get(taskName)
+                latestResult = None if stats is None else stats.latestResult
+                resultCells.append(
+                    'X' if latestResult is None else RESULT_MAP[latestResult]
+                    )
             yield resultCells
 
-RESULT_MAP: Mapping[Optional[ResultCode], str] = {
+RESULT_MAP: Mapping[ResultCode, str] = {
     ResultCode.OK: 'P',
     ResultCode.WARNING: 'F',
     ResultCode.ERROR: 'F'
@@ -1,33 +1,82 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Any, ClassVar, Iterable, Iterator, List, cast
+from typing import (
+    Any, ClassVar, Collection, Iterator, Optional, Sequence, Union, cast,
+    overload
+)
 
 from softfab.FabPage import FabPage
 from softfab.Page import PageProcessor
 from softfab.datawidgets import DataTable
-from softfab.joblib import Job, JobDB, Task
+from softfab.joblib import Task
 from softfab.pageargs import IntArg, SortArg
 from softfab.pagelinks import TaskRunnerIdArgs
-from softfab.querylib import runQuery
 from softfab.request import Request
+from softfab.taskrunlib import TaskRunDB, TaskRunsByRunner
 from softfab.tasktables import TaskRunsTable
 from softfab.userlib import UserDB
 from softfab.users import User, checkPrivilege
 from softfab.webgui import pageLink
 from softfab.xmlgen import XMLContent, xhtml
 
-# For large factories, sorting through all tasks that ever ran will take
-# several minutes. The typical use case for Task Runner History is to see
-# if task failures are linked to one particular Task Runner; in this scenario
-# there is no need to go back far in time.
-_jobsLimit = 10000
+
+class RecentTasks(Sequence[Task]):
+    """The tasks that ran on a Task Runner, most recently started first.
+    Tasks are only looked up when accessed, so showing one page of a long
+    history does not touch the other tasks.
+    """
+
+    def __init__(self, runIds: Sequence[str], taskRunDB: TaskRunDB):
+        super().__init__()
+        self.__runIds = runIds
+        self.__taskRunDB = taskRunDB
+
+    def __len__(self) -> int:
+        return len(self.__runIds)
+
+    @overload
+    def __getitem__(self, index: int) -> Task:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Task]:
+        ...
+
+    def __getitem__(self,
+                    index: Union[int, slice]
+                    ) -> Union[Task, Sequence[Task]]:
+        runIds = self.__runIds
+        numRuns = len(runIds)
+        if isinstance(index, slice):
+            return [
+                self.__taskRunDB[runIds[numRuns - 1 - i]].getTask()
+                for i in range(*index.indices(numRuns))
+                ]
+        if index < 0:
+            index += numRuns
+        if not 0 <= index < numRuns:
+            raise IndexError(index)
+        return self.__taskRunDB[runIds[numRuns - 1 - index]].getTask()
 
 class HistoryTable(TaskRunsTable):
+    # A Task Runner executes one task at a time, so the start times of
+    # its tasks are unique, apart from runs that started in the same second,
+    # which the index keeps in the order in which they started.
+    uniqueKeys = ('-starttime',)
 
-    def getRecordsToQuery(self, proc: PageProcessor) -> Iterable[Task]:
+    def getRecordsToQuery(self, proc: PageProcessor) -> Collection[Task]:
         proc = cast(TaskRunnerHistory_GET.Processor, proc)
         return proc.tasks
 
+    def getPresortedRecords(self,
+                            proc: PageProcessor,
+                            key: str
+                            ) -> Optional[Collection[Task]]:
+        if key == '-starttime':
+            return cast(TaskRunnerHistory_GET.Processor, proc).tasks
+        else:
+            return None
+
     def showTargetColumn(self, **kwargs: object) -> bool:
         # Typically a Task Runner has the same target for all of its life,
         # so this column is not useful.
@@ -44,36 +93,18 @@ class TaskRunnerHistory_GET(FabPage['TaskRunnerHistory_GET.Processor',
 
     class Processor(PageProcessor['TaskRunnerHistory_GET.Arguments']):
 
-        jobDB: ClassVar[JobDB]
+        taskRunDB: ClassVar[TaskRunDB]
+        taskRunsByRunner: ClassVar[TaskRunsByRunner]
         userDB: ClassVar[UserDB]
 
         async def process(self,
                           req: Request['TaskRunnerHistory_GET.Arguments'],
                           user: User
                           ) -> None:
-            runnerId = req.args.runnerId
-
-            jobDB = self.jobDB
-            jobs = list(jobDB.values())
-            jobs.sort(key = jobDB.retrieverFor('recent'))
-            reachedJobsLimit = len(jobs) > _jobsLimit
-            if reachedJobsLimit:
-                jobs[_jobsLimit : ] = []
-
-            # TODO: This is actually not a filter, since it changes the
-            #       record type.
-            def recordFilter(jobs: Iterable[Job]) -> List[Task]:
-                return [
-                    task
-                    for job in jobs
-                    for task in job.getTaskSequence()
-                    if task['runner'] == runnerId
-                    ]
-            tasks = cast(List[Task], runQuery((recordFilter, ), jobs))
+            runIds = self.taskRunsByRunner.getRunIds(req.args.runnerId)
 
             # pylint: disable=attribute-defined-outside-init
-            self.reachedJobsLimit = reachedJobsLimit
-            self.tasks = tasks
+            self.tasks = RecentTasks(runIds, self.taskRunDB)
 
     def checkAccess(self, user: User) -> None:
         checkPrivilege(user, 'r/l')
@@ -93,9 +124,4 @@ class TaskRunnerHistory_GET(FabPage['TaskRunnerHistory_GET.Processor',
                 )[ 'Details' ],
             ' / History of Task Runner ', xhtml.b[ runnerId ], ':'
             ]
-
-        if proc.reachedJobsLimit:
-            yield xhtml.p[xhtml.i[
-                f'Only tasks from the last {_jobsLimit:d} jobs are shown.'
-                ]]
         yield HistoryTable.instance.present(**kwargs)
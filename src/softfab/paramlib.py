@@ -1,6 +1,8 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Callable, Dict, Mapping, Optional, Set
+from typing import AbstractSet, Callable, Dict, Mapping, Optional, Set, Tuple
+
+import attr
 
 from softfab.utils import ResultKeeper
 from softfab.xmlgen import XMLAttributeValue, XMLContent, xml
@@ -11,6 +13,22 @@ specialParameters = {'sf.wrapper', 'sf.timeout'}
 
 GetParent = Callable[[str], 'Parameterized']
 
+@attr.s(auto_attribs=True, frozen=True, eq=False)
+class ResolvedParams:
+    """The parameters of a level in a parameter inheritance hierarchy,
+    merged with those it inherits from its parents.
+
+    Instances are immutable, so they can be shared between lookups.
+    A new instance is created whenever a level or any of its parents
+    changes; comparing by identity is therefore enough to tell whether
+    an instance is still current.
+    """
+
+    parameters: Mapping[str, str]
+    finals: AbstractSet[str]
+
+emptyResolvedParams = ResolvedParams({}, frozenset())
+
 class Parameterized:
     '''Interface for objects that have inheritable parameters.
     '''
@@ -56,6 +74,14 @@ class Parameterized:
         '''
         raise NotImplementedError
 
+    def getResolved(self,
+                    getParent: Optional[GetParent] = None
+                    ) -> ResolvedParams:
+        """Returns the parameters and final parameter names from this level
+        and its parents.
+        """
+        raise NotImplementedError
+
 class _ParamTop(Parameterized):
     '''Object at the top of a parameter inheritance hierarchy.
 
@@ -85,16 +111,28 @@ class _ParamTop(Parameterized):
     def getFinalSelf(self) -> Set[str]:
         return set()
 
+    def getResolved(self,
+                    getParent: Optional[GetParent] = None
+                    ) -> ResolvedParams:
+        return emptyResolvedParams
+
 paramTop = _ParamTop()
 
 class ParamMixin(Parameterized):
     '''Reuseable implementation of inheritable parameters.
+
+    The parameters merged with those of the parent levels are cached.
+    The cache is keyed by the identity of the parent's resolved parameters,
+    so it remains valid as long as the parent level is the same (immutable)
+    record version, while a new parent version or a change to any of the
+    levels above causes the merged parameters to be recomputed.
     '''
 
     def __init__(self) -> None:
         super().__init__()
         self.__parameters: Dict[str, str] = {}
         self.__finalParameters: Set[str] = set()
+        self.__resolved: Optional[Tuple[ResolvedParams, ResolvedParams]] = None
 
     def getParent(self, getFunc: Optional[GetParent]) -> Parameterized:
         '''Returns the parameterized record one level above this one.
@@ -116,23 +154,33 @@ class ParamMixin(Parameterized):
             self.__parameters[name] = value
         if final:
             self.__finalParameters.add(name)
+        self.__resolved = None
+
+    def getResolved(self,
+                    getParent: Optional[GetParent] = None
+                    ) -> ResolvedParams:
+        parentResolved = self.getParent(getParent).getResolved(getParent)
+        cached = self.__resolved
+        if cached is not None and cached[0] is parentResolved:
+            return cached[1]
+        parameters = dict(parentResolved.parameters)
+        parameters.update(self.getParametersSelf())
+        resolved = ResolvedParams(
+            parameters, parentResolved.finals | self.getFinalSelf()
+            )
+        self.__resolved = (parentResolved, resolved)
+        return resolved
 
     def getParameter(self,
                      name: str,
                      getParent: Optional[GetParent] = None
                      ) -> Optional[str]:
-        value = self.__parameters.get(name)
-        if value is None:
-            return self.getParent(getParent).getParameter(name, getParent)
-        else:
-            return value
+        return self.getResolved(getParent).parameters.get(name)
 
     def getParameters(self,
                       getParent: Optional[GetParent] = None
                       ) -> Dict[str, str]:
-        params = self.getParent(getParent).getParameters(getParent)
-        params.update(self.getParametersSelf())
-        return params
+        return dict(self.getResolved(getParent).parameters)
 
     def getParametersSelf(self) -> Dict[str, str]:
         return dict(self.__parameters)
@@ -141,8 +189,7 @@ class ParamMixin(Parameterized):
                 name: str,
                 getParent: Optional[GetParent] = None
                 ) -> bool:
-        return name in self.__finalParameters \
-            or self.getParent(getParent).isFinal(name, getParent)
+        return name in self.getResolved(getParent).finals
 
     def getFinalSelf(self) -> Set[str]:
         return set(self.__finalParameters)
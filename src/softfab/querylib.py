@@ -1,14 +1,21 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from collections import OrderedDict, defaultdict
+from heapq import nsmallest
 from operator import itemgetter
 from typing import (
-    AbstractSet, Any, Callable, Collection, Generic, Iterable, Iterator, List,
-    Optional, Type, TypeVar, Union, cast, overload
+    AbstractSet, Any, Callable, Collection, DefaultDict, Dict, Generic,
+    Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Set,
+    Tuple, Type, TypeVar, Union, cast, overload
 )
+from weakref import WeakKeyDictionary
+import re
 
 from typing_extensions import Protocol
 
-from softfab.databaselib import DBRecord, Database, Retriever
+from softfab.databaselib import (
+    DBRecord, Database, RecordObserver, Retriever
+)
 from softfab.utils import (
     Comparable, ComparableT, Missing, missing, wildcardMatcher
 )
@@ -100,6 +107,136 @@ class WildcardFilter(RecordFilter[Record]):
             if matcher.match(retriever(record)) is not None:
                 yield record
 
+class TrigramIndex(RecordObserver[DBRecord]):
+    """Index of the values that the records in a database have for a key
+    with string values, to quickly find the records that match a wildcard
+    pattern.
+
+    Each distinct value is matched against the pattern only once, no matter
+    how many records share it. Values that lack any of the three character
+    sequences (trigrams) from the literal parts of the pattern are skipped
+    without matching.
+
+    The index is built on first use and then kept up-to-date by observing
+    the database.
+    """
+
+    def __init__(self, db: Database[DBRecord], key: str):
+        super().__init__()
+        self.__db = db
+        # Note: The caller should only pass keys that have string values,
+        #       but the type system cannot enforce that.
+        self.__retriever = cast(Retriever[DBRecord, str], db.retrieverFor(key))
+        self.__built = False
+        self.__valueFor: Dict[str, str] = {}
+        self.__recordsFor: Dict[str, Dict[str, DBRecord]] = {}
+        self.__valuesFor: DefaultDict[str, Set[str]] = defaultdict(set)
+        db.addObserver(self)
+
+    def __build(self) -> None:
+        self.__built = True
+        for record in self.__db:
+            self.added(record)
+
+    def getMatches(self, pattern: str) -> Mapping[str, DBRecord]:
+        """Returns a mapping from record ID to record containing exactly
+        those records that match the given wildcard pattern.
+        """
+        if not self.__built:
+            self.__build()
+        recordsFor = self.__recordsFor
+
+        # Only characters that match literally can be used to narrow down
+        # the candidates. Brackets are not escaped by wildcardMatcher(),
+        # so their contents are not literal either.
+        candidates: Optional[Set[str]] = None
+        if '[' not in pattern and ']' not in pattern:
+            valuesFor = self.__valuesFor
+            for fragment in re.split(r'[*?]+', pattern):
+                for trigram in _iterTrigrams(fragment):
+                    values = valuesFor.get(trigram)
+                    if values is None:
+                        return {}
+                    elif candidates is None:
+                        candidates = set(values)
+                    else:
+                        candidates &= values
+
+        matcher = wildcardMatcher(pattern)
+        matches: Dict[str, DBRecord] = {}
+        for value in recordsFor if candidates is None else candidates:
+            if matcher.match(value) is not None:
+                matches.update(recordsFor[value])
+        return matches
+
+    def createFilter(self, pattern: str) -> RecordFilter[DBRecord]:
+        """Returns a filter that passes only those records that match
+        the given wildcard pattern.
+        """
+        return _TrigramFilter(self, self.__db, pattern)
+
+    def added(self, record: DBRecord) -> None:
+        if not self.__built:
+            return
+        recordId = record.getId()
+        value = self.__retriever(record)
+        self.__valueFor[recordId] = value
+        records = self.__recordsFor.get(value)
+        if records is None:
+            self.__recordsFor[value] = {recordId: record}
+            valuesFor = self.__valuesFor
+            for trigram in _iterTrigrams(value):
+                valuesFor[trigram].add(value)
+        else:
+            records[recordId] = record
+
+    def removed(self, record: DBRecord) -> None:
+        if not self.__built:
+            return
+        recordId = record.getId()
+        value = self.__valueFor.pop(recordId)
+        records = self.__recordsFor[value]
+        del records[recordId]
+        if not records:
+            del self.__recordsFor[value]
+            valuesFor = self.__valuesFor
+            for trigram in _iterTrigrams(value):
+                values = valuesFor[trigram]
+                values.remove(value)
+                if not values:
+                    del valuesFor[trigram]
+
+    def updated(self, record: DBRecord) -> None:
+        self.removed(record)
+        self.added(record)
+
+def _iterTrigrams(text: str) -> Iterator[str]:
+    for index in range(len(text) - 2):
+        yield text[index:index + 3]
+
+class _TrigramFilter(RecordFilter[DBRecord]):
+    """Wildcard filter that looks up the matching records in an index.
+    When given the full database, the matching records are returned without
+    looking at the other records, in no particular order.
+    """
+
+    def __init__(self,
+                 index: TrigramIndex[DBRecord],
+                 db: Database[DBRecord],
+                 pattern: str
+                 ):
+        super().__init__()
+        self.__index = index
+        self.__db = db
+        self.__pattern = pattern
+
+    def __call__(self, records: Iterable[DBRecord]) -> Iterable[DBRecord]:
+        matches = self.__index.getMatches(self.__pattern)
+        if records is self.__db:
+            return matches.values()
+        else:
+            return (record for record in records if record.getId() in matches)
+
 class _BlockFilter(RecordFilter[Record]):
     '''Filter that does not pass any record given to it.
     Used for optimizing special cases in other filters.
@@ -188,11 +325,14 @@ class RecordSorter(Generic[Record]):
     def __call__(self, records: Iterable[Record]) -> List[Record]:
         raise NotImplementedError
 
-# TODO: This is the quickest way to solve the problem that None is no
-#       longer comparable, but probably not the most efficient. Check
-#       whether putting support for 'missing' deeper into the call stack
-#       would make an extra step like this unnecessary.
-def substMissingForNone(
+    def select(self, records: Iterable[Record], count: int) -> List[Record]:
+        '''Returns the first `count` records of the sorted order.
+        The default implementation sorts all records; subclasses can
+        override this to avoid sorting the records that are not returned.
+        '''
+        return self(records)[:count]
+
+def _substMissingForNone(
         retriever: Retriever[Record, Optional[ComparableT]]
         ) -> Retriever[Record, Union[ComparableT, Missing]]:
     def wrap(record: Record,
@@ -208,7 +348,7 @@ def _iterRetrievers(keyOrder: Iterable[str],
                     uniqueKeys: Collection[str]
                     ) -> Iterator[Retriever[Record, Comparable]]:
     for key in keyOrder:
-        yield substMissingForNone(getRetriever(key))
+        yield getRetriever(key)
         if key in uniqueKeys:
             # There is no point in another key after a unique key,
             # since the values will never be equal.
@@ -217,6 +357,26 @@ def _iterRetrievers(keyOrder: Iterable[str],
         # As a last resort, use the default sort order of records.
         yield cast(Callable[[Record], Comparable], lambda record: record)
 
+def _compositeKey(retrievers: Sequence[Callable[[Record], Comparable]]
+                  ) -> Callable[[Record], Any]:
+    """Returns a key function that returns a tuple with the values from
+    all of the given retrievers, in order of importance.
+    """
+    # Function calls dominate the cost of computing keys, so avoid
+    # a loop for the common cases.
+    if len(retrievers) == 1:
+        return retrievers[0]
+    elif len(retrievers) == 2:
+        r0, r1 = retrievers
+        return lambda record: (r0(record), r1(record))
+    elif len(retrievers) == 3:
+        r0, r1, r2 = retrievers
+        return lambda record: (r0(record), r1(record), r2(record))
+    else:
+        return lambda record: tuple([
+            retriever(record) for retriever in retrievers
+            ])
+
 class KeySorter(RecordSorter[Record]):
     '''When called, returns a sorted list of the given database records.
     The keyOrder is a list of the keys by which the records should be sorted,
@@ -229,6 +389,8 @@ class KeySorter(RecordSorter[Record]):
     The uniqueKeys argument is a collection of keys (names or functions)
     for which the value is unique for each record. There will be no sorting
     performed on sort criteria behind a unique key in the sort order.
+    Keys for which a record has the value None are sorted as if the value
+    was `missing`: after all other values.
     If two records are equal with respect to the keys in keyOrder,
     their order is determined by comparing the record objects. If the
     record type does not support comparison, you have to provide
@@ -262,14 +424,154 @@ class KeySorter(RecordSorter[Record]):
     def __call__(self, records: Iterable[Record]) -> List[Record]:
         # Radix sort: start with least important key and end with most
         # important key; Python's sort guarantees stability of equal elements.
-        sortList: Optional[List[Record]] = None
-        for retriever in reversed(self.__retrievers):
-            if sortList is None:
-                sortList = sorted(records, key=retriever)
+        # This is faster than a single sort on tuples of all keys, since
+        # list.sort() has fast paths for comparing values of the same
+        # built-in type, which tuple comparisons cannot use.
+        if not isinstance(records, list):
+            records = list(records)
+        retrievers = list(reversed(self.__retrievers))
+        substituted: Set[int] = set()
+        while True:
+            # Sort a private copy in place.
+            sortList = list(records)
+            try:
+                for index, retriever in enumerate(retrievers):
+                    sortList.sort(key=retriever)
+            except TypeError:
+                # Only substitute None values when we find them, since
+                # the wrapper function is relatively expensive.
+                # A failed sort can leave the list in any order, so start
+                # over from the original records.
+                if index in substituted:
+                    raise
+                substituted.add(index)
+                retrievers[index] = _substMissingForNone(retriever)
+            else:
+                return sortList
+
+    def select(self, records: Iterable[Record], count: int) -> List[Record]:
+        # Partial selection using a heap of size 'count': this takes
+        # O(n log count) time instead of O(n log n) for a full sort.
+        # Like sorted(), nsmallest() keeps equal records in input order.
+        retrievers = self.__retrievers
+        if not isinstance(records, list):
+            records = list(records)
+        try:
+            return nsmallest(count, records, key=_compositeKey(retrievers))
+        except TypeError:
+            return nsmallest(count, records, key=_compositeKey([
+                _substMissingForNone(retriever) for retriever in retrievers
+                ]))
+
+class _CachedOrder(Generic[DBRecord]):
+    """A sorted order of all records in a database, as kept by
+    SortedOrderCache.
+    """
+
+    def __init__(self, changeCount: int):
+        super().__init__()
+        self.changeCount = changeCount
+        self.records: Optional[List[DBRecord]] = None
+        self.__ranks: Optional[Dict[str, int]] = None
+
+    def getRank(self, record: DBRecord) -> int:
+        """Returns the position of the given record in the sorted order.
+        """
+        ranks = self.__ranks
+        if ranks is None:
+            records = self.records
+            assert records is not None
+            ranks = self.__ranks = {
+                rec.getId(): rank for rank, rec in enumerate(records)
+                }
+        return ranks[record.getId()]
+
+class SortedOrderCache:
+    """Keeps the sorted order of all records in a database, so repeated
+    requests for the same order do not have to sort again.
+
+    A cached order is valid until the next change to the database, as
+    tracked by its change counter. Since sorting all records costs more
+    than selecting a few of them, an order is only stored when it is
+    requested a second time without the database having changed since.
+    Sort orders that include keys which are listed in the `volatileKeys`
+    of the database are never cached.
+
+    Requests for a filtered subset of the records use the same orders:
+    the position of each record in the full order is then used as its
+    sort key, so the subset is sorted on a single integer key instead of
+    on every key of the sort order.
+    """
+
+    def __init__(self, maxOrders: int):
+        """Creates a cache that keeps up to `maxOrders` sort orders
+        per database, discarding the least recently used ones.
+        """
+        super().__init__()
+        self.__maxOrders = maxOrders
+        self.__orders: MutableMapping[
+            Database[Any],
+            OrderedDict[Tuple[str, ...], _CachedOrder[Any]]
+            ] = WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,
+            db: Database[DBRecord],
+            keyOrder: Sequence[str]
+            ) -> Optional[List[DBRecord]]:
+        """Returns all records in `db`, sorted in the same order as
+        `KeySorter.forDB(keyOrder, db)` would sort them, or None if that
+        order is not available from this cache.
+        The returned list must not be modified.
+        """
+        order = self.__lookup(db, keyOrder)
+        return None if order is None else order.records
+
+    def getRankRetriever(self,
+                         db: Database[DBRecord],
+                         keyOrder: Sequence[str]
+                         ) -> Optional[Retriever[DBRecord, int]]:
+        """Returns a retriever that sorts records from `db` in the same
+        order as `KeySorter.forDB(keyOrder, db)` would sort them,
+        or None if that order is not available from this cache.
+        The retriever must only be used until the database changes.
+        """
+        order = self.__lookup(db, keyOrder)
+        return None if order is None else order.getRank
+
+    def __lookup(self,
+                 db: Database[DBRecord],
+                 keyOrder: Sequence[str]
+                 ) -> Optional[_CachedOrder[DBRecord]]:
+        if self.__maxOrders <= 0:
+            return None
+        volatileKeys = db.volatileKeys
+        if any(key in volatileKeys for key in keyOrder):
+            return None
+
+        orderKey = tuple(keyOrder)
+        changeCount = db.changeCount
+        orders = self.__orders.get(db)
+        if orders is None:
+            orders = self.__orders[db] = OrderedDict()
+        order = orders.get(orderKey)
+        if order is not None and order.changeCount == changeCount:
+            orders.move_to_end(orderKey)
+            if order.records is not None:
+                self.hits += 1
             else:
-                sortList.sort(key=retriever)
-        assert sortList is not None
-        return sortList
+                # Requested twice for the same database contents: store it.
+                order.records = KeySorter.forDB(keyOrder, db)(db)
+            return cast(_CachedOrder[DBRecord], order)
+
+        # Remember the request, but let the caller do the sorting.
+        self.misses += 1
+        orders[orderKey] = _CachedOrder(changeCount)
+        orders.move_to_end(orderKey)
+        while len(orders) > self.__maxOrders:
+            orders.popitem(last=False)
+        return None
 
 def _getRetriever(db: Optional[Database[DBRecord]],
                   key: str
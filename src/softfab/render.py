@@ -4,7 +4,7 @@
 Module to render the page
 '''
 
-from typing import ClassVar, Optional, Type, cast
+from typing import ClassVar, List, Optional, Type, cast
 import logging
 
 from twisted.cred.error import LoginFailed, Unauthorized
@@ -19,9 +19,13 @@ from softfab.Page import (
     PresentableError, ProcT, Redirect, Redirector, Responder, logPageException
 )
 from softfab.UIPage import UIPage, UIResponder
+from softfab.databaselib import Database
 from softfab.pageargs import ArgsCorrected, ArgsInvalid, ArgsT, Query, dynamic
+from softfab.projectlib import getBootTime
 from softfab.request import Request
-from softfab.response import NotModified, Response, ResponseHeaders
+from softfab.response import (
+    NotModified, Response, ResponseHeaders, createETag
+)
 from softfab.users import AccessDenied, UnknownUser, User
 from softfab.utils import abstract
 from softfab.webgui import docLink
@@ -132,6 +136,23 @@ class _PlainTextResponder(Responder):
         response.setContentType('text/plain')
         response.write(self.__message + '\n')
 
+class _DependencyETagResponder(Responder):
+    """Sets an entity tag that was derived from the dependencies of a page
+    before letting the page respond.
+    """
+
+    def __init__(self, etag: bytes, responder: Optional[Responder]):
+        super().__init__()
+        self.__etag = etag
+        self.__responder = responder
+
+    async def respond(self, response: Response) -> None:
+        # This raises NotModified if the client already has this version.
+        response.setETag(self.__etag)
+        responder = self.__responder
+        assert responder is not None, 'ETag of unprocessed request changed'
+        await responder.respond(response)
+
 def renderAuthenticated(page: FabResource, request: TwistedRequest) -> object:
     def done(result: object) -> None: # pylint: disable=unused-argument
         request.finish()
@@ -178,7 +199,7 @@ async def renderAsync(page: FabResource, request: TwistedRequest) -> None:
         except Unauthorized as ex:
             responder = _unauthorizedResponder(ex)
         else:
-            responder = await _parseAndProcess(page, req, user)
+            responder = await _parseAndProcess(page, req, user, response)
     except Redirect as ex:
         responder = Redirector(ex.url)
     except InternalError as ex:
@@ -202,9 +223,43 @@ def _checkActive(
         if not page.isActive():
             raise Redirect(page.getParentURL(args))
 
+def _dependencyETag(page: FabResource[ArgsT, PageProcessor[ArgsT]],
+                    req: Request[ArgsT],
+                    proc: PageProcessor[ArgsT]
+                    ) -> Optional[bytes]:
+    '''Returns an entity tag for a widget request that changes whenever
+    the arguments, the user or any of the dependencies declared by the
+    processor change, or None if the dependencies are unknown.
+    Computing this tag is much cheaper than processing the request and
+    hashing the presentation.
+    '''
+    subPath = req.getSubPath()
+    if req.method != 'GET' or subPath is None:
+        # Full pages contain the current time, so only widgets are tagged.
+        return None
+    dependencies = proc.getDependencies()
+    if dependencies is None:
+        return None
+    user = proc.user
+    # Change counters start at zero again after a restart, so include
+    # the boot time to avoid matching tags from a previous run.
+    parts: List[str] = [
+        str(getBootTime()), page.name, subPath,
+        Query.fromArgs(proc.args).toURL(),
+        user.__class__.__name__, user.name or ''
+        ]
+    for dependency in dependencies:
+        if isinstance(dependency, Database):
+            parts.append(f'{dependency.name}:{dependency.changeCount:d}')
+        else:
+            parts.append(f'{dependency.__class__.__name__}/'
+                         f'{dependency.getId()}:{dependency.changeCount:d}')
+    return createETag('\n'.join(parts).encode()) + b'-dep'
+
 async def _parseAndProcess(page: FabResource[ArgsT, PageProcessor[ArgsT]],
                            req: Request[ArgsT],
-                           user: User
+                           user: User,
+                           response: Response
                            ) -> Responder:
     '''Parse step: determine values for page arguments.
     Processing step: database interaction.
@@ -242,6 +297,12 @@ async def _parseAndProcess(page: FabResource[ArgsT, PageProcessor[ArgsT]],
 
         _checkActive(page, args)
 
+        # Skip processing if the client already has the latest version.
+        etag = _dependencyETag(page, req, proc)
+        if etag is not None and response.matchesETag(etag):
+            req.processEnd()
+            return _DependencyETagResponder(etag, None)
+
         # Processing step.
         try:
             await proc.process(req, user)
@@ -296,6 +357,9 @@ async def _parseAndProcess(page: FabResource[ArgsT, PageProcessor[ArgsT]],
         except KeyError:
             notFoundPage: ErrorPage[PageProcessor[ArgsT]] = NotFoundPage()
             responder = UIResponder(notFoundPage, proc)
+        else:
+            if etag is not None and proc.error is None:
+                responder = _DependencyETagResponder(etag, responder)
 
     req.processEnd()
     return responder
@@ -323,4 +387,4 @@ async def _present(responder: Responder, response: Response) -> None:
     if _timeRender:
         end = time()
         print('Responding took %1.3f seconds' % (end - start))
-    response.finish()
+    await response.finish()
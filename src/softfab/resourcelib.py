@@ -1,18 +1,23 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from collections import defaultdict
+from hashlib import sha1
 from pathlib import Path
 from typing import (
     TYPE_CHECKING, AbstractSet, Callable, ClassVar, Collection, DefaultDict,
-    Iterable, Iterator, Mapping, Optional, Set, Tuple, TypeVar, cast
+    Dict, Iterable, Iterator, Mapping, Optional, Set, Tuple, TypeVar, cast
 )
+import json
 import logging
 
+from twisted.internet.interfaces import IReactorTime
+
 from softfab.connection import ConnectionStatus
 from softfab.databaselib import Database, DatabaseElem, RecordObserver
 from softfab.paramlib import GetParent, ParamMixin, Parameterized, paramTop
-from softfab.reactor import reactor
-from softfab.restypelib import ResType, ResTypeDB, taskRunnerResourceTypeName
+from softfab.restypelib import (
+    ResType, ResTypeDB, repoResourceTypeName, taskRunnerResourceTypeName
+)
 from softfab.taskrunlib import TaskRun, TaskRunDB
 from softfab.timelib import getTime
 from softfab.tokens import Token, TokenDB, TokenRole, TokenUser
@@ -25,8 +30,9 @@ from softfab.xmlgen import XMLContent, xml
 
 if TYPE_CHECKING:
     # pylint: disable=cyclic-import
-    from softfab.joblib import JobDB
+    from softfab.joblib import Job, JobDB
 else:
+    Job = object
     JobDB = object
 
 
@@ -253,6 +259,17 @@ class RunInfo(XMLTag):
             raise KeyError(f'no task named "{taskId}" in job {jobId}')
         return task.getRun(runId)
 
+def syncStateDigest(state: Mapping[str, str]) -> str:
+    """Returns the digest of the static state reported by a Task Runner:
+    the hexadecimal SHA-1 hash of the state serialized as compact JSON
+    with sorted keys.
+    Task Runners that sync using JSON compute the same digest, which allows
+    them to omit the state itself as long as it doesn't change.
+    """
+    return sha1(
+        json.dumps(state, sort_keys=True, separators=(',', ':')).encode()
+        ).hexdigest()
+
 class TaskRunnerData(XMLTag):
     '''This class represents a request of a Task Runner.
     It is also a part of a Task Runner database record.
@@ -280,6 +297,22 @@ class TaskRunnerData(XMLTag):
         '''
         return parseVersion(cast(str, self._properties['runnerVersion']))
 
+    @cachedProperty
+    def stateDigest(self) -> str:
+        """Digest of the static state of the Task Runner.
+        See syncStateDigest().
+        """
+        return syncStateDigest(cast(Mapping[str, str], self._properties))
+
+    def withRun(self, run: Optional[Mapping[str, str]]) -> 'TaskRunnerData':
+        """Returns a copy of this data, with the reported execution run
+        replaced by a run with the given IDs, or no run if None is passed.
+        """
+        data = TaskRunnerData(cast(Mapping[str, str], self._properties))
+        if run is not None:
+            data._setRun(run)
+        return data
+
     def _setTarget(self, attributes: Mapping[str, str]) -> None:
         # COMPAT 2.16: Ignore target coming from TR.
         pass
@@ -330,9 +363,14 @@ class ExecutionObserver(RecordObserver[TaskRun]):
         self.__taskRunner = taskRunner
         self.__callback: Callable[[Optional[TaskRun]], None] = callback
         self._run: Optional[TaskRun] = None
+        self.staged = False
+        """True iff the current run was assigned by a dispatch cycle and
+        has not been handed to the Task Runner yet.
+        """
 
     def reset(self) -> None:
         self._run = None
+        self.staged = False
 
     def __shouldRun(self, run: TaskRun) -> bool:
         return (
@@ -356,6 +394,7 @@ class ExecutionObserver(RecordObserver[TaskRun]):
                     oldRun.getId()
                     )
         self._run = newRun
+        self.staged = False
 
     def getRun(self) -> Optional[TaskRun]:
         return self._run
@@ -394,7 +433,8 @@ class ExecutionObserver(RecordObserver[TaskRun]):
         if run is None:
             return None
         else:
-            return xml.executionrun(runId=run.getId())
+            return xml.executionrun(runId=run.getId(),
+                                    staged=self.staged or None)
 
 class TaskRunner(ResourceBase):
     '''This is a database record with information about a Task Runner.
@@ -447,9 +487,7 @@ class TaskRunner(ResourceBase):
             self, self.__shouldBeExecuting
             )
         self.__lastSyncTime = getTime()
-        self.__markLostCall = None
-        if self._properties['status'] is ConnectionStatus.CONNECTED:
-            self.__startLostCallback()
+        self.__staging = False
 
     def _createToken(self, tokenDB: TokenDB) -> None:
         assert self.__token is None, self.__token
@@ -498,7 +536,6 @@ class TaskRunner(ResourceBase):
         return self.toXML().flattenIndented()
 
     def _retired(self) -> None:
-        self.__cancelLostCallback()
         self.__failRun('removed')
 
     @property
@@ -542,35 +579,64 @@ class TaskRunner(ResourceBase):
         if run is None:
             logging.warning('Execution run %s does not exist', runId)
         else:
-            self.__executionObserver.setRun(run)
+            observer = self.__executionObserver
+            observer.setRun(run)
+            if observer.getRun() is run:
+                observer.staged = attributes.get('staged') == 'true'
 
     def __shouldBeExecuting(self, run: Optional[TaskRun]) -> None:
         '''Callback from ExecutionObserver.
         '''
-        assert run is self.__executionObserver.getRun()
+        observer = self.__executionObserver
+        assert run is observer.getRun()
+        observer.staged = run is not None and self.__staging
         # Write reference to current execution run to DB.
         self._notify()
 
+    def stageRun(self, job: Job) -> Optional[TaskRun]:
+        '''Tries to assign a task from the given job to this Task Runner,
+        without the Task Runner being in contact with us right now.
+        The assigned run is handed to the Task Runner on its next sync,
+        see takeStagedRun().
+        Returns the assigned run, or None if no task could be assigned.
+        '''
+        self.__staging = True
+        try:
+            return job.assignTask(self)
+        finally:
+            self.__staging = False
+
+    def takeStagedRun(self) -> Optional[TaskRun]:
+        '''Returns the run that was staged for this Task Runner and has
+        not been handed to it yet, or None if there is no such run.
+        Once returned, the run is considered handed over.
+        '''
+        observer = self.__executionObserver
+        if observer.staged:
+            observer.staged = False
+            # Write the hand-over to DB.
+            self._notify()
+            return observer.getRun()
+        else:
+            return None
+
     def _startObservingExecution(self) -> None:
         self.__taskRunDB.addObserver(self.__executionObserver)
 
     def _stopObservingExecution(self) -> None:
         self.__taskRunDB.removeObserver(self.__executionObserver)
 
-    def __startLostCallback(self) -> None:
-        """Start mark-as-lost timer."""
-        assert self.__markLostCall is None
-        self.__markLostCall = reactor.callLater(
-            self.getLostTimeout(), self.markLost
-            )
-
-    def __cancelLostCallback(self) -> None:
-        """Stops mark-as-lost timer if it's active."""
-        call = self.__markLostCall
-        if call is not None:
-            if call.active():
-                call.cancel()
-            self.__markLostCall = None
+    def checkLost(self) -> bool:
+        """Marks this Task Runner as lost if it has not synced for longer
+        than the lost timeout.
+        Returns True iff this Task Runner was marked as lost by this call.
+        """
+        if self._properties['status'] is ConnectionStatus.CONNECTED and \
+                getTime() - self.__lastSyncTime > self.getLostTimeout():
+            self.markLost()
+            return True
+        else:
+            return False
 
     def markLost(self) -> None:
         '''Marks this Task Runner as lost and marks any task it was running as
@@ -679,12 +745,27 @@ class TaskRunner(ResourceBase):
             self._notify()
         self.__lastSyncTime = getTime()
         self.__hasBeenInSync = True
-        self.__cancelLostCallback()
-        self.__startLostCallback()
         return self.__enforceSync(
             self.__executionObserver, lambda: data.getExecutionRunId(jobDB)
             )
 
+    def syncDigest(self,
+                   jobDB: JobDB,
+                   digest: str,
+                   run: Optional[Mapping[str, str]]
+                   ) -> Optional[bool]:
+        """Synchronise database with a sync in which the Task Runner only
+        reported the digest of its static state, plus the IDs of the run
+        it is executing, if any.
+        Returns None if the digest does not match the last state reported
+        by this Task Runner; the Task Runner must then report its full state.
+        Otherwise, the return value is the same as for sync().
+        """
+        data = self.__data
+        if data is None or data.stateDigest != digest:
+            return None
+        return self.sync(jobDB, data.withRun(run))
+
     def __enforceSync(self,
                       observer: ExecutionObserver,
                       getId: Callable[[], Optional[str]]
@@ -706,6 +787,22 @@ class TaskRunner(ResourceBase):
         # Resolve conflicts.
         if ccRun is None:
             return trRunId is not None
+        elif observer.staged:
+            if trRunId == ccRun.getId():
+                # The run was handed over, but that was not recorded,
+                # for example because the Control Center was restarted.
+                observer.staged = False
+                self._notify()
+                return ccRun.isToBeAborted()
+            # The Task Runner has not been told about this run yet,
+            # so it not reporting the run is not a conflict.
+            if ccRun.isToBeAborted():
+                logging.info(
+                    'Run %s was aborted before Task Runner "%s" started it',
+                    ccRun.getId(), self.getId()
+                    )
+                ccRun.failed('Task aborted before it was started')
+            return trRunId is not None
         else:
             if trRunId == ccRun.getId():
                 return ccRun.isToBeAborted()
@@ -789,6 +886,7 @@ class ResourceDB(Database[ResourceBase]):
     privilegeObject = 'r'
     description = 'resource'
     uniqueKeys = ( 'id', )
+    volatileKeys = ( 'lastSync', )
 
     factory: ResourceFactory
 
@@ -880,6 +978,107 @@ class TaskRunnerTokenProvider(RecordObserver[ResourceBase]):
     def updated(self, record: ResourceBase) -> None:
         pass
 
+class RepositoryLocatorIndex(RecordObserver[ResourceBase]):
+    """Finds repository resources by their locator.
+
+    Locators are compared case-insensitive, since that is how the hosting
+    platforms that call our webhooks treat repository URLs.
+    """
+
+    def __init__(self, resourceDB: ResourceDB):
+        super().__init__()
+        self.__resourceDB = resourceDB
+        self.__reposByLocator: DefaultDict[str, Set[str]] = defaultdict(set)
+        """Maps casefolded locator to the IDs of repositories using it."""
+        self.__locatorsByRepo: Dict[str, str] = {}
+        """Maps repository ID to its casefolded locator."""
+
+        for repoId in resourceDB.resourcesOfType(repoResourceTypeName):
+            self.__add(resourceDB[repoId])
+        resourceDB.addObserver(self)
+
+    def __add(self, record: ResourceBase) -> None:
+        if record.typeName != repoResourceTypeName:
+            return
+        locator = record.getParameter('locator')
+        if locator is None:
+            return
+        repoId = record.getId()
+        key = locator.casefold()
+        self.__reposByLocator[key].add(repoId)
+        self.__locatorsByRepo[repoId] = key
+
+    def __remove(self, repoId: str) -> None:
+        key = self.__locatorsByRepo.pop(repoId, None)
+        if key is not None:
+            repoIds = self.__reposByLocator[key]
+            repoIds.discard(repoId)
+            if not repoIds:
+                del self.__reposByLocator[key]
+
+    def findRepository(self, urls: Iterable[str]) -> Optional[ResourceBase]:
+        """Returns the repository resource of which the locator matches
+        one of the given URLs, or None if there is no such repository.
+        If multiple repositories match, the one with the lowest ID is
+        returned.
+        """
+        reposByLocator = self.__reposByLocator
+        matches: Set[str] = set()
+        for url in urls:
+            repoIds = reposByLocator.get(url.casefold())
+            if repoIds is not None:
+                matches |= repoIds
+        if matches:
+            return self.__resourceDB[min(matches)]
+        else:
+            return None
+
+    def added(self, record: ResourceBase) -> None:
+        self.__add(record)
+
+    def removed(self, record: ResourceBase) -> None:
+        self.__remove(record.getId())
+
+    def updated(self, record: ResourceBase) -> None:
+        self.__remove(record.getId())
+        self.__add(record)
+
+class TaskRunnerMonitor:
+    """Periodically checks all Task Runners for lost connections and
+    the runs they are executing for timeouts.
+
+    A single sweep replaces a timer per Task Runner, which would have to be
+    rescheduled on every sync. The price is that a lost Task Runner or
+    a timed out run is detected up to `interval` seconds late.
+    """
+
+    interval = 10
+    """Number of seconds between sweeps."""
+
+    def __init__(self, resourceDB: ResourceDB, reactor: IReactorTime):
+        self.__resourceDB = resourceDB
+        self.__reactor = reactor
+
+    def start(self) -> None:
+        """Starts periodic sweeps."""
+        self.__reactor.callLater(self.interval, self.__periodic)
+
+    def __periodic(self) -> None:
+        try:
+            self.sweep()
+        finally:
+            self.__reactor.callLater(self.interval, self.__periodic)
+
+    def sweep(self) -> None:
+        """Marks Task Runners that stopped syncing as lost and marks runs
+        that exceeded their timeout to be aborted.
+        """
+        for runner in list(self.__resourceDB.iterTaskRunners()):
+            if not runner.checkLost():
+                run = runner.getRun()
+                if run is not None and run.isTimedOut():
+                    run.markTimedOut()
+
 def recomputeRunning(resourceDB: ResourceDB, taskRunDB: TaskRunDB) -> None:
     '''Scan the task run database for running tasks.
     This is useful when:
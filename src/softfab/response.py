@@ -1,18 +1,25 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from base64 import standard_b64encode
-from gzip import GzipFile
+from gzip import compress
 from hashlib import md5
 from io import BytesIO
-from typing import Optional, Union
+from time import perf_counter
+from typing import Callable, List, Optional, Tuple, Union
+import zlib
 
 from twisted.internet.defer import Deferred
+from twisted.internet.interfaces import IConsumer, IPushProducer
+from twisted.internet.threads import deferToThread
 from twisted.python.failure import Failure
 from twisted.web.http import CACHED
 from twisted.web.iweb import IRequest
 from typing_extensions import NoReturn
+from zope.interface import implementer
+import attr
 
 from softfab.TwistedUtil import getRelativeRoot
+from softfab.config import compressLevel, compressThreshold
 from softfab.reactor import reactor
 from softfab.useragent import AcceptedEncodings, UserAgent
 from softfab.utils import IllegalStateError
@@ -65,6 +72,48 @@ def _encodeHeaderValue(key: bytes, value: str) -> bytes:
     # Provide the UTF-8 and the ASCII version as a fallback.
     return b'''%b="%b"; %b*=UTF-8''%b''' % (key, filteredAscii, key, encoded)
 
+@attr.s(auto_attribs=True)
+class CompressionStats:
+    """Measurements of the compression of buffered response bodies.
+    Sizes are in bytes, durations in seconds.
+    """
+
+    inline: int = 0
+    """Number of bodies compressed on the reactor thread."""
+    offloaded: int = 0
+    """Number of bodies compressed in a worker thread."""
+    bytesIn: int = 0
+    bytesOut: int = 0
+    totalDuration: float = 0.0
+    maxInlineDuration: float = 0.0
+    """Longest time the reactor thread was blocked by compression."""
+
+    def record(self,
+               sizeIn: int,
+               sizeOut: int,
+               duration: float,
+               offloaded: bool
+               ) -> None:
+        if offloaded:
+            self.offloaded += 1
+        else:
+            self.inline += 1
+            self.maxInlineDuration = max(self.maxInlineDuration, duration)
+        self.bytesIn += sizeIn
+        self.bytesOut += sizeOut
+        self.totalDuration += duration
+
+compressionStats = CompressionStats()
+
+def _compressBody(body: bytes) -> Tuple[bytes, float]:
+    """Returns the body compressed with gzip and the time that took.
+    This is safe to call from a worker thread: zlib releases the GIL while
+    it compresses.
+    """
+    start = perf_counter()
+    compressed = compress(body, compressLevel)
+    return compressed, perf_counter() - start
+
 class NotModified(Exception):
     """Raised when we can skip writing the response body because
     the user agent already has an up-to-date version of the resource.
@@ -138,8 +187,44 @@ class ResponseHeaders:
         location = getRelativeRoot(request) + url
         request.setHeader('location', location.encode())
 
+@implementer(IPushProducer)
+class _StreamProducer:
+    """Keeps track of whether the transport wants us to pause writing
+    a streamed response, to avoid buffering data for slow clients.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.paused = False
+        self.__waiting: List[Callable[[], None]] = []
+
+    def whenResumed(self, callback: Callable[[], None]) -> None:
+        """Calls the given function once writing is no longer paused."""
+        if self.paused:
+            self.__waiting.append(callback)
+        else:
+            callback()
+
+    def pauseProducing(self) -> None:
+        self.paused = True
+
+    def resumeProducing(self) -> None:
+        self.paused = False
+        waiting = self.__waiting
+        self.__waiting = []
+        for callback in waiting:
+            callback()
+
+    def stopProducing(self) -> None:
+        # The connection is lost; waiters will be informed about that
+        # when they resume.
+        self.resumeProducing()
+
 class Response(ResponseHeaders):
 
+    streamFlushSize = 65536
+    """When streaming, buffered data is sent once it reaches this size."""
+
     def __init__(self,
                  request: IRequest,
                  frameAncestors: str,
@@ -147,26 +232,95 @@ class Response(ResponseHeaders):
         super().__init__(request, frameAncestors, userAgent)
 
         # Present entire page before deciding whether and how to send it
-        # to the client.
+        # to the client, unless streaming is requested.
         self.__buffer = BytesIO()
-        self.__writeBytes = self.__buffer.write
+        self.__writeBytes: Callable[[bytes], object] = self.__buffer.write
+        self.__consumer: Optional[IConsumer] = None
+        self.__producer: Optional[_StreamProducer] = None
+        self.__compressor: Optional[zlib._Compress] = None
 
         self.__connectionLostFailure: Optional[Failure] = None
         d = request.notifyFinish()
         d.addErrback(self.__connectionLost)
 
-    def setETag(self, etag: bytes) -> None:
-        """Set the given entity tag for this response.
-        Raise NotModified if the tag matches an If-None-Match request header.
-        """
+    def __encodedETag(self, etag: bytes) -> bytes:
         if self._gzipContent:
             # Since encoding the content with gzip changes it, we have to
             # return a different ETag if we use gzip.
             etag += b'-gzip'
-        if self._request.setETag(etag) is CACHED:
+        return etag
+
+    def matchesETag(self, etag: bytes) -> bool:
+        """Return True iff the given entity tag matches an If-None-Match
+        request header, meaning that setETag() would raise NotModified.
+        Unlike setETag(), this does not change the response.
+        """
+        tags = self._request.getHeader(b'if-none-match')
+        if tags is None:
+            return False
+        tagList = tags.split()
+        return self.__encodedETag(etag) in tagList or b'*' in tagList
+
+    def setETag(self, etag: bytes) -> None:
+        """Set the given entity tag for this response.
+        Raise NotModified if the tag matches an If-None-Match request header.
+        """
+        if self._request.setETag(self.__encodedETag(etag)) is CACHED:
             raise NotModified()
 
-    def finish(self) -> None:
+    def startStreaming(self) -> None:
+        """Send the response body while it is being written, instead of
+        buffering it until the response is finished.
+
+        This lowers the time to the first byte and the memory use for large
+        responses. The body is sent using chunked transfer encoding and
+        compressed incrementally. Since the body is not known in advance,
+        no entity tag is created from it.
+
+        This must be called before anything is written. Streaming responders
+        should call `returnToReactor()` regularly: that is when buffered data
+        is flushed and when a slow client can make us wait.
+        """
+        if self.__producer is not None:
+            raise IllegalStateError('Response is already streaming')
+        if self.__buffer.tell() != 0:
+            raise IllegalStateError('Response body was already written')
+        request = self._request
+        self.__setHeaders()
+        if self._gzipContent:
+            request.setHeader('Content-Encoding', 'gzip')
+            # Note: Add 16 to wbits to get gzip framing.
+            self.__compressor = zlib.compressobj(
+                compressLevel, zlib.DEFLATED, zlib.MAX_WBITS + 16
+                )
+        producer = _StreamProducer()
+        self.__producer = producer
+        consumer = IConsumer(request)
+        self.__consumer = consumer
+        consumer.registerProducer(producer, True)
+        self.__writeBytes = self.__streamBytes
+
+    def __streamBytes(self, data: bytes) -> None:
+        buffer = self.__buffer
+        buffer.write(data)
+        if buffer.tell() >= self.streamFlushSize:
+            self.__flush()
+
+    def __flush(self, final: bool = False) -> None:
+        """Sends the buffered data of a streaming response to the client."""
+        buffer = self.__buffer
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        compressor = self.__compressor
+        if compressor is not None:
+            data = compressor.compress(data) + compressor.flush(
+                zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+                )
+        if data and self.__connectionLostFailure is None:
+            self._request.write(data)
+
+    def __setHeaders(self) -> None:
         request = self._request
 
         request.setHeader(
@@ -185,6 +339,19 @@ class Response(ResponseHeaders):
             'Cache-Control', 'private, must-revalidate, max-age=0'
             )
 
+    async def finish(self) -> None:
+        request = self._request
+
+        consumer = self.__consumer
+        if consumer is not None:
+            self.__flush(final=True)
+            self.__buffer.close()
+            self.__writeBytes = writeAfterFinish
+            consumer.unregisterProducer()
+            return
+
+        self.__setHeaders()
+
         body = self.__buffer.getvalue()
         self.__buffer.close()
         # Any write attempt after this is an error.
@@ -200,10 +367,17 @@ class Response(ResponseHeaders):
 
         if self._gzipContent:
             request.setHeader('Content-Encoding', 'gzip')
-            # Note: Some quick measurements show that compression level 6 gives
-            #       a good balance between resulting size and CPU power needed.
-            with GzipFile(None, 'wb', 6, request) as zfile:
-                zfile.write(body)
+            # Compressing a large body can take long enough to delay other
+            # requests, so do that in a worker thread.
+            offload = len(body) > compressThreshold
+            if offload:
+                compressed, duration = await deferToThread(_compressBody, body)
+            else:
+                compressed, duration = _compressBody(body)
+            compressionStats.record(len(body), len(compressed), duration,
+                                    offload)
+            if self.__connectionLostFailure is None:
+                request.write(compressed)
         else:
             request.write(body)
 
@@ -224,11 +398,24 @@ class Response(ResponseHeaders):
                 for chunk in chop(proc.records, 1000):
                     response.writeXML(record.format() for record in chunk)
                     await response.returnToReactor()
+
+        If the response is streaming, the data written so far is sent
+        to the client and the Deferred does not fire until the client
+        is ready to receive more.
         '''
         d = Deferred()
-        reactor.callLater(0, self.__resume, d)
+        producer = self.__producer
+        if producer is None:
+            reactor.callLater(0, self.__resume, d)
+        else:
+            # Send what we have so far and wait if the client cannot keep up.
+            self.__flush()
+            producer.whenResumed(lambda: self.__resumeLater(d))
         return d
 
+    def __resumeLater(self, d: Deferred) -> None:
+        reactor.callLater(0, self.__resume, d)
+
     def __resume(self, d: Deferred) -> None:
         """Helper method for `returnToReactor()`."""
         lost = self.__connectionLostFailure
@@ -1,7 +1,9 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from collections import OrderedDict
 from pathlib import Path
-from typing import Iterable, Iterator, Mapping, Set, Tuple
+from typing import Dict, Iterable, Iterator, Mapping, Set, Tuple
+import os
 import re
 
 import attr
@@ -11,10 +13,97 @@ import attr
 _reKey = re.compile('^[A-Za-z0-9+_-][A-Za-z0-9.+_ -]*$')
 """Regular expression which defines all valid keys."""
 
+_columnSuffix = '@col'
+"""File name suffix of a column file: the file that contains all values
+stored for one key of one task.
+The suffix contains a character that is not allowed in keys, so the name
+of a column file never equals a key.
+"""
+
+_maxCachedColumns = 64
+"""Maximum number of columns to keep in memory."""
+
+class _Column:
+    """The values from a column file that have been read so far.
+
+    Column files are only appended to, so when a file has grown, only
+    the new part has to be read.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.inode = -1
+        self.offset = 0
+        self.values: Dict[str, str] = {}
+
+    def refresh(self, path: Path) -> None:
+        try:
+            with open(path, 'rb') as inp:
+                stat = os.fstat(inp.fileno())
+                if stat.st_ino != self.inode or stat.st_size < self.offset:
+                    # File was replaced; start over.
+                    self.inode = stat.st_ino
+                    self.offset = 0
+                    self.values = {}
+                if stat.st_size == self.offset:
+                    return
+                inp.seek(self.offset)
+                data = inp.read()
+        except FileNotFoundError:
+            self.inode = -1
+            self.offset = 0
+            self.values = {}
+            return
+
+        # Ignore an incomplete last line: it is either still being written
+        # or the result of an interrupted write.
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        values = self.values
+        for line in data[:end].decode('utf-8').split('\n')[:-1]:
+            runId, _, value = line.partition('\t')
+            values[runId] = value
+
+# Note: There can be multiple ResultStorage instances for the same path,
+#       so the cache is kept outside of them.
+_columnCache: 'OrderedDict[Path, _Column]' = OrderedDict()
+
+def _readColumn(path: Path) -> Mapping[str, str]:
+    """Returns a mapping from run ID to value containing all values
+    in the given column file.
+    """
+    column = _columnCache.pop(path, None)
+    if column is None:
+        column = _Column()
+    _columnCache[path] = column
+    if len(_columnCache) > _maxCachedColumns:
+        _columnCache.popitem(last=False)
+    column.refresh(path)
+    return column.values
+
+def _readOldValue(path: Path) -> str:
+    # Only the first line of a value is used.
+    with open(path) as inp:
+        return inp.readline().rstrip('\n')
+
+def _formatLine(runId: str, value: str) -> str:
+    # A value is stored on a single line.
+    newline = value.find('\n')
+    if newline != -1:
+        value = value[:newline]
+    return f'{runId}\t{value}\n'
+
 @attr.s(auto_attribs=True, frozen=True)
 class ResultStorage:
     basePath: Path
-    """Values are stored in "<base>/<taskdef>/<key>/<taskrun>"."""
+    """Values are stored in "<base>/<taskdef>/<key>@col", with one line
+    per task run that contains the run ID and the value, separated by
+    a tab character.
+
+    Older versions stored every value in a separate file named
+    "<base>/<taskdef>/<key>/<taskrun>"; convert() moves those values
+    to column files.
+    """
 
     def getCustomKeys(self, taskName: str) -> Set[str]:
         """Get the set of used-defined keys that exist for the given task name.
@@ -25,7 +114,13 @@ class ResultStorage:
         taskPath = self.basePath / taskName
         keys: Set[str] = set()
         if taskPath.is_dir():
-            keys.update(path.name for path in taskPath.iterdir())
+            for path in taskPath.iterdir():
+                name = path.name
+                if path.is_dir():
+                    # Key that has not been converted yet.
+                    keys.add(name)
+                elif name.endswith(_columnSuffix):
+                    keys.add(name[:-len(_columnSuffix)])
         return keys
 
     def getCustomData(self,
@@ -40,15 +135,23 @@ class ResultStorage:
         should take care that they are secure.
         """
 
-        valuePath = self.basePath / taskName / key
+        if _reKey.match(key) is None:
+            return
+        taskPath = self.basePath / taskName
+        values = _readColumn(taskPath / (key + _columnSuffix))
+        valuePath = taskPath / key
+        oldLayout = valuePath.is_dir()
         for run in runIds:
-            try:
-                with open(valuePath / run) as inp:
-                    value = inp.readline()
+            value = values.get(run)
+            if value is not None:
                 yield run, value
-            except OSError:
-                # Not all runs are guaranteed to have values stored.
-                pass
+            elif oldLayout:
+                try:
+                    value = _readOldValue(valuePath / run)
+                    yield run, value
+                except OSError:
+                    # Not all runs are guaranteed to have values stored.
+                    pass
 
     def putData(self,
                 taskName: str,
@@ -66,8 +169,43 @@ class ResultStorage:
 
         # Insert new data.
         taskPath = self.basePath / taskName
+        taskPath.mkdir(parents=True, exist_ok=True)
         for key, value in data.items():
-            keyPath = taskPath / key
-            keyPath.mkdir(parents=True, exist_ok=True)
-            with open(keyPath / runId, 'w') as out:
-                out.write(value)
+            columnPath = taskPath / (key + _columnSuffix)
+            with open(columnPath, 'a', encoding='utf-8') as out:
+                out.write(_formatLine(runId, value))
+
+    def convert(self) -> int:
+        """Moves values stored in the old one-file-per-value layout
+        into column files.
+        Returns the number of values that were moved.
+        """
+
+        count = 0
+        if not self.basePath.is_dir():
+            return count
+        for taskPath in self.basePath.iterdir():
+            if not taskPath.is_dir():
+                continue
+            for keyPath in taskPath.iterdir():
+                if not keyPath.is_dir():
+                    continue
+                valuePaths = sorted(keyPath.iterdir())
+                lines = []
+                for valuePath in valuePaths:
+                    value = _readOldValue(valuePath)
+                    lines.append(_formatLine(valuePath.name, value))
+                # Append to values stored since the upgrade, if any, but
+                # have those take precedence.
+                columnPath = taskPath / (keyPath.name + _columnSuffix)
+                newerPath = columnPath.with_name(columnPath.name + '.new')
+                with open(newerPath, 'w', encoding='utf-8') as out:
+                    out.writelines(lines)
+                    if columnPath.exists():
+                        out.write(columnPath.read_text(encoding='utf-8'))
+                newerPath.replace(columnPath)
+                for valuePath in valuePaths:
+                    valuePath.unlink()
+                keyPath.rmdir()
+                count += len(valuePaths)
+        return count
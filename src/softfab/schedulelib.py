@@ -48,17 +48,20 @@ A: For repeating schedules, advance to next time.
    For non-repeating schedules, run as soon as schedule is resumed.
 '''
 
+from asyncio import sleep
 from enum import Enum
 from pathlib import Path
+from time import perf_counter
 from typing import (
-    Callable, Dict, Iterator, List, Mapping, MutableSet, Optional, Sequence,
-    Tuple, cast
+    Callable, Dict, List, Mapping, MutableSet, Optional, Sequence, Tuple, cast
 )
 import logging
 import time
 
 from twisted.internet.interfaces import IReactorTime
+import attr
 
+from softfab.TwistedUtil import runCoroutine
 from softfab.configlib import ConfigDB
 from softfab.databaselib import Database, RecordObserver
 from softfab.joblib import Job, JobDB
@@ -148,8 +151,48 @@ class _JobDBObserver(RecordObserver[Job]):
                 for observer in self.__observers:
                     observer(record, schedule)
 
+@attr.s(auto_attribs=True)
+class TriggerStats:
+    """Measurements of the trigger bursts performed so far.
+    A trigger burst instantiates all schedules that are due at a certain
+    moment, possibly spread over multiple reactor turns.
+    Durations are in seconds.
+    """
+
+    bursts: int = 0
+    triggered: int = 0
+    lastTriggered: int = 0
+    lastTurns: int = 0
+    lastBusy: float = 0.0
+    """Time spent triggering schedules during the last burst."""
+    lastDuration: float = 0.0
+    """Time from start to end of the last burst, including the time
+    the reactor spent on other work in between turns."""
+    maxDuration: float = 0.0
+
+    def record(self,
+               triggered: int,
+               turns: int,
+               busy: float,
+               duration: float
+               ) -> None:
+        self.bursts += 1
+        self.triggered += triggered
+        self.lastTriggered = triggered
+        self.lastTurns = turns
+        self.lastBusy = busy
+        self.lastDuration = duration
+        self.maxDuration = max(self.maxDuration, duration)
+
 class ScheduleManager(RecordObserver['Scheduled']):
 
+    timeBudget = 0.1
+    """Maximum number of seconds to spend triggering schedules before
+    returning control to the reactor, to keep the Control Center responsive
+    when many schedules are due at the same time.
+    At least one schedule is triggered per reactor turn.
+    """
+
     def __init__(self,
                  configDB: ConfigDB,
                  jobDB: JobDB,
@@ -170,6 +213,15 @@ class ScheduleManager(RecordObserver['Scheduled']):
         self.__heap: Heap[Scheduled] = Heap(key=lambda schedule:
             (schedule.startTime, schedule.getId())
             )
+        self.__queued: Dict[str, Tuple[Scheduled, int]] = {}
+        """Maps schedule ID to the schedule record in the heap and
+        the start time it was queued with.
+        """
+        self.__triggerUntil: Optional[int] = None
+        """Time up to which schedules are being triggered by the current
+        trigger burst, or None if no burst is in progress.
+        """
+        self.stats = TriggerStats()
         for schedule in scheduleDB:
             self.added(schedule)
 
@@ -185,6 +237,7 @@ class ScheduleManager(RecordObserver['Scheduled']):
             if unfinishedJobIds is not None:
                 unfinishedJobIds.discard(job.getId())
                 if not unfinishedJobIds:
+                    del self.__runningJobs[scheduleId]
                     schedule._jobsFinished() # pylint: disable=protected-access
                     self.updated(schedule)
 
@@ -203,41 +256,80 @@ class ScheduleManager(RecordObserver['Scheduled']):
 
         if not schedule.isBlocked():
             self.__heap.add(schedule)
+            self.__queued[schedule.getId()] = schedule, schedule.startTime
             # If the new schedule should start right away, trigger it.
             # Doing this call via the reactor makes sure that no schedules
             # are instantiated on upgrade.
             self.__reactor.callLater(0, self.__triggerSchedules, getTime())
 
     def __removeFromQueue(self, schedule: 'Scheduled') -> None:
-        try:
-            self.__heap.remove(schedule)
-        except ValueError:
-            pass
+        queued = self.__queued.pop(schedule.getId(), None)
+        if queued is not None:
+            self.__heap.remove(queued[0])
         self.__runningJobs.pop(schedule.getId(), None)
 
     def __triggerSchedules(self, untilSecs: int) -> None:
         '''Create jobs for all schedules which have a start time that is
         before or equal to 'untilSecs'.
         '''
-        # Checks if smallest item in heap is lower than current time.
-        # If yes, clone and change 'startTime' in the database.
+        triggerUntil = self.__triggerUntil
+        if triggerUntil is None:
+            self.__triggerUntil = untilSecs
+            runCoroutine(self.__reactor, self.__triggerBurst())
+        else:
+            # Let the burst that is in progress handle this request too.
+            self.__triggerUntil = max(triggerUntil, untilSecs)
+
+    async def __triggerBurst(self) -> None:
         heap = self.__heap
-        while True:
-            nextSchedule = heap.peek()
-            if nextSchedule is None or nextSchedule.startTime > untilSecs:
-                break
-            heap.pop()
-            try:
-                jobIds = list(
-                    nextSchedule.createJobs(self.configDB, self.jobDB)
-                    )
-            except Exception:
-                # Make sure the schedule is updated in the DB even
-                # if job creation failed.
-                logging.exception('Error creating jobs from schedule "%s"',
-                                  nextSchedule.getId())
-                jobIds = []
-            nextSchedule.trigger(untilSecs, jobIds)
+        timeBudget = self.timeBudget
+        startTime = perf_counter()
+        turnStart = startTime
+        busy = 0.0
+        triggered = 0
+        turnTriggered = 0
+        turns = 1
+        try:
+            while True:
+                # Checks if smallest item in heap is lower than current time.
+                # If yes, clone and change 'startTime' in the database.
+                untilSecs = self.__triggerUntil
+                assert untilSecs is not None
+                nextSchedule = heap.peek()
+                if nextSchedule is None or nextSchedule.startTime > untilSecs:
+                    break
+
+                # Return control to the reactor if we're out of time.
+                now = perf_counter()
+                if turnTriggered and now - turnStart >= timeBudget:
+                    busy += now - turnStart
+                    await sleep(0)
+                    turnStart = perf_counter()
+                    turnTriggered = 0
+                    turns += 1
+                    continue
+
+                heap.pop()
+                del self.__queued[nextSchedule.getId()]
+                try:
+                    jobIds = nextSchedule.createJobs(self.configDB, self.jobDB)
+                except Exception:
+                    # Make sure the schedule is updated in the DB even
+                    # if job creation failed.
+                    logging.exception(
+                        'Error creating jobs from schedule "%s"',
+                        nextSchedule.getId()
+                        )
+                    jobIds = []
+                nextSchedule.trigger(untilSecs, jobIds)
+                triggered += 1
+                turnTriggered += 1
+        finally:
+            self.__triggerUntil = None
+            now = perf_counter()
+            busy += now - turnStart
+            if triggered:
+                self.stats.record(triggered, turns, busy, now - startTime)
 
     def added(self, record: 'Scheduled') -> None:
         self.__addToQueue(record)
@@ -246,8 +338,18 @@ class ScheduleManager(RecordObserver['Scheduled']):
         self.__removeFromQueue(record)
 
     def updated(self, record: 'Scheduled') -> None:
-        self.__removeFromQueue(record)
-        self.__addToQueue(record)
+        queued = self.__queued.get(record.getId())
+        if queued is not None and queued[0] is record \
+                and not record.isBlocked():
+            # The schedule remains queued; only its position might change.
+            startTime = record.startTime
+            if startTime != queued[1]:
+                self.__queued[record.getId()] = record, startTime
+                self.__heap.update(record)
+                self.__reactor.callLater(0, self.__triggerSchedules, getTime())
+        else:
+            self.__removeFromQueue(record)
+            self.__addToQueue(record)
 
     def trigger(self, scheduledMinute: int = 0) -> None:
         currentSecs = getTime()
@@ -610,20 +712,22 @@ class Scheduled(XMLTag, SelectableRecordABC):
 
         self._notify()
 
-    def createJobs(self, configDB: ConfigDB, jobDB: JobDB) -> Iterator[str]:
+    def createJobs(self, configDB: ConfigDB, jobDB: JobDB) -> List[str]:
         """Create a job from each matched configuration.
-        Yield the IDs of the created jobs.
+        The jobs are added to the job database in a single batch.
+        Return the IDs of the created jobs.
         """
 
+        jobs: List[Job] = []
         for configId in self.getMatchingConfigIds(configDB):
             try:
                 config = configDB[configId]
                 if config.hasValidInputs():
-                    for job in config.createJobs(self.owner):
+                    configJobs = list(config.createJobs(self.owner))
+                    for job in configJobs:
                         job.comment += '\n' + self.comment
                         job.setScheduledBy(self.getId())
-                        jobDB.add(job)
-                        yield job.getId()
+                    jobs += configJobs
                 else:
                     logging.warning(
                         'Schedule "%s" could not instantiate '
@@ -637,6 +741,8 @@ class Scheduled(XMLTag, SelectableRecordABC):
                     'Schedule "%s" failed to instantiate configuration "%s"',
                     self.getId(), configId
                     )
+        jobDB.addMany(jobs)
+        return [job.getId() for job in jobs]
 
     def _getContent(self) -> XMLContent:
         yield xml.comment[ self.__comment ]
@@ -4,7 +4,7 @@ from abc import ABC
 from collections import defaultdict
 from typing import (
     AbstractSet, Callable, DefaultDict, Dict, ItemsView, Iterable, Iterator,
-    Mapping, Optional, Sequence, Set, TypeVar
+    Mapping, Optional, Sequence, Set, Tuple, TypeVar
 )
 
 from typing_extensions import Protocol
@@ -83,6 +83,10 @@ class Tags(Selectable):
         values |= additions
 
 class TagCache:
+    """Keeps track of the tags used in a collection of records.
+    Besides the tag values in use, it keeps an inverted index that maps
+    each tag key and value to the IDs of the records that carry that tag.
+    """
 
     def __init__(self,
                  items: Iterable['SelectableRecordABC'],
@@ -91,26 +95,54 @@ class TagCache:
         super().__init__()
         self.__getKeys = getKeys
         self.__items = items
-        self.__tags: DefaultDict[str, Set[str]] = defaultdict(set)
+        self.__index: DefaultDict[str, Dict[str, Set[str]]] = \
+            defaultdict(dict)
+        """Maps tag key and tag value to the IDs of records tagged with
+        that value."""
+        self.__recordTags: Dict[str, Sequence[Tuple[str, str]]] = {}
+        """Maps record ID to the tag key-value pairs it was indexed with."""
 
     def __str__(self) -> str:
         return 'TagCache(%s)' % ', '.join(
-            '%s: %s' % (key, ', '.join(self.__tags.get(key, ())))
+            '%s: %s' % (key, ', '.join(self.__index.get(key, ())))
             for key in self.__getKeys()
             )
 
-    def _load(self, key: str, value: str) -> None:
-        self.__tags[key].add(value)
-
     def _refreshCache(self) -> None:
-        self.__tags.clear()
+        self.__index.clear()
+        self.__recordTags.clear()
         for item in self.__items:
-            self._updateCache(item.tags)
-
-    def _updateCache(self, tags: Tags) -> None:
-        for key, values in tags._tagItems(): # pylint: disable=protected-access
-            if values:
-                self.__tags[key].update(values)
+            self._addRecord(item)
+
+    def _addRecord(self, record: 'SelectableRecordABC') -> None:
+        """Adds the tags of the given record to the index."""
+        recordId = record.getId()
+        pairs = tuple(
+            (key, value)
+            # pylint: disable=protected-access
+            for key, values in record.tags._tagItems()
+            for value in values
+            )
+        index = self.__index
+        for key, value in pairs:
+            recordIds = index[key].get(value)
+            if recordIds is None:
+                index[key][value] = recordIds = set()
+            recordIds.add(recordId)
+        self.__recordTags[recordId] = pairs
+
+    def _removeRecord(self, recordId: str) -> None:
+        """Removes the tags of the record with the given ID from the index."""
+        pairs = self.__recordTags.pop(recordId, ())
+        index = self.__index
+        for key, value in pairs:
+            valuesForKey = index[key]
+            recordIds = valuesForKey[value]
+            recordIds.discard(recordId)
+            if not recordIds:
+                del valuesForKey[value]
+                if not valuesForKey:
+                    del index[key]
 
     def getKeys(self) -> Sequence[str]:
         return self.__getKeys()
@@ -118,13 +150,25 @@ class TagCache:
     def getValues(self, key: str) -> Iterable[str]:
         '''Returns the display values for the given tag key.
         '''
-        return self.__tags.get(key, ())
+        return self.__index.get(key, {}).keys()
 
     def hasValue(self, key: str, value: str) -> bool:
         '''Returns True iff the given value exists for the given key.
         '''
-        values = self.__tags.get(key)
-        return values is not None and value in values
+        valuesForKey = self.__index.get(key)
+        return valuesForKey is not None and value in valuesForKey
+
+    def getRecordIds(self, key: str, value: str) -> AbstractSet[str]:
+        """Returns the IDs of the records that are tagged with the given
+        value for the given key.
+        The returned set must not be modified and can change when records
+        are tagged or untagged; make a copy if it is needed for longer.
+        """
+        valuesForKey = self.__index.get(key)
+        if valuesForKey is None:
+            return frozenset()
+        else:
+            return valuesForKey.get(value, frozenset())
 
 class SelectableRecordABC(DatabaseElem, ABC):
     """Abstract base class for database records that support tagging."""
@@ -156,13 +200,14 @@ class ObservingTagCache(TagCache, RecordObserver[SelectableRecord]):
         db.addObserver(self)
 
     def added(self, record: SelectableRecord) -> None:
-        self._updateCache(record.tags)
+        self._addRecord(record)
 
     def removed(self, record: SelectableRecord) -> None:
-        self._refreshCache()
+        self._removeRecord(record.getId())
 
     def updated(self, record: SelectableRecord) -> None:
-        self._refreshCache()
+        self._removeRecord(record.getId())
+        self._addRecord(record)
 
 def getCommonTags(tagKeys: Iterable[str],
                   items: Iterable[Selectable]
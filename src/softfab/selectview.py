@@ -198,22 +198,21 @@ class SelectProcMixin(Generic[BasketArgsT, SelectableRecord]):
         if tagKey:
             assert tagValue is not None
             if tagValue:
-                # The casts are necessary because mypy seems to ignore
+                db = self.db
+                return [
+                    db[recordId]
+                    for recordId in self.tagCache.getRecordIds(tagKey,
+                                                               tagValue)
+                    ]
+            else:
+                # The cast is necessary because mypy seems to ignore
                 # the narrowed type in the parameter default value.
                 #   https://github.com/python/mypy/issues/2608
-                def valueFilter(record: SelectableRecord,
-                                tagKey: str = cast(str, tagKey),
-                                tagValue: str = cast(str, tagValue)
-                                ) -> bool:
-                    return record.tags.hasTagValue(tagKey, tagValue)
-                recordFilter = CustomFilter(valueFilter)
-            else:
                 def keyFilter(record: SelectableRecord,
                               tagKey: str = cast(str, tagKey)
                               ) -> bool:
                     return not record.tags.hasTagKey(tagKey)
-                recordFilter = CustomFilter(keyFilter)
-            return runQuery(( recordFilter, ), self.db)
+                return runQuery(( CustomFilter(keyFilter), ), self.db)
         else:
             return self.db
 
@@ -1,7 +1,13 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from abc import ABC
-from typing import Callable, ClassVar, Iterator, Sequence, Tuple
+from bisect import bisect_left
+from heapq import merge
+from operator import itemgetter
+from typing import (
+    Callable, ClassVar, Generic, Iterable, Iterator, List, Sequence, Tuple,
+    cast
+)
 
 from softfab.databaselib import (
     DBRecord, Database, RecordObserver, RecordSubjectMixin, Retriever
@@ -9,29 +15,145 @@ from softfab.databaselib import (
 from softfab.utils import Comparable, abstract
 
 
-def binarySearch(lst: Sequence[DBRecord],
-                 elem: DBRecord,
-                 key: Retriever[DBRecord, Comparable]
-                 ) -> Tuple[bool, int]:
-    high = len(lst)
-    if high == 0:
-        return False, 0
-    low = 0
-    elemKey = key(elem)
-    # inv: if elem in lst then elem in lst[low..high)
-    while high - low > 1:
-        mid = (low + high) // 2
-        if elemKey < key(lst[mid]):
-            high = mid
+class SortedRecords(Generic[DBRecord]):
+    """A list of records sorted by key, stored in chunks.
+
+    The sort key of every record is computed once when the record is added
+    and kept in a key list next to the record list of each chunk. Searching
+    does a bisection on the last keys of the chunks and then on the keys
+    within a chunk, so the key function is not called for every comparison.
+    Inserting or deleting a record is linear in the chunk size instead of
+    in the total number of records.
+
+    Sort keys must be unique.
+    """
+
+    chunkSize = 512
+    """Chunks are split when they grow to twice this size."""
+
+    def __init__(self,
+                 records: Iterable[DBRecord],
+                 keyFunc: Retriever[DBRecord, Comparable]
+                 ):
+        super().__init__()
+        self.__keyFunc = keyFunc
+        self.__keyChunks: List[List[Comparable]] = []
+        self.__recordChunks: List[List[DBRecord]] = []
+        self.__lastKeys: List[Comparable] = []
+        self.__length = 0
+        self.__build(sorted(
+            ((keyFunc(record), record) for record in records),
+            key=itemgetter(0)
+            ))
+
+    def __build(self, pairs: Sequence[Tuple[Comparable, DBRecord]]) -> None:
+        # Note: Assign new lists instead of modifying the old ones,
+        #       so iterations that are in progress are not disturbed.
+        chunkSize = self.chunkSize
+        keyChunks = []
+        recordChunks = []
+        for start in range(0, len(pairs), chunkSize):
+            chunk = pairs[start:start + chunkSize]
+            keyChunks.append([key for key, record_ in chunk])
+            recordChunks.append([record for key_, record in chunk])
+        self.__keyChunks = keyChunks
+        self.__recordChunks = recordChunks
+        self.__lastKeys = [keys[-1] for keys in keyChunks]
+        self.__length = len(pairs)
+
+    def __iter__(self) -> Iterator[DBRecord]:
+        for records in self.__recordChunks:
+            yield from records
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def __getitem__(self, index: int) -> DBRecord:
+        if index < 0:
+            index += self.__length
+        if 0 <= index < self.__length:
+            for records in self.__recordChunks:
+                if index < len(records):
+                    return records[index]
+                index -= len(records)
+        raise IndexError(index)
+
+    def __contains__(self, record: DBRecord) -> bool:
+        key = self.__keyFunc(record)
+        chunkIndex = bisect_left(self.__lastKeys, key)
+        if chunkIndex == len(self.__lastKeys):
+            return False
+        keys = self.__keyChunks[chunkIndex]
+        return keys[bisect_left(keys, key)] == key
+
+    def insert(self, record: DBRecord) -> None:
+        """Inserts a record that is not yet in this list."""
+        key = self.__keyFunc(record)
+        lastKeys = self.__lastKeys
+        if not lastKeys:
+            self.__build([(key, record)])
+            return
+        chunkIndex = bisect_left(lastKeys, key)
+        if chunkIndex == len(lastKeys):
+            chunkIndex -= 1
+        keys = self.__keyChunks[chunkIndex]
+        records = self.__recordChunks[chunkIndex]
+        index = bisect_left(keys, key)
+        assert index == len(keys) or keys[index] != key, key
+        keys.insert(index, key)
+        records.insert(index, record)
+        lastKeys[chunkIndex] = keys[-1]
+        self.__length += 1
+
+        chunkSize = self.chunkSize
+        if len(keys) >= 2 * chunkSize:
+            # Split chunk in halves.
+            self.__keyChunks.insert(chunkIndex + 1, keys[chunkSize:])
+            self.__recordChunks.insert(chunkIndex + 1, records[chunkSize:])
+            del keys[chunkSize:]
+            del records[chunkSize:]
+            lastKeys.insert(chunkIndex, keys[-1])
+
+    def insertMany(self, records: Iterable[DBRecord]) -> None:
+        """Inserts multiple records that are not yet in this list.
+        This rebuilds the list in linear time, which is cheaper than
+        inserting many records one by one.
+        """
+        keyFunc = self.__keyFunc
+        newPairs = sorted(
+            ((keyFunc(record), record) for record in records),
+            key=itemgetter(0)
+            )
+        oldPairs = (
+            pair
+            for keys, records in zip(self.__keyChunks, self.__recordChunks)
+            for pair in zip(keys, records)
+            )
+        self.__build(list(merge(oldPairs, newPairs, key=itemgetter(0))))
+
+    def remove(self, record: DBRecord) -> bool:
+        """Removes a record from this list.
+        Returns True if the record was removed, False if it was not found.
+        """
+        key = self.__keyFunc(record)
+        lastKeys = self.__lastKeys
+        chunkIndex = bisect_left(lastKeys, key)
+        if chunkIndex == len(lastKeys):
+            return False
+        keys = self.__keyChunks[chunkIndex]
+        index = bisect_left(keys, key)
+        if keys[index] != key:
+            return False
+        del keys[index]
+        del self.__recordChunks[chunkIndex][index]
+        self.__length -= 1
+        if keys:
+            lastKeys[chunkIndex] = keys[-1]
         else:
-            low = mid
-    lowKey = key(lst[low])
-    if elemKey == lowKey:
-        return True, low
-    elif elemKey < lowKey:
-        return False, low
-    else: # elemKey > lowKey
-        return False, high
+            del self.__keyChunks[chunkIndex]
+            del self.__recordChunks[chunkIndex]
+            del lastKeys[chunkIndex]
+        return True
 
 class SortedQueue(RecordSubjectMixin[DBRecord], RecordObserver[DBRecord], ABC):
     '''Base class for sorted subsets of databases.
@@ -45,9 +167,9 @@ class SortedQueue(RecordSubjectMixin[DBRecord], RecordObserver[DBRecord], ABC):
 
         # Compute initial record set.
         filterFunc = self._filter
-        self._records = sorted(
+        self._records = SortedRecords(
             (record for record in db if filterFunc(record)),
-            key=keyFunc
+            keyFunc
             )
 
         db.addObserver(self)
@@ -67,6 +189,9 @@ class SortedQueue(RecordSubjectMixin[DBRecord], RecordObserver[DBRecord], ABC):
     def __len__(self) -> int:
         return len(self._records)
 
+    def __contains__(self, record: object) -> bool:
+        return cast(DBRecord, record) in self._records
+
     def _filter(self, record: DBRecord) -> bool: # pylint: disable=unused-argument
         '''By default every record is part of the queue.
         If you only want a subset, override this method to return True iff
@@ -99,26 +224,31 @@ class SortedQueue(RecordSubjectMixin[DBRecord], RecordObserver[DBRecord], ABC):
 
     def added(self, record: DBRecord) -> None:
         if self._filter(record):
-            found, index = binarySearch(self._records, record, self.__keyFunc)
-            assert not found
-            self._records.insert(index, record)
+            self._records.insert(record)
             self._notifyAdded(record)
 
+    def addedMany(self, records: Sequence[DBRecord]) -> None:
+        filterFunc = self._filter
+        newRecords = [record for record in records if filterFunc(record)]
+        if newRecords:
+            self._records.insertMany(newRecords)
+            newRecords.sort(key=self.__keyFunc)
+            self._notifyAddedMany(newRecords)
+
     def removed(self, record: DBRecord) -> None:
-        found, index = binarySearch(self._records, record, self.__keyFunc)
-        if found:
-            del self._records[index]
+        if self._records.remove(record):
             self._notifyRemoved(record)
 
     def updated(self, record: DBRecord) -> None:
-        found, index = binarySearch(self._records, record, self.__keyFunc)
+        records = self._records
+        found = record in records
         if found == self._filter(record):
             if found:
                 self._notifyUpdated(record)
         else:
             if found:
-                del self._records[index]
+                records.remove(record)
                 self._notifyRemoved(record)
             else:
-                self._records.insert(index, record)
+                records.insert(record)
                 self._notifyAdded(record)
@@ -47,6 +47,36 @@ class ProductProto(Protocol):
 TaskT = TypeVar('TaskT', bound=TaskProto)
 TaskElem = Union[TaskT, 'TaskGroup[TaskT]']
 
+class TaskGraph(Generic[TaskT]):
+    '''Index of the tasks that produce and consume each product.
+
+    Building the index takes a single pass over the tasks; after that,
+    looking up producers or consumers no longer requires scanning all tasks,
+    which matters for jobs with thousands of tasks.
+    '''
+
+    def __init__(self, tasks: Iterable[TaskT]):
+        super().__init__()
+        producers: DefaultDict[str, List[TaskT]] = defaultdict(list)
+        consumers: DefaultDict[str, List[TaskT]] = defaultdict(list)
+        for task in tasks:
+            for productName in task.getOutputs():
+                producers[productName].append(task)
+            for productName in task.getInputs():
+                consumers[productName].append(task)
+        self.__producers: Dict[str, Sequence[TaskT]] = dict(producers)
+        self.__consumers: Dict[str, Sequence[TaskT]] = dict(consumers)
+
+    def getProducers(self, productName: str) -> Sequence[TaskT]:
+        '''Returns the tasks that have the given product as an output.
+        '''
+        return self.__producers.get(productName, ())
+
+    def getConsumers(self, productName: str) -> Sequence[TaskT]:
+        '''Returns the tasks that have the given product as an input.
+        '''
+        return self.__consumers.get(productName, ())
+
 class TaskSet(Generic[TaskT]):
 
     def __init__(self) -> None:
@@ -66,7 +96,14 @@ class TaskSet(Generic[TaskT]):
             outputs |= task.getOutputs()
         return inputs - outputs
 
+    def _getGraph(self) -> TaskGraph[TaskT]:
+        '''Returns a producer/consumer index of the tasks in this set.
+        Subclasses of which the tasks do not change can cache the result.
+        '''
+        return TaskGraph(self._tasks.values())
+
     def _getMainGroup(self) -> 'TaskGroup[TaskT]':
+        graph = self._getGraph()
         unionFind: UnionFind[Tuple[str, str]] = UnionFind()
         local: ResultKeeper[str, bool] = ResultKeeper(
             lambda prodName: self.getProductDef(prodName).isLocal()
@@ -93,27 +130,23 @@ class TaskSet(Generic[TaskT]):
                     locations.discard(None)
                     assert len(locations) <= 1
                     localAt = locations.pop() if locations else None
-                    yield LocalGroup(self, tasks, localAt)
+                    yield LocalGroup(self, graph, tasks, localAt)
                 else:
                     assert len(tasks) == 1
                     yield tasks[0]
-        return _MainGroup(self, iterGroupedTasks())
+        return _MainGroup(self, graph, iterGroupedTasks())
 
     def getProducers(self, productName: str) -> Iterator[TaskT]:
         '''Returns an iterator which contains all task objects which have
         the given product as an output.
         '''
-        for task in self._tasks.values():
-            if productName in task.getOutputs():
-                yield task
+        return iter(self._getGraph().getProducers(productName))
 
     def getConsumers(self, productName: str) -> Iterator[TaskT]:
         '''Returns an iterator which contains all task objects which have
         the given product as an input.
         '''
-        for task in self._tasks.values():
-            if productName in task.getInputs():
-                yield task
+        return iter(self._getGraph().getConsumers(productName))
 
     def getProductDef(self, name: str) -> ProductDef:
         '''Returns the definition of the product with the given name.
@@ -250,9 +283,14 @@ class TaskGroup(PriorityMixin, Generic[TaskT]):
           dropped.
     '''
 
-    def __init__(self, parent: TaskSet[TaskT], tasks: Iterable[TaskElem]):
+    def __init__(self,
+                 parent: TaskSet[TaskT],
+                 graph: TaskGraph[TaskT],
+                 tasks: Iterable[TaskElem]
+                 ):
         super().__init__()
         self._parent = parent
+        self._graph = graph
         self.__tasks = {task.getName(): task for task in tasks}
         self.__inputs: Optional[FrozenSet[str]] = None
         self.__outputs: Optional[FrozenSet[str]] = None
@@ -262,13 +300,10 @@ class TaskGroup(PriorityMixin, Generic[TaskT]):
         self.__neededCaps: Optional[AbstractSet[str]] = None
 
     def __computeSequences(self) -> None:
-        # Precalculate which tasks produce which products.
-        # Note: The tasks from _parent are flattened (no TaskGroups).
-        remainingProducers: DefaultDict[str, MutableSet[str]] = \
-                defaultdict(set)
-        for parentTask in self._parent.getTasks():
-            for productName in parentTask.getOutputs():
-                remainingProducers[productName].add(parentTask.getName())
+        # Names of the tasks that have yet to produce each combined product.
+        # Note: The tasks in the graph are flattened (no TaskGroups).
+        graph = self._graph
+        remainingProducers: Dict[str, MutableSet[str]] = {}
 
         tasksLeft: Dict[str, TaskElem] = dict(self.__tasks)
         availableProducts = set(self.getInputs())
@@ -277,37 +312,58 @@ class TaskGroup(PriorityMixin, Generic[TaskT]):
         flatSequence: List[TaskT] = []
         flattened = False
         while True:
-            while True:
-                # Note: taskLeft is modified inside the loop, so it is
-                #       essential to make a copy.
-                for name, task in list(tasksLeft.items()):
-                    if task.getInputs() <= availableProducts:
-                        readyTasks.add(tasksLeft.pop(name))
-                for task in readyTasks.iterPop():
-                    if not flattened:
-                        mainSequence.append(task)
-                    if isinstance(task, TaskGroup):
-                        flatTasks = task.getTaskSequence()
-                    else:
-                        flatTasks = (task,)
-                    flatSequence.extend(flatTasks)
-                    newProducts = task.getOutputs()
-                    if newProducts:
-                        for name in newProducts:
-                            productDef = self._parent.getProductDef(name)
-                            if productDef.isCombined():
-                                producers = remainingProducers[name]
-                                for subTask in flatTasks:
-                                    producers.discard(subTask.getName())
-                                available = not producers
-                            else:
-                                available = True
-                            if available:
-                                availableProducts.add(name)
-                        break
+            # Count the missing inputs of each task and index the tasks by
+            # the products they are waiting for, so a newly available product
+            # only has to be checked against the tasks that consume it.
+            missingCounts: Dict[str, int] = {}
+            waitingFor: DefaultDict[str, List[str]] = defaultdict(list)
+            for name, task in tasksLeft.items():
+                missing = task.getInputs() - availableProducts
+                if missing:
+                    missingCounts[name] = len(missing)
+                    for productName in missing:
+                        waitingFor[productName].append(name)
                 else:
-                    # Heap is empty and no new products available.
-                    break
+                    readyTasks.add(task)
+            tasksLeft = {
+                name: task
+                for name, task in tasksLeft.items()
+                if name in missingCounts
+                }
+
+            for task in readyTasks.iterPop():
+                if not flattened:
+                    mainSequence.append(task)
+                if isinstance(task, TaskGroup):
+                    flatTasks = task.getTaskSequence()
+                else:
+                    flatTasks = (task,)
+                flatSequence.extend(flatTasks)
+                for productName in task.getOutputs():
+                    if productName in availableProducts:
+                        continue
+                    productDef = self._parent.getProductDef(productName)
+                    if productDef.isCombined():
+                        producers = remainingProducers.get(productName)
+                        if producers is None:
+                            producers = {
+                                producer.getName()
+                                for producer in graph.getProducers(productName)
+                                }
+                            remainingProducers[productName] = producers
+                        for subTask in flatTasks:
+                            producers.discard(subTask.getName())
+                        if producers:
+                            continue
+                    availableProducts.add(productName)
+                    for name in waitingFor.pop(productName, ()):
+                        count = missingCounts[name] - 1
+                        if count == 0:
+                            del missingCounts[name]
+                            readyTasks.add(tasksLeft.pop(name))
+                        else:
+                            missingCounts[name] = count
+
             if not tasksLeft:
                 break
             unreachableTasks = sorted(tasksLeft.values())
@@ -432,10 +488,11 @@ class LocalGroup(TaskGroup[TaskT]):
 
     def __init__(self,
                  parent: TaskSet[TaskT],
+                 graph: TaskGraph[TaskT],
                  tasks: Iterable[TaskT],
                  localAt: Optional[str]
                  ):
-        super().__init__(parent, tasks)
+        super().__init__(parent, graph, tasks)
         self.__name: Optional[str] = None
         self.__runnerId: Optional[str] = None
         self.__runners: Optional[AbstractSet[str]] = None
@@ -1,15 +1,17 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from bisect import bisect_right
 from pathlib import Path
 from typing import (
-    TYPE_CHECKING, Dict, Iterable, Iterator, List, Mapping, Optional, Set,
-    Tuple, cast
+    TYPE_CHECKING, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence,
+    Set, Tuple, cast
 )
 from urllib.parse import quote_plus, urljoin
 import logging
 
 from softfab.databaselib import (
-    Database, DatabaseElem, ObsoleteRecordError, createInternalId
+    Database, DatabaseElem, ObsoleteRecordError, RecordObserver,
+    createInternalId
 )
 from softfab.reportlib import Report, parseReport
 from softfab.resreq import ResourceClaim
@@ -298,6 +300,18 @@ class TaskRun(XMLTag, DatabaseElem, TaskStateMixin, StorageURLMixin):
             else:
                 return duration >= timeoutMins * 60
 
+    def markTimedOut(self) -> None:
+        """Marks this run to be aborted because it exceeded its timeout.
+        The Task Runner will be told to abort it on its next sync.
+        """
+        if self.isRunning() and 'abort' not in self._properties:
+            timeoutMins = cast(int, self.timeoutMins)
+            self._properties['abort'] = 'true'
+            self._properties['summary'] = 'aborted after timeout of %d %s' % (
+                timeoutMins, pluralize('minute', timeoutMins)
+                )
+            self._notify()
+
     def isToBeAborted(self) -> bool:
         """Returns True if the task timed out or when the user aborted the
         task or when the execution of the task is finished
@@ -642,6 +656,7 @@ class TaskRunDB(Database[TaskRun]):
     privilegeObject = 't'
     description = 'task run'
     uniqueKeys = ( 'id', )
+    volatileKeys = ( 'duration', )
 
     factory: TaskRunFactory
 
@@ -687,3 +702,62 @@ class TaskRunDB(Database[TaskRun]):
         else:
             yield from self.factory.resultStorage.getCustomData(
                                                         taskName, runIds, key)
+
+class TaskRunsByRunner(RecordObserver[TaskRun]):
+    '''For each Task Runner ID, keep track of the IDs of the task runs that
+    were started on that Task Runner, in start time order.
+    '''
+
+    def __init__(self, taskRunDB: TaskRunDB):
+        super().__init__()
+        self.__startTimes: Dict[str, List[int]] = {}
+        self.__runIds: Dict[str, List[str]] = {}
+        self.__runnerFor: Dict[str, str] = {}
+
+        for run in taskRunDB:
+            self.added(run)
+        taskRunDB.addObserver(self)
+
+    def getRunIds(self, runnerId: str) -> Sequence[str]:
+        '''Returns the IDs of the task runs started on the given Task Runner,
+        oldest first.
+        The returned sequence is updated as new runs are started, so callers
+        should not keep it around.
+        '''
+        return self.__runIds.get(runnerId, ())
+
+    def added(self, record: TaskRun) -> None:
+        runnerId = record.getTaskRunnerId()
+        if runnerId is None:
+            return
+        runId = record.getId()
+        if runId in self.__runnerFor:
+            return
+        self.__runnerFor[runId] = runnerId
+        startTime = record.startTime or 0
+        startTimes = self.__startTimes.get(runnerId)
+        if startTimes is None:
+            self.__startTimes[runnerId] = [startTime]
+            self.__runIds[runnerId] = [runId]
+        elif startTimes[-1] <= startTime:
+            startTimes.append(startTime)
+            self.__runIds[runnerId].append(runId)
+        else:
+            index = bisect_right(startTimes, startTime)
+            startTimes.insert(index, startTime)
+            self.__runIds[runnerId].insert(index, runId)
+
+    def removed(self, record: TaskRun) -> None:
+        runId = record.getId()
+        runnerId = self.__runnerFor.pop(runId, None)
+        if runnerId is None:
+            return
+        runIds = self.__runIds[runnerId]
+        index = runIds.index(runId)
+        del runIds[index]
+        del self.__startTimes[runnerId][index]
+
+    def updated(self, record: TaskRun) -> None:
+        # Runs are indexed when they start; a started run keeps its
+        # Task Runner and start time.
+        self.added(record)
@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import ClassVar, Collection, Iterator, cast
+from typing import ClassVar, Collection, Hashable, Iterator, Optional, cast
 
 from softfab.Page import InvalidRequest, PageProcessor
 from softfab.datawidgets import (
@@ -75,6 +75,17 @@ class TaskRunsTable(DataTable[Task]):
                       ) -> Iterator[str]:
         yield getTaskStatus(record)
 
+    def getRowCacheKey(self,
+                       record: Task,
+                       **kwargs: object
+                       ) -> Optional[Hashable]:
+        if not record.isExecutionFinished():
+            # The duration keeps increasing until the task stops.
+            return None
+        # Tasks are stored in their job, so use the job's version.
+        job = record.getJob()
+        return job.getId(), job.changeCount, record.getName()
+
     def showTargetColumn(self, **kwargs: object) -> bool:
         '''Returns True iff the target column should be included.
         Default implementation returns True iff there are multiple targets
@@ -161,6 +161,13 @@ def toMidnight(secs: int) -> int:
     day = cast(Tuple[int, ...], localtime(secs + secondsPerDay // 2))
     return _intsToTime(day[:3] + (0,) * 5 + (-1,))
 
+def startOfWeek(secs: int) -> int:
+    '''Returns the time at which the week that contains the given time starts,
+    which is midnight at the start of its Monday.
+    '''
+    day = cast(Tuple[int, ...], localtime(secs))
+    return _intsToTime(day[:2] + (day[2] - day[6],) + (0,) * 5 + (-1,))
+
 def weekRange(year: int, week: int) -> Tuple[int, int]:
     '''Returns a pair (start, end) of time values,
     which are the times at which the given week starts and ends.
@@ -49,6 +49,10 @@ class Heap(Generic[T]):
     an ordered set for which it is efficient to retrieve and remove
     the smallest item.
     Typically used for priority queues.
+    The heap keeps track of the position of each item it contains,
+    so removing an item or updating its position after its key changed
+    can be done in logarithmic time. This requires that the same object
+    is not added to the heap more than once.
     Note: The storage space allocated internally never shrinks,
           because for the current use it is unnecessary.
     """
@@ -63,6 +67,8 @@ class Heap(Generic[T]):
         super().__init__()
         self.__array: List[Optional[T]] = [ None ]
         self.__count = 1
+        self.__positions: Dict[int, int] = {}
+        """Maps the identity of each item to its index in the array."""
         # Note: We won't actually pass None to the key function,
         #       but there is no efficient way to tell mypy that,
         #       so instead we pretend the key function can handle None.
@@ -73,17 +79,22 @@ class Heap(Generic[T]):
 
     def __moveUp(self, item: T, this: int) -> None:
         array = self.__array
+        positions = self.__positions
         key = self.__keyFunc
         while this > 0:
             nextIndex = (this - 1) // 2
-            if key(item) >= key(array[nextIndex]):
+            other = array[nextIndex]
+            if key(item) >= key(other):
                 break
-            array[this] = array[nextIndex]
+            array[this] = other
+            positions[id(other)] = this
             this = nextIndex
         array[this] = item
+        positions[id(item)] = this
 
     def __moveDown(self, item: T, this: int) -> None:
         array = self.__array
+        positions = self.__positions
         key = self.__keyFunc
         count = self.__count
         nextIndex = this * 2 + 1
@@ -91,16 +102,44 @@ class Heap(Generic[T]):
             other = nextIndex + 1
             if other < count and key(array[other]) < key(array[nextIndex]):
                 nextIndex = other
-            if key(item) <= key(array[nextIndex]):
+            child = array[nextIndex]
+            if key(item) <= key(child):
                 break
-            array[this] = array[nextIndex]
+            array[this] = child
+            positions[id(child)] = this
             this = nextIndex
             nextIndex = this * 2 + 1
         array[this] = item
+        positions[id(item)] = this
+
+    def __moveToPlace(self, item: T, this: int) -> None:
+        """Stores an item at the given index and then moves it up or down
+        to restore the heap order.
+        """
+        if this > 0 and self.__keyFunc(item) < \
+                self.__keyFunc(self.__array[(this - 1) // 2]):
+            self.__moveUp(item, this)
+        else:
+            self.__moveDown(item, this)
+
+    def __find(self, item: T) -> int:
+        """Returns the index of the given item in the array.
+        Raises ValueError if the heap does not contain the item.
+        """
+        # Make sure the array does not start with an empty slot.
+        self.peek()
+        this = self.__positions.get(id(item))
+        if this is None:
+            # Look for an item that is equal to, but not the same object as,
+            # the given item.
+            return self.__array.index(item, 0, self.__count)
+        else:
+            return this
 
     def add(self, item: T) -> None:
         """Adds an item to the heap.
         """
+        assert id(item) not in self.__positions, item
         array = self.__array
         if array[0] is None:
             self.__moveDown(item, 0)
@@ -115,20 +154,28 @@ class Heap(Generic[T]):
         """Removes an item from the heap.
         Raises ValueError if the heap does not contain the item.
         """
+        this = self.__find(item)
         array = self.__array
-        this = array.index(item, 0, self.__count)
+        del self.__positions[id(array[this])]
         if this == 0:
             array[0] = None
         else:
             self.__count -= 1
-            if this != self.__count:
-                lastItem = array[self.__count]
+            last = self.__count
+            if this != last:
+                lastItem = array[last]
                 assert lastItem is not None
-                key = self.__keyFunc
-                if key(lastItem) > key(item):
-                    self.__moveDown(lastItem, this)
-                else:
-                    self.__moveUp(lastItem, this)
+                self.__moveToPlace(lastItem, this)
+            array[last] = None
+
+    def update(self, item: T) -> None:
+        """Restores the heap order after the key of the given item changed.
+        Raises ValueError if the heap does not contain the item.
+        """
+        this = self.__find(item)
+        stored = self.__array[this]
+        assert stored is not None
+        self.__moveToPlace(stored, this)
 
     def peek(self) -> Optional[T]:
         """Returns the smallest item in the heap.
@@ -154,6 +201,7 @@ class Heap(Generic[T]):
         item = self.peek()
         if item is not None:
             self.__array[0] = None
+            del self.__positions[id(item)]
         return item
 
     def iterPop(self) -> Iterator[T]:
@@ -172,6 +220,10 @@ class Heap(Generic[T]):
         array = self.__array
         key = self.__keyFunc
         index = 1 if array[0] is None else 0
+        positions = self.__positions
+        assert len(positions) == self.__count - index
+        for pos in range(index, self.__count):
+            assert positions[id(array[pos])] == pos, pos
         while index < self.__count:
             one = index * 2 + 1
             if one < self.__count:
@@ -6,11 +6,12 @@ TODO: Currently the "css" Python argument sets the XHTML "style" attribute and
       The fact that "style" does not map to "style" is confusing.
 '''
 
+from collections import OrderedDict
 from io import BytesIO
 from itertools import chain
 from typing import (
-    Callable, ClassVar, Dict, Iterable, Iterator, List, Mapping, Optional,
-    Sequence, Tuple, TypeVar, Union, cast
+    Callable, ClassVar, Dict, Hashable, Iterable, Iterator, List, Mapping,
+    Optional, Sequence, Tuple, TypeVar, Union, cast
 )
 from xml.etree import ElementTree
 from zlib import adler32  # pylint: disable=no-name-in-module
@@ -23,7 +24,7 @@ from softfab.pnglib import getPNGDimensions
 from softfab.utils import SharedInstance, abstract, iterable
 from softfab.xmlgen import (
     XML, XMLContent, XMLNode, XMLPresentable, XMLSubscriptable, adaptToXML,
-    xhtml
+    preflatten, xhtml
 )
 
 
@@ -405,11 +406,11 @@ class _Row(AttrContainer):
     '''
 
     @staticmethod
-    def adapt(obj: XMLContent) -> '_Row':
+    def adapt(obj: XMLContent) -> Union['_Row', 'CachedRow']:
         '''Returns `obj` if it is a row, otherwise returns a new row
         with `obj` as its contents.
         '''
-        return obj if isinstance(obj, _Row) else row[obj]
+        return obj if isinstance(obj, (_Row, CachedRow)) else row[obj]
 
     def _adaptContentElement(self, element: XMLContent) -> Iterator[XML]:
         yield adaptToXML(cell.adapt(element))
@@ -472,6 +473,83 @@ class _Row(AttrContainer):
 
 row = _Row((), {})
 
+class FragmentCache:
+    '''Keeps presentations that can be reused between requests,
+    discarding the least recently used ones when full.
+    '''
+
+    def __init__(self, maxEntries: int):
+        super().__init__()
+        self.maxEntries = maxEntries
+        self.__entries: 'OrderedDict[Hashable, XML]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def hitRate(self) -> float:
+        '''The fraction of lookups that found a cached presentation.'''
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable) -> Optional[XML]:
+        entries = self.__entries
+        try:
+            fragment = entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        else:
+            self.hits += 1
+            entries.move_to_end(key)
+            return fragment
+
+    def put(self, key: Hashable, fragment: XML) -> None:
+        entries = self.__entries
+        entries[key] = fragment
+        entries.move_to_end(key)
+        while len(entries) > self.maxEntries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.__entries.clear()
+
+class CachedRow:
+    '''A table row of which the presentation is stored in a fragment cache,
+    so it only has to be presented and flattened once.
+    Rows that are part of a row span are presented but not cached.
+    '''
+
+    def __init__(self,
+                 content: Callable[[], XMLContent],
+                 cache: FragmentCache,
+                 key: Hashable):
+        super().__init__()
+        self.__content = content
+        self.__cache = cache
+        self.__key = key
+
+    def present(self, **kwargs: object) -> XMLContent:
+        rowSpans = cast(List[int], kwargs['rowSpans'])
+        cacheable = all(span == 1 for span in rowSpans)
+        cache = self.__cache
+        key = self.__key
+        if cacheable:
+            fragment = cache.get(key)
+            if fragment is not None:
+                return fragment
+        presentation = _Row.adapt(self.__content()).present(**kwargs)
+        if cacheable and all(span == 1 for span in rowSpans):
+            fragment = preflatten(presentation)
+            cache.put(key, fragment)
+            return fragment
+        else:
+            return presentation
+
 class Table(Widget):
     '''A generic abstract table.
     Subclass it to define the layout and provide contents.
@@ -3,20 +3,26 @@
 from enum import Enum, auto
 from logging import Logger
 from types import ModuleType
-from typing import Any, Callable, Iterator, Optional
+from typing import (
+    AbstractSet, Any, Callable, Iterator, Optional, Tuple, TypeVar
+)
 import json
 import logging
 
+from twisted.internet.defer import ensureDeferred
+from twisted.internet.threads import deferToThread
+from twisted.python.failure import Failure
 from twisted.web.resource import Resource
-from twisted.web.server import Request as TwistedRequest
+from twisted.web.server import NOT_DONE_YET, Request as TwistedRequest
 
 from softfab.request import RequestBase
-from softfab.resourcelib import ResourceDB
-from softfab.restypelib import repoResourceTypeName
+from softfab.resourcelib import RepositoryLocatorIndex
 from softfab.schedulelib import ScheduleDB
 from softfab.utils import iterModules
 
 
+T = TypeVar('T')
+
 class WebhookEvents(Enum):
     PING = auto()
     PUSH = auto()
@@ -24,9 +30,14 @@ class WebhookEvents(Enum):
 
 class WebhookResource(Resource):
 
-    resourceDB: ResourceDB
+    repoLocators: RepositoryLocatorIndex
     scheduleDB: ScheduleDB
 
+    offloadThreshold = 65536
+    """Payloads larger than this number of bytes are parsed and verified
+    on a separate thread, so large pushes do not stall the reactor.
+    """
+
     def __init__(self, name: str, webhook: ModuleType):
         super().__init__()
         self.name = name
@@ -39,9 +50,56 @@ class WebhookResource(Resource):
         self.findBranches: Callable[[object], Iterator[str]] = \
                 getattr(webhook, 'findBranches')
 
-    def render_POST(self, request: TwistedRequest) -> bytes:
+    def render_POST(self, request: TwistedRequest) -> object:
         request.setHeader(b'Content-Type', b'text/plain; charset=UTF-8')
+        def done(reply: bytes) -> None:
+            request.write(reply)
+            request.finish()
+        def failed(reason: Failure) -> None:
+            request.processingFailed(reason)
+        d = ensureDeferred(self.process(request))
+        d.addCallback(done).addErrback(failed)
+        return NOT_DONE_YET
+
+    async def offload(self,
+                      size: int,
+                      func: Callable[..., T],
+                      *args: object
+                      ) -> T:
+        """Calls the given function with the given arguments and returns
+        its result.
+        If the payload size exceeds the threshold, the call is made on
+        a separate thread, to avoid blocking the reactor.
+        """
+        if size > self.offloadThreshold:
+            return await deferToThread(func, *args)
+        else:
+            return func(*args)
+
+    def parsePayload(self,
+                     contentBytes: bytes
+                     ) -> Tuple[Any, AbstractSet[str]]:
+        """Parses the given payload and returns the JSON object and the
+        casefolded repository URLs mentioned in it.
+        Raises ValueError if the payload is not valid JSON and KeyError
+        if the JSON object lacks repository information.
+        """
+        # JSON must be encoded as UTF-8 without a BOM.
+        #   https://tools.ietf.org/html/rfc8259#section-8.1
+        content = contentBytes.decode()
+        if content.startswith('\ufeff'):
+            content = content[1:]
+        parsed = json.loads(content)
+        # We compare URLs case-insensitive. In general, URL paths could be
+        # case-sensitive, but all hosting platforms I've tested either ignore
+        # case (GitHub, Gogs) or redirect to all lower case (GitLab, Bitbucket).
+        repoURLs = frozenset(
+            url.casefold()
+            for url in self.findRepositoryURLs(parsed)
+            )
+        return parsed, repoURLs
 
+    async def process(self, request: TwistedRequest) -> bytes:
         # Is this an event we're interested in?
         event = self.getEvent(request)
         if event is WebhookEvents.UNSUPPORTED:
@@ -58,45 +116,29 @@ class WebhookResource(Resource):
                 return b'Unsupported Content-Type; expected application/json\n'
         assert contentTypeParams is not None
 
-        # Decode content.
-        # JSON must be encoded as UTF-8 without a BOM.
-        #   https://tools.ietf.org/html/rfc8259#section-8.1
+        # Check encoding.
         charset = contentTypeParams.get('charset', 'UTF-8')
         if charset.casefold() != 'utf-8':
             request.setResponseCode(415)
             return b'Unsupported charset "%s", please use UTF-8 instead\n' \
                    % charset.encode()
-        contentBytes = req.rawInput().read()
-        content = contentBytes.decode()
-        if content.startswith('\ufeff'):
-            content = content[1:]
 
-        # Parse JSON.
+        # Parse JSON and find repository URLs.
+        contentBytes = req.rawInput().read()
+        size = len(contentBytes)
         try:
-            parsed = json.loads(content)
+            parsed, repoURLs = await self.offload(
+                size, self.parsePayload, contentBytes
+                )
+        except KeyError as ex:
+            request.setResponseCode(400)
+            return b'Missing key in JSON: %s\n' % str(ex).encode()
         except ValueError as ex:
             request.setResponseCode(400)
             return b'Invalid JSON: %s\n' % str(ex).encode()
 
         # Find repository.
-        # We compare URLs case-insensitive. In general, URL paths could be
-        # case-sensitive, but all hosting platforms I've tested either ignore
-        # case (GitHub, Gogs) or redirect to all lower case (GitLab, Bitbucket).
-        try:
-            repoURLs = set(
-                url.casefold()
-                for url in self.findRepositoryURLs(parsed)
-                )
-        except KeyError as ex:
-            request.setResponseCode(400)
-            return b'Missing key in JSON: %s\n' % str(ex).encode()
-        repoMatch = None
-        resourceDB = self.resourceDB
-        for repoId in resourceDB.resourcesOfType(repoResourceTypeName):
-            repo = resourceDB[repoId]
-            locator = repo.getParameter('locator')
-            if locator is not None and locator.casefold() in repoURLs:
-                repoMatch = repo
+        repoMatch = self.repoLocators.findRepository(repoURLs)
 
         # Authenticate.
         # Use the same flow as much as possible to make timing attacks harder.
@@ -110,7 +152,10 @@ class WebhookResource(Resource):
                 errorMessage = 'no secret has been set for repository'
             else:
                 secret = secretParam
-        if not self.verifySignature(request, contentBytes, secret.encode()):
+        verified = await self.offload(
+            size, self.verifySignature, request, contentBytes, secret.encode()
+            )
+        if not verified:
             if errorMessage is None:
                 errorMessage = 'signature mismatch'
         if errorMessage is not None:
@@ -150,12 +195,16 @@ class WebhookResource(Resource):
             return b'Missing key in JSON: %s\n' % str(ex).encode()
 
         # Trigger schedules.
-        tagValues = {f'{repoId}/{branch}' for branch in branches}
-        scheduleIds = []
-        for scheduleId, schedule in self.scheduleDB.items():
-            if tagValues & schedule.tags.getTagValues('sf.trigger'):
-                schedule.setTrigger()
-                scheduleIds.append(scheduleId)
+        scheduleDB = self.scheduleDB
+        tagCache = scheduleDB.tagCache
+        scheduleIds = sorted({
+            scheduleId
+            for branch in branches
+            for scheduleId in tagCache.getRecordIds('sf.trigger',
+                                                    f'{repoId}/{branch}')
+            })
+        for scheduleId in scheduleIds:
+            scheduleDB[scheduleId].setTrigger()
 
         logging.info('Got update on "%s" webhook for branch: %s; '
                      'triggered schedule: %s',
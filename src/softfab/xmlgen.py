@@ -39,6 +39,7 @@ than repeated addition.
 
 from collections.abc import Iterable as IterableABC
 from enum import Enum
+from functools import lru_cache
 from html.parser import HTMLParser
 from itertools import chain
 from sys import intern
@@ -100,6 +101,7 @@ def _escapeXMLAttributeChar(match: Match[str]) -> str:
         return '&#x%04X;' % ord(ch)
     else:
         raise ValueError('Control character %02X not allowed in XML' % ord(ch))
+@lru_cache(maxsize=4096)
 def _escapeXMLAttributeValue(value: str) -> str:
     '''Converts a given string to an ASCII string that is safe to use as
     an XML attribute value.
@@ -116,6 +118,15 @@ def _escapeXMLAttributeValue(value: str) -> str:
     #       (entity references are not allowed in NMTOKEN values).
     return value
 
+_escapeShortText = lru_cache(maxsize=4096)(escape)
+
+def _escapeText(text: str) -> str:
+    '''Escapes text content.
+    The same short texts, such as status names and numbers, occur many
+    times on a page, so the escaped versions of those are cached.
+    '''
+    return escape(text) if len(text) > 80 else _escapeShortText(text)
+
 XMLAttributeValue = Union[str, int, Enum, None]
 """Supported types for XML attribute values.
 Note that `bool` is a subclass of `int` and therefore also allowed.
@@ -142,7 +153,7 @@ class _XMLSerializable:
         raise NotImplementedError
 
     def flattenXML(self) -> str:
-        return ''.join(self._toFragments(None))
+        return _flatten(self, None)
 
     def flattenIndented(self) -> str:
         indentedFragments = []
@@ -318,7 +329,7 @@ class _Text(_XMLSerializable):
         self.__text = text
 
     def _toFragments(self, defaultNamespace: Optional[str]) -> Iterator[str]:
-        yield escape(self.__text)
+        yield _escapeText(self.__text)
 
     @property
     def text(self) -> str:
@@ -364,6 +375,33 @@ class _XMLSequence(_XMLSerializable):
 
 _emptySequence = _XMLSequence(())
 
+class _Preflattened(_XMLSerializable):
+    '''Wraps an XML tree that is flattened only once: the flattened form
+    is stored and reused when the tree is included in other documents.
+    '''
+
+    def __init__(self, content: XML):
+        super().__init__()
+        self.__content = content
+        self.__flattened: Dict[Optional[str], str] = {}
+
+    def _toFragments(self, defaultNamespace: Optional[str]) -> Iterator[str]:
+        # The serialization depends on the default namespace of the parent.
+        flattened = self.__flattened.get(defaultNamespace)
+        if flattened is None:
+            flattened = _flatten(self.__content, defaultNamespace)
+            self.__flattened[defaultNamespace] = flattened
+        yield flattened
+
+def preflatten(content: XMLContent) -> XML:
+    '''Returns an XML tree for the given content that is flattened only
+    the first time it is serialized; later serializations reuse that result.
+    This is useful for presentations that are cached and included in many
+    documents. The content must not contain unresolved presenters.
+    '''
+    tree = adaptToXML(content)
+    return tree if isinstance(tree, _Preflattened) else _Preflattened(tree)
+
 class XMLNode(_XMLSerializable):
     '''An XML element.
     Do not instantiate this directly; use a node factory like `xml`
@@ -474,22 +512,34 @@ class XMLNode(_XMLSerializable):
             self._namespace, self._name, attrs, self._children
             )
 
-    def _toFragments(self, defaultNamespace: Optional[str]) -> Iterator[str]:
-        namespace = self._namespace
-        name = self._name
-        attribs = self._attributes
-
-        if namespace is not defaultNamespace and namespace is not None:
-            attribs = dict(attribs, xmlns = namespace)
-        attribStr = ''.join(
+    @cachedProperty
+    def _attribStr(self) -> str:
+        return ''.join(
             f' {key}="{_escapeXMLAttributeValue(value)}"'
-            for key, value in attribs.items()
+            for key, value in self._attributes.items()
             )
 
+    def _openTag(self, defaultNamespace: Optional[str]) -> str:
+        '''Returns the start tag of this node, without the closing bracket.
+        '''
+        namespace = self._namespace
+        if namespace is not defaultNamespace and namespace is not None:
+            attribs = dict(self._attributes, xmlns = namespace)
+            attribStr = ''.join(
+                f' {key}="{_escapeXMLAttributeValue(value)}"'
+                for key, value in attribs.items()
+                )
+        else:
+            attribStr = self._attribStr
+        return f'<{self._name}{attribStr}'
+
+    def _toFragments(self, defaultNamespace: Optional[str]) -> Iterator[str]:
+        name = self._name
+        openTag = self._openTag(defaultNamespace)
         if self._useEmptyTag():
-            yield f'<{name}{attribStr}/>'
+            yield f'{openTag}/>'
         else:
-            yield f'<{name}{attribStr}>'
+            yield f'{openTag}>'
             yield from self._contentToFragments()
             yield f'</{name}>'
 
@@ -599,6 +649,52 @@ class _XHTMLRawTextNode(_XHTMLNode):
             # Text can be output as-is.
             yield from texts
 
+def _flatten(root: XML, defaultNamespace: Optional[str]) -> str:
+    '''Returns the XML serialization of the given tree.
+    This produces the same output as joining the fragments from
+    `_toFragments()`, but it walks the tree using an explicit stack instead
+    of nested generators, which is a lot faster for large documents.
+    '''
+    # pylint: disable=protected-access
+    out: List[str] = []
+    append = out.append
+    # Each stack entry contains an iterator over the children that remain
+    # to be flattened, the default namespace for those children and
+    # the close tag to output after the last child.
+    stack: List[Tuple[Iterator[XML], Optional[str], str]] = [
+        (iter((root,)), defaultNamespace, '')
+        ]
+    push = stack.append
+    while stack:
+        children, namespace, closeTag = stack[-1]
+        for node in children:
+            nodeClass = node.__class__
+            if nodeClass is _Text:
+                append(_escapeText(cast(_Text, node).text))
+            elif nodeClass is _XMLSequence:
+                push((iter(cast(_XMLSequence, node)._children),
+                      namespace, ''))
+                break
+            elif nodeClass is _XHTMLNode or nodeClass is _XHTMLVoidNode \
+                    or nodeClass is XMLNode:
+                elem = cast(XMLNode, node)
+                openTag = elem._openTag(namespace)
+                if elem._useEmptyTag():
+                    append(f'{openTag}/>')
+                else:
+                    append(f'{openTag}>')
+                    push((iter(elem._children._children),
+                          elem._namespace, f'</{elem._name}>'))
+                    break
+            else:
+                # Nodes with custom serialization.
+                out.extend(node._toFragments(namespace))
+        else:
+            stack.pop()
+            if closeTag:
+                append(closeTag)
+    return ''.join(out)
+
 _nodeFactories: Dict[Optional[str], '_XMLNodeFactory'] = {}
 
 class _XMLNodeFactory:
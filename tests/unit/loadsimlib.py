@@ -0,0 +1,399 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""In-process load simulation of Task Runners syncing with
+the Control Center.
+
+A synthetic factory is created in a temporary directory and a number of
+simulated Task Runners execute the queued tasks by calling the processors
+of the Synchronize (or SynchronizeJSON) and TaskDone pages directly.
+Time is simulated, so task durations and sync delays do not slow down
+the simulation; only the time spent in the Control Center code is measured.
+
+To run a benchmark from the command line:
+
+    cd tests/unit
+    PYTHONPATH=../../src python loadsimlib.py --runners 500 --jobs 100
+
+Use --help for a list of all parameters.
+"""
+
+from heapq import heappop, heappush
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import random
+
+import attr
+
+from softfab import config
+from softfab.ControlPage import ControlPage
+from softfab.databases import injectDependencies, reloadDatabases
+from softfab.dispatcher import Dispatcher
+from softfab.joblib import UnfinishedJobs
+from softfab.pages.Synchronize import Synchronize_POST
+from softfab.pages.SynchronizeJSON import SynchronizeJSON_POST
+from softfab.pages.TaskDone import TaskDone_POST
+from softfab.resourcelib import TaskRunnerTokenProvider, syncStateDigest
+from softfab.resultcode import ResultCode
+from softfab.resultlib import ResultStorage
+from softfab.timelib import getTime, setTime
+from softfab.tokens import TokenUser
+from softfab.xmlgen import xml
+
+from datageneratorlib import DataGenerator
+
+
+class SimReactor:
+    """Replacement for Twisted's reactor that runs delayed calls
+    in simulated time.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.counter = 0
+
+    def callLater(self, delay, func, *args, **kw):
+        call = SimCall(getTime() + delay, func, args, kw)
+        self.schedule(call)
+        return call
+
+    def schedule(self, call):
+        # The counter keeps calls for the same moment in FIFO order.
+        self.counter += 1
+        heappush(self.events, (call.time, self.counter, call))
+
+    def step(self):
+        """Performs the next call.
+        Returns False if there are no more calls to perform.
+        """
+        if not self.events:
+            return False
+        when, _, call = heappop(self.events)
+        if when > getTime():
+            setTime(when)
+        if call.active():
+            call.called = True
+            call.func(*call.args, **call.kw)
+        return True
+
+@attr.s(auto_attribs=True, eq=False)
+class SimCall:
+    time: int
+    func: object
+    args: tuple
+    kw: dict
+    called: bool = False
+    cancelled: bool = False
+
+    def active(self):
+        return not (self.called or self.cancelled)
+
+    def cancel(self):
+        self.cancelled = True
+
+class SimRequest:
+    """The subset of the Request interface used by the processors
+    that are driven by the simulation.
+    """
+
+    def __init__(self, args, body=b''):
+        self.args = args
+        self.__body = body
+
+    def rawInput(self):
+        return BytesIO(self.__body)
+
+def _runProcessor(proc, req, user):
+    coro = proc.process(req, user)
+    try:
+        coro.send(None)
+    except StopIteration:
+        return
+    coro.close()
+    raise RuntimeError('Processor blocked; cannot simulate it')
+
+def percentile(values, fraction):
+    """Returns the nearest-rank percentile from a sorted list of values."""
+    if not values:
+        return 0.0
+    index = max(0, int(round(fraction * len(values) + 0.5)) - 1)
+    return values[min(index, len(values) - 1)]
+
+@attr.s(auto_attribs=True)
+class LoadStats:
+    """Measurements of a simulation. Durations are in seconds."""
+
+    assignments: int = 0
+    syncs: int = 0
+    taskDones: int = 0
+    tasksTotal: int = 0
+    wallTime: float = 0.0
+    simTime: int = 0
+    syncLatencies: list = attr.ib(factory=list)
+    doneLatencies: list = attr.ib(factory=list)
+    dbWrites: dict = attr.ib(factory=dict)
+    dispatchCycles: int = 0
+
+    @property
+    def assignmentsPerSecond(self):
+        return self.assignments / self.wallTime if self.wallTime else 0.0
+
+    def latencyPercentiles(self, latencies=None):
+        values = sorted(self.syncLatencies if latencies is None else latencies)
+        return {
+            name: percentile(values, fraction)
+            for name, fraction in (
+                ('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('max', 1.0)
+                )
+            }
+
+    def report(self):
+        """Yields lines of text describing the results."""
+        yield f'tasks executed: {self.taskDones} of {self.tasksTotal}'
+        yield f'simulated time: {self.simTime} s'
+        yield f'wall clock time: {self.wallTime:.3f} s'
+        yield f'assignments: {self.assignments} ' \
+              f'({self.assignmentsPerSecond:.1f}/s)'
+        yield f'dispatch cycles: {self.dispatchCycles}'
+        for label, latencies in (('sync', self.syncLatencies),
+                                 ('task done', self.doneLatencies)):
+            percentiles = ', '.join(
+                f'{name} {value * 1000:.2f}'
+                for name, value in self.latencyPercentiles(latencies).items()
+                )
+            yield f'{label} latency (ms) over {len(latencies)} calls: ' \
+                  f'{percentiles}'
+        writes = ', '.join(
+            f'{name} {count}'
+            for name, count in sorted(self.dbWrites.items())
+            if count
+            )
+        yield f'database writes: {sum(self.dbWrites.values())} ({writes})'
+
+class SimRunner:
+    """A simulated Task Runner."""
+
+    def __init__(self, sim, record):
+        self.sim = sim
+        self.record = record
+        self.user = TokenUser(record.token)
+        self.state = {'runnerVersion': '3.0.0', 'host': record.getId()}
+        self.digest = syncStateDigest(self.state)
+        self.sendState = True
+        self.run = None
+        self.syncCall = None
+
+    def syncBody(self):
+        run = self.run
+        if self.sim.protocol == 'json':
+            request = {'digest': self.digest}
+            if self.sendState:
+                request['state'] = self.state
+            if run is not None:
+                request['run'] = dict(jobId=run.getJob().getId(),
+                                      taskId=run.getName(),
+                                      runId=run.getRunId())
+            return json.dumps(request).encode()
+        else:
+            runXML = xml.run(
+                jobId=run.getJob().getId(),
+                taskId=run.getName(),
+                runId=run.getRunId()
+                ) if run is not None else None
+            return xml.request(**self.state)[runXML].flattenXML().encode()
+
+    def sync(self):
+        sim = self.sim
+        page = sim.syncPage
+        req = SimRequest(ControlPage.Arguments(), self.syncBody())
+        proc = sim.syncProcessor(page, req, req.args, self.user)
+        start = perf_counter()
+        _runProcessor(proc, req, self.user)
+        response = proc.createResponse()
+        if sim.protocol == 'json':
+            json.dumps(response)
+            if response.get('state'):
+                self.sendState = True
+                sim.stats.syncLatencies.append(perf_counter() - start)
+                self.scheduleSync(0)
+                return
+            self.sendState = False
+        else:
+            xml.response[response].flattenXML()
+        sim.stats.syncLatencies.append(perf_counter() - start)
+        sim.stats.syncs += 1
+
+        if proc.abort:
+            self.run = None
+        newRun = proc.newRun
+        if newRun is None:
+            self.scheduleSync(self.record.getSyncWaitDelay())
+        else:
+            sim.stats.assignments += 1
+            self.run = newRun
+            sim.reactor.callLater(sim.taskDuration(), self.done, newRun)
+            self.scheduleSync(self.record.getSyncWaitDelay())
+
+    def scheduleSync(self, delay):
+        self.syncCall = self.sim.reactor.callLater(delay, self.sync)
+
+    def done(self, run):
+        if run is not self.run:
+            # Run was aborted.
+            return
+        sim = self.sim
+        args = TaskDone_POST.Arguments(
+            result=ResultCode.OK,
+            summary='simulated',
+            id=run.getJob().getId(),
+            name=run.getName()
+            )
+        req = SimRequest(args)
+        proc = sim.doneProcessor(sim.donePage, req, args, self.user)
+        start = perf_counter()
+        _runProcessor(proc, req, self.user)
+        sim.stats.doneLatencies.append(perf_counter() - start)
+        sim.stats.taskDones += 1
+        self.run = None
+        # A Task Runner syncs immediately after reporting a task as done.
+        self.syncCall.cancel()
+        self.scheduleSync(0)
+
+class LoadSimulation:
+    """Simulates Task Runners executing all tasks of a synthetic factory.
+
+    The factory is created in 'dbDir' and contains 'numJobs' jobs of
+    'tasksPerJob' independent tasks each, which are executed by 'numRunners'
+    Task Runners. Task durations in seconds are chosen uniformly from
+    the 'durations' range. The 'protocol' is either 'xml' or 'json'.
+    """
+
+    def __init__(self, dbDir, *, numRunners=10, numJobs=10, tasksPerJob=10,
+                 durations=(30, 300), protocol='xml', seed=0):
+        # Avoid fsync() calls: the write count is measured instead.
+        config.dbAtomicWrites = False
+        setTime(1000)
+        self.rnd = random.Random(seed)
+        self.durations = durations
+        self.protocol = protocol
+        self.stats = LoadStats()
+
+        dbs = reloadDatabases(Path(dbDir))
+        self.databases = dbs
+        resourceDB = dbs['resourceDB']
+        resourceDB.addObserver(TaskRunnerTokenProvider(dbs['tokenDB']))
+
+        gen = DataGenerator(dbs, self.rnd)
+        fwName = gen.createFramework('simfw')
+        for index in range(tasksPerJob):
+            gen.createTask(f'simtask{index}', fwName)
+        runners = [
+            resourceDB[gen.createTaskRunner(capabilities=[fwName])]
+            for _ in range(numRunners)
+            ]
+        jobConfig = gen.createConfiguration()
+        jobDB = dbs['jobDB']
+        for _ in range(numJobs):
+            job, = jobConfig.createJobs(gen.owner)
+            jobDB.add(job)
+        self.stats.tasksTotal = numJobs * tasksPerJob
+
+        self.reactor = SimReactor()
+        self.unfinishedJobs = UnfinishedJobs(jobDB)
+        self.dispatcher = Dispatcher(resourceDB, self.unfinishedJobs,
+                                     self.reactor)
+        dependencies = dict(
+            dbs,
+            resultStorage=ResultStorage(Path(dbDir) / 'results'),
+            dispatcher=self.dispatcher,
+            project=None
+            )
+        pageClass = SynchronizeJSON_POST if protocol == 'json' \
+                                         else Synchronize_POST
+        self.syncPage = pageClass()
+        self.syncProcessor = self.__processorClass(pageClass, dependencies)
+        self.donePage = TaskDone_POST()
+        self.doneProcessor = self.__processorClass(TaskDone_POST,
+                                                   dependencies)
+
+        self.runners = [SimRunner(self, runner) for runner in runners]
+
+    @staticmethod
+    def __processorClass(pageClass, dependencies):
+        # Inject into a subclass, to keep the page classes unmodified.
+        processorClass = type('SimProcessor', (pageClass.Processor,), {})
+        injectDependencies(processorClass, dependencies)
+        return processorClass
+
+    def taskDuration(self):
+        return self.rnd.randint(*self.durations)
+
+    def run(self, maxTime=7 * 24 * 60 * 60):
+        """Runs the simulation until all tasks are done or until 'maxTime'
+        simulated seconds have passed.
+        Returns the measurements.
+        """
+        stats = self.stats
+        reactor = self.reactor
+        databases = self.databases
+        writesBefore = {
+            name: db.writeCount for name, db in databases.items()
+            }
+        startTime = getTime()
+        endTime = startTime + maxTime
+        self.dispatcher.start()
+        # Spread the first syncs of the Task Runners over their sync delay.
+        for runner in self.runners:
+            runner.scheduleSync(
+                self.rnd.randint(0, runner.record.getSyncWaitDelay())
+                )
+
+        start = perf_counter()
+        while len(self.unfinishedJobs) and getTime() < endTime:
+            if not reactor.step():
+                break
+        stats.wallTime = perf_counter() - start
+
+        stats.simTime = getTime() - startTime
+        stats.dispatchCycles = self.dispatcher.stats.cycles
+        stats.dbWrites = {
+            name: db.writeCount - writesBefore[name]
+            for name, db in databases.items()
+            }
+        return stats
+
+def main():
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Simulate Task Runner load.')
+    parser.add_argument('--runners', type=int, default=100,
+                        help='number of Task Runners')
+    parser.add_argument('--jobs', type=int, default=100,
+                        help='number of jobs')
+    parser.add_argument('--tasks', type=int, default=100,
+                        help='number of tasks per job')
+    parser.add_argument('--min-duration', type=int, default=30,
+                        help='minimum task duration in seconds')
+    parser.add_argument('--max-duration', type=int, default=300,
+                        help='maximum task duration in seconds')
+    parser.add_argument('--protocol', choices=('xml', 'json'), default='xml',
+                        help='sync protocol to use')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for the random number generator')
+    args = parser.parse_args()
+    with TemporaryDirectory() as dbDir:
+        sim = LoadSimulation(
+            dbDir,
+            numRunners=args.runners,
+            numJobs=args.jobs,
+            tasksPerJob=args.tasks,
+            durations=(args.min_duration, args.max_duration),
+            protocol=args.protocol,
+            seed=args.seed
+            )
+        for line in sim.run().report():
+            print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Trees resembling the pages of the Control Center, to measure
+the presentation and flattening of XML trees.
+
+Rendering the real pages needs a fully configured server, so the pages
+are built from the webgui widgets with synthetic data instead.
+
+To run a benchmark from the command line:
+
+    cd tests/unit
+    PYTHONPATH=../../src python pagebenchlib.py
+"""
+
+from time import perf_counter
+
+from softfab.webgui import PropertiesTable, Table, cell, pageLink, row
+from softfab.xmlgen import xhtml
+
+
+class ReportTable(Table):
+    """Table resembling the job table on the ReportIndex page."""
+    columns = 'Create Time', 'Lead Time', 'Description', 'Owner', 'Status'
+    bodyId = 'jobs'
+
+    def __init__(self, numRows):
+        super().__init__()
+        self.numRows = numRows
+
+    def iterRows(self, **kwargs):
+        for index in range(self.numRows):
+            jobId = f'200102-1234-{index:04X}'
+            yield row(class_='ok' if index % 3 else 'warning')[
+                cell(class_='nobreak')[f'2020-01-02 12:{index % 60:02d}'],
+                cell(class_='rightalign')[f'{index % 7}:{index % 60:02d}'],
+                (
+                    pageLink('ShowReport', jobId=jobId)[
+                        f'build & test "{index}"'
+                        ],
+                    xhtml.a(href='ScheduleDetails?id=nightly',
+                            title='nightly', class_='jobicon')[
+                        xhtml.img(src='styles/ScheduleSmall.png',
+                                  width=16, height=16)
+                        ]
+                    ),
+                pageLink('UserDetails', user='owner')[ 'owner' ],
+                cell(class_='strong')[
+                    xhtml.table(class_='statusmany')[xhtml.tbody[xhtml.tr[
+                        xhtml.td(style='width:60%', class_='ok')[ '3' ],
+                        xhtml.td(style='width:40%', class_='warning')[ '2' ]
+                        ]]]
+                    ]
+                ]
+
+class TaskPropertiesTable(PropertiesTable):
+    """Table resembling the task details on the Task page."""
+
+    def iterRows(self, **kwargs):
+        yield 'Task name', 'build'
+        yield 'Framework', pageLink('FrameworkDetails', id='build')['build']
+        yield 'Timeout', 'never'
+        yield 'Started', '2020-01-02 12:34'
+        yield 'Duration', '1:23'
+        yield 'Summary', 'all 1234 tests passed'
+        yield 'Task Runner', pageLink('TaskRunnerDetails', runnerId='tr1')[
+            'tr1'
+            ]
+        for index in range(20):
+            yield f'param{index}', f'value <{index}> & more'
+
+def createTaskPage():
+    return xhtml.div(class_='body')[
+        xhtml.ul(class_='tabs')[(
+            xhtml.li[ pageLink('Task', jobId='j', taskName='t',
+                               report=f'report{index}')[ f'Report {index}' ] ]
+            for index in range(8)
+            )],
+        TaskPropertiesTable.instance,
+        xhtml.iframe(src='jobs/j/t/report.html', class_='report')
+        ]
+
+def createExecutePage(numTasks):
+    return xhtml.form(method='post', action='Execute', id='execute')[
+        xhtml.input(type='hidden', name='config', value='nightly'),
+        xhtml.table(class_='hollow')[xhtml.tbody[(
+            xhtml.tr[
+                xhtml.td[xhtml.input(type='checkbox', name=f'task.{index}',
+                                     value='on', checked=index % 2 == 0)],
+                xhtml.td[ f'task{index}' ],
+                xhtml.td[xhtml.input(type='text', name=f'prio.{index}',
+                                     value=str(index), size=4)],
+                xhtml.td[xhtml.select(name=f'runner.{index}')[(
+                    xhtml.option(value=f'tr{runner}',
+                                 selected=runner == index % 5)[
+                        f'Task Runner {runner}'
+                        ]
+                    for runner in range(5)
+                    )]]
+                ]
+            for index in range(numTasks)
+            )]],
+        xhtml.p[
+            xhtml.button(type='submit', name='action', value='next')['Next'],
+            xhtml.button(type='submit', name='action', value='cancel')[
+                'Cancel'
+                ]
+            ]
+        ]
+
+benchmarkPages = {
+    'ReportIndex': lambda: xhtml.div[ ReportTable(100) ],
+    'Task': createTaskPage,
+    'Execute': lambda: createExecutePage(50),
+    }
+
+def presentPage(name):
+    return xhtml.html[ xhtml.body[ benchmarkPages[name]() ] ].present()
+
+def renderPage(name):
+    return presentPage(name).flattenXML()
+
+def benchmark(repeat=50):
+    for name in benchmarkPages:
+        presentTime = flattenTime = 0.0
+        for _ in range(repeat):
+            start = perf_counter()
+            page = presentPage(name)
+            presented = perf_counter()
+            page.flattenXML()
+            flattened = perf_counter()
+            presentTime += presented - start
+            flattenTime += flattened - presented
+        print(f'{name}: '
+              f'presented in {presentTime * 1000 / repeat:.2f} ms, '
+              f'flattened in {flattenTime * 1000 / repeat:.2f} ms per page')
+
+if __name__ == '__main__':
+    benchmark()
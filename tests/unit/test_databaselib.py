@@ -52,6 +52,8 @@ class Observer:
         self.updatedRecords = []
     def added(self, record):
         self.addedRecords.append(record)
+    def addedMany(self, records):
+        self.addedRecords += records
     def removed(self, record):
         self.removedRecords.append(record)
     def updated(self, record):
@@ -138,6 +140,29 @@ def testAdd(createDB):
     db, observer = createDB()
     checkOne(db, record)
 
+@mark.parametrize('createDB', [Database, VersionedDatabase], indirect=True)
+def testAddMany(createDB):
+    "Test adding multiple records in one batch."
+    db, observer = createDB()
+    records = [
+        Record({'id': f'id_{index:d}', 'a': str(index)})
+        for index in range(3)
+        ]
+    db.addMany(records)
+    assert sorted(db.keys()) == ['id_0', 'id_1', 'id_2']
+    checkNotify(observer, added=records)
+
+    # A duplicate ID rejects the entire batch.
+    with raises(KeyError):
+        db.addMany([Record({'id': 'id_3'}), Record({'id': 'id_1'})])
+    with raises(KeyError):
+        db.addMany([Record({'id': 'id_4'}), Record({'id': 'id_4'})])
+    checkNotify(observer, added=records)
+
+    db, observer = createDB()
+    assert sorted(db.keys()) == ['id_0', 'id_1', 'id_2']
+    assert db['id_2'].properties == records[2].properties
+
 class IntentionalError(Exception):
     "Thrown to test handling of arbitrary errors."
 
@@ -256,6 +281,31 @@ def testUpdateInvalid(createDB):
     db, observer = createDB()
     checkEmpty(db)
 
+@mark.parametrize('createDB', [Database, VersionedDatabase], indirect=True)
+def testChangeCount(createDB):
+    "Test the change counters of the database and its records."
+    db, observer = createDB()
+    assert db.changeCount == 0
+    record1 = Record({'id': 'id_1'})
+    db.add(record1)
+    assert db.changeCount == record1.changeCount == 1
+    record2 = Record({'id': 'id_2'})
+    record3 = Record({'id': 'id_3'})
+    db.addMany([record2, record3])
+    assert db.changeCount == record2.changeCount == record3.changeCount == 2
+    record1 = Record({'id': 'id_1', 'a': 'x'})
+    db.update(record1)
+    assert db.changeCount == record1.changeCount == 3
+    assert record2.changeCount == 2
+    db.remove(record2)
+    assert db.changeCount == 4
+    assert record3.changeCount == 2
+
+    # Counters start over when the database is loaded.
+    db, observer = createDB()
+    assert db.changeCount == 0
+    assert db['id_1'].changeCount == 0
+
 def runMixedAction(db, rnd):
     keys = []
     dataDict = {}
@@ -0,0 +1,191 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test assignment of tasks to Task Runners by dispatch cycles."""
+
+from io import StringIO
+
+from softfab.dispatcher import Dispatcher
+from softfab.joblib import UnfinishedJobs
+from softfab.resourcelib import RequestFactory
+from softfab.resultcode import ResultCode
+from softfab.xmlbind import parse
+
+from datageneratorlib import DataGenerator
+
+
+class DummyReactor:
+    """Dummy replacement for Twisted's reactor that records the calls
+    instead of performing them.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def callLater(self, delay, func, *args, **kw):
+        self.calls.append((delay, func))
+        return DummyCall()
+
+class DummyCall:
+    def active(self):
+        return True
+
+def syncData(run=None):
+    """Returns the data a Task Runner sends on sync."""
+    if run is None:
+        runXML = ''
+    else:
+        job = run.getJob()
+        runXML = f'<run jobId="{job.getId()}" taskId="{run.getName()}" ' \
+                 f'runId="{run.getRunId()}"/>'
+    return parse(RequestFactory(), StringIO(
+        f'<request runnerVersion="3.0.0" host="factorypc">{runXML}</request>'
+        ))
+
+def createFactory(databases, numTasks, numRunners):
+    gen = DataGenerator(databases)
+    fwName = gen.createFramework('testfw1')
+    for index in range(numTasks):
+        gen.createTask(f'task{index}', fwName)
+    runners = [
+        databases.resourceDB[gen.createTaskRunner(capabilities=[fwName])]
+        for _ in range(numRunners)
+        ]
+    config = gen.createConfiguration()
+    return gen, config, runners
+
+def testDispatchAllIdle(databases):
+    """Test that a single cycle assigns work to all idle Task Runners."""
+    gen, config, runners = createFactory(databases, 3, 2)
+    reactor = DummyReactor()
+    dispatcher = Dispatcher(databases.resourceDB,
+                            UnfinishedJobs(databases.jobDB), reactor)
+
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+    # Adding the job should request a single cycle.
+    assert len(reactor.calls) == 1
+
+    assert dispatcher.dispatch() == 2
+    assert all(runner.isReserved() for runner in runners)
+    assert dispatcher.stats.cycles == 1
+    assert dispatcher.stats.assigned == 2
+
+    # Syncing before the run was handed over is not a conflict.
+    for runner in runners:
+        assert not runner.sync(databases.jobDB, syncData())
+        run = runner.takeStagedRun()
+        assert run is not None
+        assert run.isRunning()
+        assert runner.takeStagedRun() is None
+        assert not runner.sync(databases.jobDB, syncData(run))
+        assert run.isRunning()
+
+def testDispatchStagedAbort(databases):
+    """Test aborting a run that was staged but not handed over."""
+    gen, config, runners = createFactory(databases, 1, 1)
+    runner, = runners
+    dispatcher = Dispatcher(databases.resourceDB,
+                            UnfinishedJobs(databases.jobDB), DummyReactor())
+
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+    assert dispatcher.dispatch() == 1
+    run = runner.getRun()
+    assert run is not None
+    run.abort('tester')
+
+    assert not runner.sync(databases.jobDB, syncData())
+    assert not run.isRunning()
+    assert run.result is ResultCode.ERROR
+    assert not runner.isReserved()
+    assert runner.takeStagedRun() is None
+
+def testDispatchStagedReload(databases):
+    """Test that staged runs survive reloading the databases."""
+    gen, config, runners = createFactory(databases, 1, 1)
+    runner, = runners
+    dispatcher = Dispatcher(databases.resourceDB,
+                            UnfinishedJobs(databases.jobDB), DummyReactor())
+
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+    assert dispatcher.dispatch() == 1
+    runId = runner.getRun().getId()
+
+    databases.reload()
+    runner = databases.resourceDB[runner.getId()]
+    assert not runner.sync(databases.jobDB, syncData())
+    run = runner.takeStagedRun()
+    assert run is not None
+    assert run.getId() == runId
+
+def testDispatchHandOverReload(databases):
+    """Test that a handed over run is not aborted after reloading
+    the databases.
+    """
+    gen, config, runners = createFactory(databases, 2, 1)
+    runner, = runners
+    dispatcher = Dispatcher(databases.resourceDB,
+                            UnfinishedJobs(databases.jobDB), DummyReactor())
+
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+    assert dispatcher.dispatch() == 1
+    run = runner.takeStagedRun()
+    assert run is not None
+    runId = run.getId()
+
+    # The hand-over is stored.
+    databases.reload()
+    runner = databases.resourceDB[runner.getId()]
+    assert runner.takeStagedRun() is None
+    run = databases.jobDB[job.getId()].getTask(run.getName()).getLatestRun()
+    assert not runner.sync(databases.jobDB, syncData(run))
+    assert run.isRunning()
+    job = databases.jobDB[job.getId()]
+    job.taskDone(run.getName(), ResultCode.OK, 'summary text', (), {})
+    assert not runner.sync(databases.jobDB, syncData())
+
+    # A Task Runner reporting a run that is still marked as staged
+    # is executing it: the run was handed over.
+    dispatcher = Dispatcher(databases.resourceDB,
+                            UnfinishedJobs(databases.jobDB), DummyReactor())
+    assert dispatcher.dispatch() == 1
+    run = runner.getRun()
+    assert run is not None and run.getId() != runId
+    assert not runner.sync(databases.jobDB, syncData(run))
+    assert run.isRunning()
+    assert runner.takeStagedRun() is None
+    databases.reload()
+    runner = databases.resourceDB[runner.getId()]
+    assert runner.takeStagedRun() is None
+
+def testAssignOnSync(databases):
+    """Test assignment when a Task Runner syncs."""
+    gen, config, runners = createFactory(databases, 2, 1)
+    runner, = runners
+
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+
+    # Without a reactor, there are no cycles: search on sync.
+    dispatcher = Dispatcher(databases.resourceDB,
+                            UnfinishedJobs(databases.jobDB), None)
+    run = dispatcher.assignOnSync(runner)
+    assert run is not None
+    assert runner.getRun() is run
+    job.taskDone(run.getName(), ResultCode.OK, 'summary text', (), {})
+
+    # A Task Runner that was not part of the last cycle gets a cycle
+    # performed for it.
+    dispatcher = Dispatcher(databases.resourceDB,
+                            UnfinishedJobs(databases.jobDB), DummyReactor())
+    run = dispatcher.assignOnSync(runner)
+    assert run is not None
+    assert runner.getRun() is run
+    assert dispatcher.stats.cycles == 1
+    job.taskDone(run.getName(), ResultCode.OK, 'summary text', (), {})
+
+    # A Task Runner that was considered in the last cycle does not.
+    assert dispatcher.assignOnSync(runner) is None
+    assert dispatcher.stats.cycles == 1
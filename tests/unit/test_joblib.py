@@ -11,8 +11,10 @@ import random
 
 from pytest import raises
 
+from softfab.joblib import TaskToJobs
 from softfab.resultcode import ResultCode
 from softfab.taskgroup import TaskGroup
+from softfab.timelib import setTime
 from softfab.utils import IllegalStateError
 
 from datageneratorlib import DataGenerator
@@ -746,3 +748,138 @@ def testJobResourceRemovedWhileRunning(databases):
     assert job.hasFinalResult()
     assert job.result == ResultCode.OK
     assert job.getFinalResult() == ResultCode.OK
+
+def testJobTaskStateLog(databases):
+    """Test that task state changes are logged instead of rewriting the job,
+    and that the logged states are restored when the job is loaded.
+    """
+    gen = DataGenerator(databases)
+    image = gen.createProduct('image')
+    buildFw = gen.createFramework('build', [], [ image ])
+    testFw = gen.createFramework('test', [ image ], [])
+    buildTask = gen.createTask('build', buildFw)
+    testTask1 = gen.createTask('test1', testFw)
+    testTask2 = gen.createTask('test2', testFw)
+    tr = gen.createTaskRunner(name='tr', capabilities=['build', 'test'])
+    config = gen.createConfiguration()
+
+    job, = config.createJobs(gen.owner)
+    jobId = job.getId()
+    databases.jobDB.add(job)
+    jobPath = databases.dbDir / 'jobs' / f'{jobId}.xml'
+    logPath = databases.dbDir / 'jobs' / f'{jobId}.tasks'
+    jobData = jobPath.read_bytes()
+
+    def runTask(name, result):
+        job = databases.jobDB[jobId]
+        task = job.assignTask(databases.resourceDB[tr])
+        assert task is not None
+        assert task.getName() == name
+        taskDone(job, name, result)
+
+    # Finished tasks are appended to the log; the job is not rewritten.
+    runTask(buildTask, ResultCode.OK)
+    runTask(testTask1, ResultCode.INSPECT)
+    assert jobPath.read_bytes() == jobData
+    assert logPath.exists()
+
+    # Logged states are restored on load.
+    databases.reload()
+    job = databases.jobDB[jobId]
+    assert job.getTask(buildTask).isDone()
+    assert job.getTask(buildTask).result is ResultCode.OK
+    assert job.getTask(testTask1).isDone()
+    assert job.getTask(testTask1).result is ResultCode.INSPECT
+    assert job.getTask(testTask2).isWaiting()
+
+    # Logging continues after a reload.
+    runTask(testTask2, ResultCode.WARNING)
+    assert jobPath.read_bytes() == jobData
+    databases.reload()
+    job = databases.jobDB[jobId]
+    assert job.isExecutionFinished()
+    assert job.getTask(testTask2).result is ResultCode.WARNING
+    assert not job.hasFinalResult()
+
+    # Once the job is final, it is rewritten and the log is dropped.
+    logData = logPath.read_bytes()
+    job.inspectDone(testTask1, ResultCode.OK, 'inspected')
+    assert job.hasFinalResult()
+    assert jobPath.read_bytes() != jobData
+    assert not logPath.exists()
+    databases.reload()
+    job = databases.jobDB[jobId]
+    assert job.hasFinalResult()
+    assert job.getTask(testTask1).result is ResultCode.OK
+    assert job.getFinalResult() is ResultCode.WARNING
+
+    # A log that survived the rewrite, for example because of a crash,
+    # does not revert the job to an older state.
+    logPath.write_bytes(logData)
+    databases.reload()
+    job = databases.jobDB[jobId]
+    assert job.hasFinalResult()
+    assert job.getTask(testTask1).result is ResultCode.OK
+
+    # The log is removed together with the job.
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+    logPath = databases.dbDir / 'jobs' / f'{job.getId()}.tasks'
+    jobId = job.getId()
+    runTask(buildTask, ResultCode.OK)
+    assert logPath.exists()
+    databases.reload()
+    databases.jobDB.remove(databases.jobDB[jobId])
+    assert not logPath.exists()
+
+def testJobCreateTimeIndex(databases):
+    """Test lookup of jobs and tasks by create time range."""
+
+    class CustomGenerator(DataGenerator):
+        numTasks = 1
+        numInputs = [ 0 ]
+        numOutputs = [ 0 ]
+
+    gen = CustomGenerator(databases)
+    gen.createDefinitions()
+    config = gen.createConfiguration()
+    taskName = gen.tasks[0]
+    jobDB = databases.jobDB
+    taskToJobs = TaskToJobs(jobDB)
+
+    # Jobs are not necessarily added in create time order.
+    for createTime in (3000, 1000, 2000, 4000, 2000):
+        setTime(createTime)
+        job, = config.createJobs(gen.owner)
+        jobDB.add(job)
+
+    def check():
+        def createTimes(jobs):
+            return [job.getCreateTime() for job in jobs]
+        assert createTimes(jobDB.getCreatedBetween()) \
+                == [1000, 2000, 2000, 3000, 4000]
+        assert createTimes(jobDB.getCreatedBetween(2000, 3000)) \
+                == [2000, 2000, 3000]
+        assert createTimes(jobDB.getCreatedBetween(1500)) \
+                == [2000, 2000, 3000, 4000]
+        assert createTimes(jobDB.getCreatedBetween(None, 1999)) == [1000]
+        assert createTimes(jobDB.getCreatedBetween(4001)) == []
+        assert [
+            task.getJob().getCreateTime()
+            for task in taskToJobs.iterAllTasks([taskName], 1000, 2999)
+            ] == [1000, 2000, 2000]
+
+    check()
+    databases.reload()
+    jobDB = databases.jobDB
+    taskToJobs = TaskToJobs(jobDB)
+    check()
+
+    # Removed jobs are dropped from the index.
+    databases.reload()
+    jobDB = databases.jobDB
+    job = jobDB.getCreatedBetween(2000, 2000)[1]
+    jobDB.remove(job)
+    assert list(jobDB.getCreatedBetween(1500, 2500)) \
+            == [jobDB.getCreatedBetween(2000, 2000)[0]]
+    assert job not in jobDB.getCreatedBetween()
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the load simulation harness on a small factory."""
+
+import json
+
+from pytest import mark, raises
+
+from softfab.Page import InvalidRequest
+from softfab.resourcelib import syncStateDigest
+
+from loadsimlib import LoadSimulation
+
+
+@mark.parametrize('protocol', ('xml', 'json'))
+def testLoadSimulation(tmp_path, protocol):
+    """Test that all tasks are executed and measurements are reported."""
+    sim = LoadSimulation(tmp_path, numRunners=4, numJobs=3, tasksPerJob=5,
+                         durations=(10, 60), protocol=protocol)
+    stats = sim.run()
+
+    assert stats.tasksTotal == 15
+    assert stats.taskDones == 15
+    assert stats.assignments == 15
+    assert len(sim.unfinishedJobs) == 0
+    assert stats.syncs >= stats.assignments
+    assert len(stats.syncLatencies) >= stats.syncs
+    assert len(stats.doneLatencies) == 15
+    percentiles = stats.latencyPercentiles()
+    assert 0 < percentiles['p50'] <= percentiles['p99'] <= percentiles['max']
+    assert stats.dbWrites['jobDB'] > 0
+    assert stats.dbWrites['resourceDB'] > 0
+    report = list(stats.report())
+    assert report[0] == 'tasks executed: 15 of 15'
+
+def testSyncJSONUnknownKeys(tmp_path):
+    """Test that the JSON sync rejects keys it does not know about,
+    since those would end up in the Task Runner record.
+    """
+    sim = LoadSimulation(tmp_path, numRunners=1, numJobs=1, tasksPerJob=1,
+                         protocol='json')
+    runner, = sim.runners
+    validState = dict(runner.state)
+    for key in ('bad key"/><x', 'extra'):
+        runner.state = dict(validState, **{key: 'v'})
+        runner.digest = syncStateDigest(runner.state)
+        with raises(InvalidRequest):
+            runner.sync()
+        assert runner.record['host'] == '?'
+
+    # A valid sync starts the task.
+    runner.state = validState
+    runner.digest = syncStateDigest(validState)
+    runner.sync()
+    assert runner.record['host'] == validState['host']
+    assert runner.run is not None
+
+    # The same applies to the reported run.
+    runner.sendState = False
+    run = runner.run
+    runner.run = None
+    def runBody():
+        return json.dumps({
+            'digest': runner.digest,
+            'run': dict(jobId=run.getJob().getId(), taskId=run.getName(),
+                        runId=run.getRunId(), extra='v'),
+            }).encode()
+    runner.syncBody = runBody
+    with raises(InvalidRequest):
+        runner.sync()
@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test resolution of inherited parameters."""
+
+from softfab.frameworklib import Framework
+from softfab.taskdeflib import TaskDef
+
+
+def createLevels():
+    framework = Framework.create('fw', (), ())
+    framework.addParameter('a', 'fw-a', final=True)
+    framework.addParameter('b', 'fw-b')
+    taskDef = TaskDef({'id': 'td', 'parent': 'fw'}, None)
+    taskDef.addParameter('b', 'td-b')
+    taskDef.addParameter('c', 'td-c')
+    return framework, taskDef
+
+def testParamInherit():
+    """Test parameters inherited from the framework."""
+    framework, taskDef = createLevels()
+    getParent = lambda key: framework
+    assert taskDef.getParameters(getParent) == {
+        'a': 'fw-a', 'b': 'td-b', 'c': 'td-c', 'sf.wrapper': 'fw'
+        }
+    assert taskDef.getParameter('a', getParent) == 'fw-a'
+    assert taskDef.getParameter('d', getParent) is None
+    assert taskDef.isFinal('a', getParent)
+    assert taskDef.isFinal('sf.wrapper', getParent)
+    assert not taskDef.isFinal('b', getParent)
+
+def testParamCacheReuse():
+    """Test that resolved parameters are reused while nothing changes."""
+    framework, taskDef = createLevels()
+    getParent = lambda key: framework
+    resolved = taskDef.getResolved(getParent)
+    assert taskDef.getResolved(getParent) is resolved
+
+def testParamCacheInvalidate():
+    """Test that resolved parameters follow changes at any level."""
+    framework, taskDef = createLevels()
+    getParent = lambda key: framework
+    assert taskDef.getParameter('b', getParent) == 'td-b'
+
+    # Change on own level.
+    taskDef.addParameter('b', 'td-b2')
+    assert taskDef.getParameter('b', getParent) == 'td-b2'
+
+    # Change on parent level.
+    framework.addParameter('d', 'fw-d', final=True)
+    assert taskDef.getParameter('d', getParent) == 'fw-d'
+    assert taskDef.isFinal('d', getParent)
+
+    # Different parent, such as a new framework version.
+    framework2 = Framework.create('fw', (), ())
+    framework2.addParameter('a', 'fw2-a')
+    getParent2 = lambda key: framework2
+    assert taskDef.getParameter('a', getParent2) == 'fw2-a'
+    assert not taskDef.isFinal('a', getParent2)
+    assert taskDef.getParameter('a', getParent) == 'fw-a'
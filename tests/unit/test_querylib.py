@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test sorting and selection of records."""
+
+from random import Random
+
+from softfab.querylib import (
+    KeySorter, SortedOrderCache, TrigramIndex, WildcardFilter
+)
+
+from datageneratorlib import DataGenerator
+
+
+def createRecords(count, seed=1234):
+    rnd = Random(seed)
+    return [
+        {
+            'id': f'rec{index:04d}',
+            'group': rnd.choice(('a', 'b', 'c')),
+            'size': rnd.choice((None, 1, 2, 3)),
+            }
+        for index in range(count)
+        ]
+
+def testSortMissing():
+    """Test that records without a value are sorted last."""
+    records = createRecords(100)
+    original = list(records)
+    sorter = KeySorter.forCustom(['size', 'id'], ('id',))
+    sizes = [record['size'] for record in sorter(records)]
+    assert records == original
+    numMissing = sizes.count(None)
+    assert 0 < numMissing < len(sizes)
+    assert sizes[-numMissing:] == [None] * numMissing
+    assert sizes[:-numMissing] == sorted(sizes[:-numMissing])
+
+def testSelectMatchesSort():
+    """Test that selecting the first records gives the same result as
+    sorting all records and slicing.
+    """
+    records = createRecords(500)
+    for keyOrder in (['id'], ['group', 'id'], ['size', 'group', 'id']):
+        sorter = KeySorter.forCustom(keyOrder, ('id',))
+        full = sorter(records)
+        for count in (0, 1, 10, 100, 499, 500, 1000):
+            assert sorter.select(records, count) == full[:count], \
+                (keyOrder, count)
+
+def testSelectStable():
+    """Test that selection keeps records that sort equal in input order."""
+    records = createRecords(200)
+    # Declaring a non-unique key as unique prevents the records themselves
+    # from being compared, which dictionaries do not support.
+    sorter = KeySorter.forCustom(['group', 'size'], ('size',))
+    assert sorter.select(records, 50) == sorter(records)[:50]
+
+def testSortedOrderCache(databases):
+    """Test that sorted orders are cached until the database changes."""
+    configDB = databases.configDB
+    gen = DataGenerator(databases)
+    for index in (3, 1, 2):
+        gen.createConfiguration(name=f'config{index}')
+    cache = SortedOrderCache(2)
+    keyOrder = ['name']
+    expected = KeySorter.forDB(keyOrder, configDB)(configDB)
+    assert [config.getId() for config in expected] \
+            == ['config1', 'config2', 'config3']
+
+    # An order is stored when it is requested again without changes.
+    assert cache.get(configDB, keyOrder) is None
+    cached = cache.get(configDB, keyOrder)
+    assert cached == expected
+    assert cache.get(configDB, keyOrder) is cached
+    assert cache.hits == 1
+
+    # Any change invalidates the cached order.
+    gen.createConfiguration(name='config0')
+    assert cache.get(configDB, keyOrder) is None
+    cached = cache.get(configDB, keyOrder)
+    assert [config.getId() for config in cached] \
+            == ['config0', 'config1', 'config2', 'config3']
+
+    # Filtered records can be sorted on their position in a cached order.
+    rankRetriever = cache.getRankRetriever(configDB, keyOrder)
+    assert rankRetriever is not None
+    subset = [configDB['config3'], configDB['config0'], configDB['config2']]
+    assert [config.getId() for config in sorted(subset, key=rankRetriever)] \
+            == ['config0', 'config2', 'config3']
+    gen.createConfiguration(name='config4')
+    assert cache.getRankRetriever(configDB, keyOrder) is None
+    assert cache.getRankRetriever(configDB, keyOrder) is not None
+
+    # Values of volatile keys are never cached.
+    configDB.volatileKeys = ('name',)
+    assert cache.get(configDB, keyOrder) is None
+    assert cache.get(configDB, keyOrder) is None
+
+def testTrigramIndex(databases):
+    """Test that wildcard matches through the index are the same as
+    the matches of a wildcard filter, while records change.
+    """
+    configDB = databases.configDB
+    gen = DataGenerator(databases)
+    index = TrigramIndex(configDB, 'name')
+    names = ('nightly-build', 'nightly-test', 'weekly-build', 'nb', 'x1')
+    for name in names:
+        gen.createConfiguration(name=name)
+    patterns = (
+        '*', 'nightly-build', '*build', 'nightly*', '*ly-*', '*-t?st',
+        'n*b*', '??', 'nb', 'nbx', '*missing*', 'x[1]', '*[0-9]*',
+        )
+
+    def check():
+        for pattern in patterns:
+            expected = set(WildcardFilter('name', pattern, configDB)(configDB))
+            assert set(index.getMatches(pattern).values()) == expected, \
+                pattern
+            assert set(index.createFilter(pattern)(configDB)) == expected, \
+                pattern
+            # Other record collections are filtered in order.
+            records = list(configDB)
+            assert list(index.createFilter(pattern)(records)) \
+                    == [record for record in records if record in expected], \
+                    pattern
+
+    check()
+    configDB.remove(configDB['nightly-test'])
+    check()
+    gen.createConfiguration(name='nightly-test2')
+    check()
@@ -4,7 +4,8 @@
 test_resource_requirements suite.
 """
 
-from softfab.resourcelib import ResourceDB
+from softfab.resourcelib import RepositoryLocatorIndex, ResourceDB
+from softfab.restypelib import repoResourceTypeName
 
 
 def testResourcesOfType(tmp_path):
@@ -59,3 +60,43 @@ def testResourcesOfType(tmp_path):
     resourceDB = createDB()
     assert resourcesOfType('TA') == ['R1']
     assert resourcesOfType('TB') == ['R2', 'R3']
+
+def testRepositoryLocatorIndex(tmp_path):
+    """Test finding repositories by locator."""
+
+    resourceDB = ResourceDB(tmp_path)
+    resourceDB.factory.resTypeDB = None
+    resourceDB.preload()
+
+    def newRepo(repoId, locator):
+        repo = resourceDB.factory.newResource(
+            repoId, repoResourceTypeName, '', ()
+            )
+        repo.addParameter('locator', locator)
+        return repo
+
+    resourceDB.add(newRepo('R1', 'https://example.com/One.git'))
+    index = RepositoryLocatorIndex(resourceDB)
+    resourceDB.add(newRepo('R2', 'https://example.com/two.git'))
+    other = resourceDB.factory.newResource('R3', 'TA', '', ())
+    other.addParameter('locator', 'https://example.com/three.git')
+    resourceDB.add(other)
+
+    def find(*urls):
+        repo = index.findRepository(urls)
+        return None if repo is None else repo.getId()
+
+    # Lookup is case-insensitive and only considers repositories.
+    assert find('https://example.com/one.git') == 'R1'
+    assert find('git@example.com:two.git', 'HTTPS://EXAMPLE.COM/TWO.GIT') \
+            == 'R2'
+    assert find('https://example.com/three.git') is None
+
+    # Changing the locator.
+    resourceDB.update(newRepo('R1', 'https://example.com/uno.git'))
+    assert find('https://example.com/one.git') is None
+    assert find('https://example.com/uno.git') == 'R1'
+
+    # Removing the repository.
+    resourceDB.remove(resourceDB['R2'])
+    assert find('https://example.com/two.git') is None
@@ -1,8 +1,17 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from functools import partial
+from gzip import decompress
 
-from softfab.response import _encodeHeaderValue
+from twisted.internet.defer import ensureDeferred, succeed
+from twisted.internet.interfaces import IConsumer
+from twisted.internet.task import Clock
+from twisted.web.test.requesthelper import DummyRequest
+from zope.interface import implementer
+
+from softfab import response as responseModule
+from softfab.response import Response, _encodeHeaderValue
+from softfab.useragent import UserAgent
 
 def test_encodeHeaderValue():
     enc = partial(_encodeHeaderValue, b'filename')
@@ -10,3 +19,112 @@ def test_encodeHeaderValue():
     assert enc('ASCII, but non-trivial!') == b'filename="ASCII, but non-trivial!"'
     assert enc('control\n') == b'''filename="control_"; filename*=UTF-8''control%0A'''
     assert enc('\u20AC.svg') == b'''filename="_.svg"; filename*=UTF-8''%E2%82%AC.svg'''
+
+@implementer(IConsumer)
+class StreamingRequest(DummyRequest):
+    """Request that keeps track of a registered push producer."""
+
+    def __init__(self, gzip):
+        super().__init__([b''])
+        self.producer = None
+        self.etag = None
+        if gzip:
+            self.requestHeaders.setRawHeaders(b'accept-encoding', [b'gzip'])
+
+    def registerProducer(self, producer, streaming):
+        assert streaming
+        self.producer = producer
+
+    def unregisterProducer(self):
+        self.producer = None
+
+def createResponse(request):
+    return Response(request, "'none'", UserAgent('', ''))
+
+def test_responseStreaming(monkeypatch):
+    """Test that a streaming response is sent while it is being written."""
+    clock = Clock()
+    monkeypatch.setattr(responseModule, 'reactor', clock)
+    request = StreamingRequest(gzip=True)
+    response = createResponse(request)
+    response.startStreaming()
+    assert request.producer is not None
+
+    line = b'%d: some text that compresses well\n'
+    for index in range(5000):
+        response.write(line % index)
+    assert request.written, 'large response was not flushed'
+
+    # Writing is flushed when returning to the reactor.
+    numWritten = len(request.written)
+    response.write(b'end\n')
+    d = response.returnToReactor()
+    assert len(request.written) == numWritten + 1
+    clock.advance(0)
+    assert d.called
+
+    # Backpressure from the client postpones resuming.
+    request.producer.pauseProducing()
+    d = response.returnToReactor()
+    clock.advance(0)
+    assert not d.called
+    request.producer.resumeProducing()
+    clock.advance(0)
+    assert d.called
+
+    ensureDeferred(response.finish())
+    assert request.producer is None
+    assert request.responseHeaders.getRawHeaders(b'content-encoding') \
+            == [b'gzip']
+    assert request.etag is None
+    body = decompress(b''.join(request.written))
+    assert body == b''.join(line % index for index in range(5000)) + b'end\n'
+
+def test_responseBuffered():
+    """Test that a response that is not streaming is written in one go."""
+    request = StreamingRequest(gzip=False)
+    request.setETag = lambda etag: setattr(request, 'etag', etag)
+    response = createResponse(request)
+    response.write('small page')
+    assert request.written == []
+    ensureDeferred(response.finish())
+    assert request.written == [b'small page']
+    assert request.etag is not None
+
+def test_responseCompressOffload(monkeypatch):
+    """Test that large bodies are compressed in a worker thread."""
+    offloaded = []
+    def deferToThread(func, *args):
+        offloaded.append(func)
+        return succeed(func(*args))
+    monkeypatch.setattr(responseModule, 'deferToThread', deferToThread)
+    monkeypatch.setattr(responseModule, 'compressThreshold', 1000)
+    monkeypatch.setattr(responseModule, 'compressionStats',
+                        responseModule.CompressionStats())
+    stats = responseModule.compressionStats
+
+    for size in (1000, 1001):
+        request = StreamingRequest(gzip=True)
+        request.setETag = lambda etag: None
+        response = createResponse(request)
+        response.write(b'x' * size)
+        ensureDeferred(response.finish())
+        assert decompress(b''.join(request.written)) == b'x' * size
+
+    assert len(offloaded) == 1
+    assert stats.inline == 1
+    assert stats.offloaded == 1
+    assert stats.bytesIn == 2001
+    assert 0 < stats.bytesOut < stats.bytesIn
+
+def test_responseMatchesETag():
+    """Test checking an entity tag before the response is produced."""
+    for gzip, sentTag in ((False, b'abc'), (True, b'abc-gzip')):
+        request = StreamingRequest(gzip=gzip)
+        response = createResponse(request)
+        assert not response.matchesETag(b'abc')
+        request.requestHeaders.setRawHeaders(b'if-none-match',
+                                             [b'xyz ' + sentTag])
+        assert response.matchesETag(b'abc')
+        assert not response.matchesETag(b'abd')
+        assert request.etag is None
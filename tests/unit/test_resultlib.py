@@ -96,3 +96,87 @@ def testResultsListKeysNone(resultStorage):
     """Tests listing the keys if no data is stored for a task name."""
 
     assert resultStorage.getCustomKeys(TASK_NAME) == set()
+
+def writeOldValues(basePath, values, key=KEY):
+    """Stores values in the layout used by older versions: one file
+    per value.
+    """
+    keyPath = basePath / TASK_NAME / key
+    keyPath.mkdir(parents=True, exist_ok=True)
+    for runId, value in values.items():
+        (keyPath / runId).write_text(value)
+
+def testResultsAppendAfterRead(resultStorage):
+    """Check that values stored after a read are found by the next read."""
+
+    runIds = [f'run{index:02d}' for index in range(NR_RUNS)]
+    for index, runId in enumerate(runIds):
+        resultStorage.putData(TASK_NAME, runId, {KEY: str(index)})
+        results = resultStorage.getCustomData(TASK_NAME, runIds, KEY)
+        assert list(results) == [
+            (runId, str(index)) for index, runId in enumerate(runIds[:index + 1])
+            ]
+
+    # A value is stored on a single line.
+    resultStorage.putData(TASK_NAME, RUN_ID, {KEY: 'first\nsecond'})
+    results = resultStorage.getCustomData(TASK_NAME, [RUN_ID], KEY)
+    assert list(results) == [(RUN_ID, 'first')]
+
+def testResultsOldLayout(resultStorage):
+    """Check that values stored by older versions can be read."""
+
+    writeOldValues(resultStorage.basePath, {'run00': 'old0', 'run01': 'old1'})
+    resultStorage.putData(TASK_NAME, 'run02', {KEY: 'new2'})
+    assert resultStorage.getCustomKeys(TASK_NAME) == {KEY}
+    results = resultStorage.getCustomData(
+        TASK_NAME, ['run00', 'run01', 'run02', 'run03'], KEY
+        )
+    assert list(results) == [
+        ('run00', 'old0'), ('run01', 'old1'), ('run02', 'new2')
+        ]
+
+def testResultsConvert(resultStorage):
+    """Check that values stored by older versions are moved to
+    column files by conversion.
+    """
+
+    writeOldValues(resultStorage.basePath, {
+        'run00': 'old0', 'run01': 'old1', 'run02': 'old2'
+        })
+    # Values stored after an upgrade take precedence over old values.
+    resultStorage.putData(TASK_NAME, 'run01', {KEY: 'new1'})
+    resultStorage.putData(TASK_NAME, 'run03', {KEY: 'new3'})
+    runIds = ['run00', 'run01', 'run02', 'run03']
+    expected = [
+        ('run00', 'old0'), ('run01', 'new1'),
+        ('run02', 'old2'), ('run03', 'new3'),
+        ]
+    assert list(resultStorage.getCustomData(TASK_NAME, runIds, KEY)) \
+            == expected
+
+    assert resultStorage.convert() == 3
+    assert not (resultStorage.basePath / TASK_NAME / KEY).exists()
+    assert resultStorage.getCustomKeys(TASK_NAME) == {KEY}
+    assert list(resultStorage.getCustomData(TASK_NAME, runIds, KEY)) \
+            == expected
+    assert resultStorage.convert() == 0
+
+def testResultsOldLayoutKeySuffix(resultStorage):
+    """Check that old keys cannot be mistaken for column files."""
+
+    writeOldValues(resultStorage.basePath, {'run00': 'a.col'}, 'a.col')
+    assert resultStorage.getCustomKeys(TASK_NAME) == {'a.col'}
+    resultStorage.putData(TASK_NAME, 'run01', {'a': 'new'})
+    assert resultStorage.getCustomKeys(TASK_NAME) == {'a', 'a.col'}
+    runIds = ['run00', 'run01']
+    assert list(resultStorage.getCustomData(TASK_NAME, runIds, 'a')) \
+            == [('run01', 'new')]
+    assert list(resultStorage.getCustomData(TASK_NAME, runIds, 'a.col')) \
+            == [('run00', 'a.col')]
+
+    assert resultStorage.convert() == 1
+    assert resultStorage.getCustomKeys(TASK_NAME) == {'a', 'a.col'}
+    assert list(resultStorage.getCustomData(TASK_NAME, runIds, 'a')) \
+            == [('run01', 'new')]
+    assert list(resultStorage.getCustomData(TASK_NAME, runIds, 'a.col')) \
+            == [('run00', 'a.col')]
@@ -4,6 +4,7 @@ from pytest import fixture, mark
 
 from datageneratorlib import DataGenerator
 
+from softfab.databaselib import RecordObserver
 from softfab.resultcode import ResultCode
 from softfab.schedulelib import ScheduleManager, ScheduleRepeat
 from softfab.scheduleview import getScheduleStatus
@@ -32,7 +33,7 @@ def sharedConfigFactory(configId):
     """
     return lambda: {'configId': configId}
 
-class Simulator:
+class Simulator(RecordObserver):
     """Runs a simulation of schedules in action.
 
     You should organise your test code like this:
@@ -644,3 +645,61 @@ def testScheduleTaggedContinuousDelay(sim):
         sim.wait(sim.duration)
         sim.expectJobDone()
         sim.wait(sim.continuousDelay - sim.duration * 2)
+
+class RecordingReactor:
+    """Replacement for Twisted's reactor that records delayed calls,
+    so the test can decide when to perform them.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def callLater(self, delay, func, *args, **kw):
+        self.calls.append((func, args, kw))
+
+def testScheduleTriggerChunked(databases):
+    """Test that a burst of due schedules is spread over reactor turns."""
+
+    setTimeFunc(lambda: 6000)
+    class CustomGenerator(DataGenerator):
+        numTasks = 1
+        numInputs = [ 0 ]
+        numOutputs = [ 0 ]
+    gen = CustomGenerator(databases)
+    gen.createDefinitions()
+    configId = gen.createConfiguration().getId()
+    scheduleDB = databases.scheduleDB
+    numSchedules = 3
+    for index in range(numSchedules):
+        scheduleDB.add(scheduleDB.create(
+            f'sched{index}', False, 5940, ScheduleRepeat.ONCE, 'test_user',
+            '', {'configId': configId}
+            ))
+
+    reactor = RecordingReactor()
+    manager = ScheduleManager(databases.configDB, databases.jobDB,
+                              scheduleDB, reactor)
+    # Return control to the reactor after every schedule.
+    manager.timeBudget = 0
+    reactor.calls.clear()
+    manager.trigger()
+
+    for turn in range(1, numSchedules + 1):
+        assert len(databases.jobDB) == turn
+        continuations = [
+            call for call in reactor.calls if call[0].__name__ == 'runCoroutine'
+            ]
+        reactor.calls.clear()
+        if turn < numSchedules:
+            assert len(continuations) == 1
+            assert manager.stats.bursts == 0
+        else:
+            assert continuations == []
+        for func, args, kw in continuations:
+            func(*args, **kw)
+
+    assert all(schedule.isDone() for schedule in scheduleDB)
+    stats = manager.stats
+    assert stats.bursts == 1
+    assert stats.triggered == numSchedules
+    assert stats.lastTurns == numSchedules
+    assert 0 < stats.lastBusy <= stats.lastDuration <= stats.maxDuration
@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the tag index that is kept for tagged records."""
+
+from softfab.selectlib import ObservingTagCache
+
+from datageneratorlib import DataGenerator
+
+
+def testTagCacheIndex(databases):
+    """Test that the tag cache follows records being added, updated and
+    removed.
+    """
+    configDB = databases.configDB
+    tagCache = ObservingTagCache(configDB, lambda: ('sf.test',))
+    gen = DataGenerator(databases)
+    configs = [
+        gen.createConfiguration(name=f'config{index}')
+        for index in range(3)
+        ]
+    configIds = [config.getId() for config in configs]
+    assert tagCache.getRecordIds('sf.test', 'a') == set()
+    assert list(tagCache.getValues('sf.test')) == []
+
+    # Tagging records.
+    for config, values in zip(configs, (('a',), ('a', 'b'), ('b',))):
+        config.tags.setTag('sf.test', values)
+        configDB.update(config)
+    assert tagCache.getRecordIds('sf.test', 'a') == set(configIds[:2])
+    assert tagCache.getRecordIds('sf.test', 'b') == set(configIds[1:])
+    assert sorted(tagCache.getValues('sf.test')) == ['a', 'b']
+    assert tagCache.hasValue('sf.test', 'b')
+    assert not tagCache.hasValue('sf.test', 'c')
+    assert set(configDB.iterConfigsByTag('sf.test', 'a')) \
+            == set(configs[:2])
+
+    # Changing tags.
+    configs[1].tags.setTag('sf.test', ('c',))
+    configDB.update(configs[1])
+    assert tagCache.getRecordIds('sf.test', 'a') == {configIds[0]}
+    assert tagCache.getRecordIds('sf.test', 'b') == {configIds[2]}
+    assert tagCache.getRecordIds('sf.test', 'c') == {configIds[1]}
+
+    # Removing records.
+    configDB.remove(configs[0])
+    assert tagCache.getRecordIds('sf.test', 'a') == set()
+    assert not tagCache.hasValue('sf.test', 'a')
+    assert sorted(tagCache.getValues('sf.test')) == ['b', 'c']
+
+    # A full refresh rebuilds the same index.
+    tagCache._refreshCache()
+    assert tagCache.getRecordIds('sf.test', 'b') == {configIds[2]}
+    assert tagCache.getRecordIds('sf.test', 'c') == {configIds[1]}
+    assert sorted(tagCache.getValues('sf.test')) == ['b', 'c']
@@ -1,9 +1,11 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+from random import Random
+
 from pytest import fixture
 
 from softfab.databaselib import Database, DatabaseElem
-from softfab.sortedqueue import SortedQueue
+from softfab.sortedqueue import SortedQueue, SortedRecords
 from softfab.xmlgen import xml
 
 
@@ -41,16 +43,20 @@ class DB(Database):
         super().__init__(baseDir, RecordFactory())
         self.seqID = 0
 
-    def addRecord(self, value):
+    def newRecord(self, value):
         record = Record({
             'id': '%08d' % self.seqID,
             'value': value,
             'flag': True
             })
-        self.add(record)
         self.seqID += 1
         return record
 
+    def addRecord(self, value):
+        record = self.newRecord(value)
+        self.add(record)
+        return record
+
 @fixture
 def db(tmp_path):
     db = DB(tmp_path)
@@ -63,8 +69,12 @@ class Observer:
         self.addedRecords = []
         self.removedRecords = []
         self.updatedRecords = []
+        self.batches = 0
     def added(self, record):
         self.addedRecords.append(record)
+    def addedMany(self, records):
+        self.addedRecords += records
+        self.batches += 1
     def removed(self, record):
         self.removedRecords.append(record)
     def updated(self, record):
@@ -130,6 +140,19 @@ def testZeroToHundredShuffle(db, queue):
     queue.checkRecords()
     queue.checkAddOnly()
 
+def testAddMany(db, queue):
+    "Check values added in batches, interleaving with existing values."
+    for value in range(0, 101, 3):
+        db.addRecord(value)
+    db.addMany([db.newRecord((value * 13) % 101) for value in range(101)])
+    db.addMany([db.newRecord(value) for value in (1, 3, 5)])
+    assert [record['value'] for record in queue] == sorted(
+        list(range(0, 101, 6)) + list(range(0, 101, 2))
+        )
+    queue.checkRecords()
+    queue.checkAddOnly()
+    assert queue.observer.batches == 1
+
 def testDuplicates(db, queue):
     "Check values from 0 to 9, inserted multiple times."
     for value in range(100):
@@ -205,3 +228,34 @@ def testUpdateFilter(db, queue):
     assert observer.addedRecords == added
     assert observer.removedRecords == removed
     assert observer.updatedRecords == []
+
+def testSortedRecordsChunks(monkeypatch):
+    "Check inserting and removing when records are spread over many chunks."
+    monkeypatch.setattr(SortedRecords, 'chunkSize', 4)
+    rnd = Random(1234)
+    db = DB('/nonexisting')
+    records = [db.newRecord(value) for value in range(200)]
+    keyFunc = lambda record: (record['value'], record.getId())
+    sortedRecords = SortedRecords(records[:50], keyFunc)
+    inserted = records[50:]
+    rnd.shuffle(inserted)
+    for record in inserted:
+        sortedRecords.insert(record)
+    assert list(sortedRecords) == records
+    assert len(sortedRecords) == 200
+    assert sortedRecords[0] is records[0]
+    assert sortedRecords[123] is records[123]
+    assert sortedRecords[-1] is records[-1]
+
+    removed = rnd.sample(records, 150)
+    for record in removed:
+        assert record in sortedRecords
+        assert sortedRecords.remove(record)
+        assert record not in sortedRecords
+        assert not sortedRecords.remove(record)
+    remaining = [record for record in records if record not in removed]
+    assert list(sortedRecords) == remaining
+    assert len(sortedRecords) == 50
+
+    sortedRecords.insertMany(removed)
+    assert list(sortedRecords) == records
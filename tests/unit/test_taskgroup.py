@@ -0,0 +1,155 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the computation of task sequences from the dependency graph."""
+
+from random import Random
+
+from softfab.taskgroup import PriorityMixin, TaskSet
+
+
+class Product:
+    def __init__(self, combined=False, local=False):
+        self.combined = combined
+        self.local = local
+    def isCombined(self):
+        return self.combined
+    def isLocal(self):
+        return self.local
+    def getLocalAt(self):
+        return None
+
+class Task(PriorityMixin):
+    def __init__(self, name, inputs=(), outputs=(), priority=0):
+        self.name = name
+        self.inputs = frozenset(inputs)
+        self.outputs = frozenset(outputs)
+        self.priority = priority
+    def __repr__(self):
+        return f'Task({self.name})'
+    def getName(self):
+        return self.name
+    def getPriority(self):
+        return self.priority
+    def getInputs(self):
+        return self.inputs
+    def getOutputs(self):
+        return self.outputs
+    def getRunners(self):
+        return frozenset()
+
+class Tasks(TaskSet):
+    def __init__(self, tasks, products={}):
+        super().__init__()
+        for task in tasks:
+            self._tasks[task.getName()] = task
+        self.products = products
+    def getProductDef(self, name):
+        return self.products.get(name) or Product()
+    def getProductLocation(self, name):
+        return None
+    def getRunners(self):
+        return frozenset()
+
+def names(sequence):
+    return [task.getName() for task in sequence]
+
+def checkSequence(taskSet):
+    """Checks that every task in the sequence runs after the producers
+    of its inputs.
+    """
+    sequence = taskSet.getTaskSequence()
+    assert sorted(names(sequence)) == sorted(taskSet.iterTaskNames())
+    available = set(taskSet.getInputSet())
+    for task in sequence:
+        assert task.getInputs() <= available, task
+        available |= task.getOutputs()
+
+def testTaskSequenceOrder():
+    """Test that ready tasks are ordered by priority and name."""
+    taskSet = Tasks([
+        Task('d', inputs=['x']),
+        Task('c', outputs=['x'], priority=2),
+        Task('b', priority=1),
+        Task('a', inputs=['in'], priority=3),
+        ])
+    assert names(taskSet.getTaskSequence()) == ['b', 'c', 'd', 'a']
+
+def testTaskSequenceCombined():
+    """Test that a combined product is available only after all of its
+    producers have run.
+    """
+    taskSet = Tasks([
+        Task('p1', outputs=['x']),
+        Task('p2', inputs=['y'], outputs=['x'], priority=5),
+        Task('p3', outputs=['y'], priority=9),
+        Task('c', inputs=['x']),
+        ], {'x': Product(combined=True)})
+    assert names(taskSet.getTaskSequence()) == ['p1', 'p3', 'p2', 'c']
+
+def testTaskSequenceLocalGroup():
+    """Test that tasks sharing a local product are sequenced as a group."""
+    taskSet = Tasks([
+        Task('a', outputs=['loc']),
+        Task('b', inputs=['loc'], outputs=['out']),
+        Task('c', inputs=['out']),
+        Task('d', priority=1),
+        ], {'loc': Product(local=True)})
+    groupNames = names(taskSet.getTaskGroupSequence())
+    assert groupNames == ['a/', 'c', 'd']
+    assert names(taskSet.getTaskSequence()) == ['a', 'b', 'c', 'd']
+
+def testTaskSequenceUnreachable():
+    """Test that tasks with inputs that can never become available are
+    placed at the end.
+    """
+    taskSet = Tasks([
+        Task('a', inputs=['x'], outputs=['y']),
+        Task('b', inputs=['y'], outputs=['x']),
+        Task('c'),
+        ])
+    assert names(taskSet.getTaskSequence()) == ['c', 'a', 'b']
+
+def testTaskProducersConsumers():
+    """Test producer and consumer lookups."""
+    taskSet = Tasks([
+        Task('a', outputs=['x']),
+        Task('b', inputs=['x'], outputs=['x']),
+        Task('c', inputs=['x']),
+        ])
+    assert names(taskSet.getProducers('x')) == ['a', 'b']
+    assert names(taskSet.getConsumers('x')) == ['b', 'c']
+    assert names(taskSet.getProducers('nosuchproduct')) == []
+
+def createLargeTaskSet(numTasks, seed=1234):
+    """Creates a task set resembling a generated test matrix: layers of
+    tasks in which every task consumes a few products from earlier layers.
+    Some products are combined and some are local.
+    """
+    rnd = Random(seed)
+    tasks = []
+    products = {}
+    produced = []
+    for index in range(numTasks):
+        name = f'task{index:05d}'
+        if rnd.random() < 0.1 and produced:
+            # Add a producer to an existing product, making it combined.
+            # Only consume older products, to keep the graph acyclic.
+            outputIndex = rnd.randrange(len(produced))
+            output = produced[outputIndex]
+            products[output] = Product(combined=True)
+            available = produced[:outputIndex]
+        else:
+            output = f'prod{index:05d}'
+            if rnd.random() < 0.01:
+                products[output] = Product(local=True)
+            available = produced[:]
+            produced.append(output)
+        inputs = rnd.sample(available, min(len(available), rnd.randint(0, 3)))
+        tasks.append(Task(name, inputs, [output], rnd.randint(0, 5)))
+    rnd.shuffle(tasks)
+    return Tasks(tasks, products)
+
+def testTaskSequenceLarge():
+    """Test the sequence of a job with thousands of tasks."""
+    taskSet = createLargeTaskSet(5000)
+    checkSequence(taskSet)
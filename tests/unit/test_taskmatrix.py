@@ -0,0 +1,101 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the task statistics that are kept for the task matrix."""
+
+from softfab.TaskMatrixCommon import WeeklyTaskStats, decidedResults
+from softfab.resultcode import ResultCode
+from softfab.taskview import getTaskStatus
+from softfab.timelib import secondsPerDay, setTime, weekRange
+
+from datageneratorlib import DataGenerator
+
+
+def summarize(weekData):
+    return [
+        {
+            name: (dict(stats.statusCounts), stats.latestResult)
+            for name, stats in taskDict.items()
+            }
+        for taskDict in weekData
+        ]
+
+def computeWeekData(jobDB, beginWeek, endWeek, configFilter):
+    """Computes the summary of a week from scratch."""
+    weekData = [{} for _ in range(7)]
+    for job in jobDB:
+        createTime = job.getCreateTime()
+        if not beginWeek <= createTime < endWeek:
+            continue
+        if configFilter and job.configId != configFilter:
+            continue
+        taskDict = weekData[min((createTime - beginWeek) // secondsPerDay, 6)]
+        for task in job.getTasks():
+            counts, latest = taskDict.get(task.getName(), ({}, None))
+            status = getTaskStatus(task)
+            counts[status] = counts.get(status, 0) + 1
+            if task.result in decidedResults:
+                if latest is None or task.startTime > latest[0]:
+                    latest = task.startTime, task.result
+            taskDict[task.getName()] = counts, latest
+    return [
+        {
+            name: (counts, None if latest is None else latest[1])
+            for name, (counts, latest) in taskDict.items()
+            }
+        for taskDict in weekData
+        ]
+
+def testWeeklyTaskStats(databases):
+    """Test that the statistics follow jobs being added and finished."""
+    jobDB = databases.jobDB
+    gen = DataGenerator(databases)
+    fw = gen.createFramework('fw')
+    taskNames = [gen.createTask(f'task{index}', fw) for index in range(2)]
+    runner = databases.resourceDB[
+        gen.createTaskRunner(name='tr', capabilities=['fw'])
+        ]
+    configA = gen.createConfiguration(name='configA', tasks=taskNames)
+    configB = gen.createConfiguration(name='configB', tasks=taskNames)
+    weeklyTaskStats = WeeklyTaskStats(jobDB)
+
+    beginWeek, endWeek = weekRange(2020, 10)
+    def createJob(config, day):
+        setTime(beginWeek + day * secondsPerDay + 3600)
+        job, = config.createJobs(gen.owner)
+        jobDB.add(job)
+        return job
+
+    def runTasks(job, result):
+        for _ in taskNames:
+            task = job.assignTask(runner)
+            assert task is not None
+            job.taskDone(task.getName(), result, 'summary text', (), {})
+
+    def check():
+        for configFilter in ('', 'configA', 'configB'):
+            weekData = weeklyTaskStats.getWeekData(
+                beginWeek, endWeek, configFilter
+                )
+            assert summarize(weekData) == computeWeekData(
+                jobDB, beginWeek, endWeek, configFilter
+                ), configFilter
+
+    jobA1 = createJob(configA, 0)
+    jobB1 = createJob(configB, 0)
+    createJob(configA, 3)
+    createJob(configA, 7)
+    runTasks(jobA1, ResultCode.OK)
+    check()
+
+    # Jobs finishing after the statistics were computed.
+    runTasks(jobB1, ResultCode.ERROR)
+    check()
+
+    # Jobs added after the statistics were computed.
+    runTasks(createJob(configB, 3), ResultCode.WARNING)
+    createJob(configA, 6)
+    check()
+    stats = weeklyTaskStats.getWeekData(beginWeek, endWeek, '')[3]['task0']
+    assert stats.count == 2
+    assert stats.statusCounts == {'idle': 1, 'warning': 1}
+    assert stats.latestResult is ResultCode.WARNING
@@ -0,0 +1,55 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the index of task runs per Task Runner."""
+
+from softfab.pages.TaskRunnerHistory import RecentTasks
+from softfab.taskrunlib import TaskRunsByRunner
+from softfab.timelib import setTime
+
+from datageneratorlib import DataGenerator
+
+
+def testTaskRunsByRunner(databases):
+    """Test that task runs are indexed by Task Runner when they start."""
+    gen = DataGenerator(databases)
+    fw = gen.createFramework('fw')
+    taskNames = [gen.createTask(f'task{index}', fw) for index in range(4)]
+    runners = [
+        gen.createTaskRunner(name=name, capabilities=['fw'])
+        for name in ('tr1', 'tr2')
+        ]
+    config = gen.createConfiguration(tasks=taskNames)
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+    index = TaskRunsByRunner(databases.taskRunDB)
+    assert list(index.getRunIds('tr1')) == []
+
+    started = {runnerId: [] for runnerId in runners}
+    for startTime, runnerId in enumerate(('tr1', 'tr2', 'tr1', 'tr1'), 1000):
+        setTime(startTime)
+        run = job.assignTask(databases.resourceDB[runnerId])
+        assert run is not None
+        started[runnerId].append(run.getName())
+
+    def check(index):
+        for runnerId in runners:
+            runIds = index.getRunIds(runnerId)
+            taskRuns = [databases.taskRunDB[runId] for runId in runIds]
+            assert [run.getName() for run in taskRuns] == started[runnerId]
+            assert all(run.getTaskRunnerId() == runnerId for run in taskRuns)
+        assert list(index.getRunIds('nosuchrunner')) == []
+
+    check(index)
+    databases.reload()
+    check(TaskRunsByRunner(databases.taskRunDB))
+
+    # Most recently started tasks come first.
+    job = databases.jobDB[job.getId()]
+    tasks = RecentTasks(index.getRunIds('tr1'), databases.taskRunDB)
+    expected = [job.getTask(name) for name in reversed(started['tr1'])]
+    assert len(tasks) == 3
+    assert [tasks[i].getName() for i in range(3)] \
+            == [task.getName() for task in expected]
+    assert [task.getName() for task in tasks[1:]] \
+            == [task.getName() for task in expected[1:]]
+    assert tasks[-1].getName() == expected[-1].getName()
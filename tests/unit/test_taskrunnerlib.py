@@ -5,12 +5,17 @@ from io import StringIO
 from pytest import mark
 import attr
 
-from softfab.resourcelib import RequestFactory, TaskRunner, TaskRunnerData
+from softfab.connection import ConnectionStatus
+from softfab.resourcelib import (
+    RequestFactory, TaskRunner, TaskRunnerData, TaskRunnerMonitor,
+    syncStateDigest
+)
 from softfab.resourceview import getResourceStatus
 from softfab.timelib import setTime
 from softfab.xmlbind import parse
 
 from conftest import Databases
+from datageneratorlib import DataGenerator
 
 
 dataRun = parse(RequestFactory(), StringIO(
@@ -189,3 +194,89 @@ def testTaskRunnerToXML(databases, data):
     taskRunnerFactory = TaskRunnerFactory(databases)
     record2 = parse(taskRunnerFactory, StringIO(record1.toXML().flattenXML()))
     assert record1._properties == record2._properties
+
+def testTaskRunnerMonitorLost(databases):
+    """Test that a sweep marks Task Runners that stopped syncing as lost."""
+
+    setTime(1000)
+    resourceFactory = databases.resourceDB.factory
+    record = resourceFactory.newTaskRunner('runner1', '', set())
+    databases.resourceDB.add(record)
+    record.sync(databases.jobDB, dataNoRun)
+    record.getLostTimeout = lambda: 35
+    monitor = TaskRunnerMonitor(databases.resourceDB, None)
+
+    setTime(1035)
+    monitor.sweep()
+    assert record.getConnectionStatus() is not ConnectionStatus.LOST
+
+    setTime(1036)
+    monitor.sweep()
+    assert record.getConnectionStatus() is ConnectionStatus.LOST
+
+def testTaskRunnerMonitorTimeout(databases):
+    """Test that a sweep marks runs that exceeded their timeout
+    to be aborted.
+    """
+
+    setTime(1000)
+    gen = DataGenerator(databases)
+    fwName = gen.createFramework('testfw1')
+    taskName = gen.createTask('task1', fwName)
+    databases.taskDefDB[taskName].addParameter('sf.timeout', '2')
+    runner = databases.resourceDB[gen.createTaskRunner(capabilities=[fwName])]
+    config = gen.createConfiguration()
+    job, = config.createJobs(gen.owner)
+    databases.jobDB.add(job)
+    run = job.assignTask(runner)
+    assert run is not None
+    monitor = TaskRunnerMonitor(databases.resourceDB, None)
+    dataJobRun = parse(RequestFactory(), StringIO(
+        '<request runnerVersion="2.0.0" host="factorypc">'
+            f'<run jobId="{job.getId()}" taskId="{taskName}" runId="0"/>'
+        '</request>'
+        ))
+
+    setTime(1100)
+    assert not runner.sync(databases.jobDB, dataJobRun)
+    monitor.sweep()
+    assert 'abort' not in run._properties
+
+    setTime(1120)
+    monitor.sweep()
+    assert run.isToBeAborted()
+    assert run._properties['summary'] == 'aborted after timeout of 2 minutes'
+    assert runner.sync(databases.jobDB, dataJobRun)
+
+def testTaskRunnerSyncDigest(databases):
+    """Test syncing using a digest of the Task Runner's static state."""
+
+    state = {'runnerVersion': '3.0.0', 'host': 'factorypc'}
+    digest = syncStateDigest(state)
+    resourceFactory = databases.resourceDB.factory
+    record = resourceFactory.newTaskRunner('runner1', '', set())
+    databases.resourceDB.add(record)
+
+    # The state is not known until it has been reported once.
+    assert record.syncDigest(databases.jobDB, digest, None) is None
+    assert record.sync(databases.jobDB, TaskRunnerData(state)) is False
+    assert record['host'] == 'factorypc'
+
+    # Known digest.
+    assert record.syncDigest(databases.jobDB, digest, None) is False
+    assert record.getConnectionStatus() is ConnectionStatus.CONNECTED
+
+    # Changed state.
+    state2 = dict(state, host='otherpc')
+    assert record.syncDigest(databases.jobDB,
+                             syncStateDigest(state2), None) is None
+
+    # The digest survives reloading the database.
+    databases.reload()
+    record = databases.resourceDB[record.getId()]
+    assert record.syncDigest(databases.jobDB, digest, None) is False
+
+    # Reporting a run that does not exist is resolved by aborting it.
+    run = {'jobId': '2004-05-06_12-34_567890', 'taskId': 'TC-6.1',
+           'runId': '0'}
+    assert record.syncDigest(databases.jobDB, digest, run) is True
@@ -179,3 +179,41 @@ def testHeapRemove(typeParams):
                 heap._check()
         assert getItems(heap) == initial
         checkEmpty(heap)
+
+class Item:
+    def __init__(self, x):
+        self.x = x
+
+@mark.parametrize('typeParams', typeParamsOptions)
+def testHeapRemoveAfterPop(typeParams):
+    """Test removing elements after the smallest element was popped."""
+    heap = typeParams.createHeap()
+    items = [typeParams.wrapItem(x) for x in range(10)]
+    for item in items:
+        heap.add(item)
+    assert heap.pop() == items[0]
+    heap.remove(items[5])
+    heap._check()
+    heap.remove(items[1])
+    heap._check()
+    with raises(ValueError):
+        heap.remove(items[0])
+    assert getItems(heap) == items[2:5] + items[6:]
+    checkEmpty(heap)
+
+def testHeapUpdate():
+    """Test updating the position of elements after their key changed."""
+    heap = Heap(key=lambda item: item.x)
+    items = [Item(randint(0, 1 << 30)) for _ in range(simParams.arraySize)]
+    for item in items:
+        heap.add(item)
+    for _ in range(simParams.arrayLoop):
+        for item in items[::3]:
+            item.x = randint(0, 1 << 30)
+            heap.update(item)
+            heap._check()
+    srt = sorted(items, key=lambda item: item.x)
+    assert [item.x for item in getItems(heap)] == [item.x for item in srt]
+    checkEmpty(heap)
+    with raises(ValueError):
+        heap.update(items[0])
@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Test the caching of presented table rows."""
+
+from softfab.webgui import CachedRow, FragmentCache, Table, cell, row
+
+
+def testFragmentCacheLRU():
+    """Test that the least recently used fragments are evicted."""
+    cache = FragmentCache(2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C')
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert cache.hits == 3
+    assert cache.misses == 1
+    assert cache.evictions == 1
+    assert cache.hitRate == 0.75
+
+class RowsTable(Table):
+    columns = 'Name', 'Value'
+
+    def __init__(self, cache, rows):
+        super().__init__()
+        self.cache = cache
+        self.rows = rows
+        self.presented = []
+
+    def presentRow(self, name, value):
+        self.presented.append(name)
+        return row(class_=name)[name, value]
+
+    def iterRows(self, **kwargs):
+        for name, value in self.rows:
+            yield CachedRow(lambda name=name, value=value:
+                                self.presentRow(name, value),
+                            self.cache, name)
+
+def testCachedRows():
+    """Test that cached rows are only presented once and that the cached
+    presentation is identical to the original.
+    """
+    cache = FragmentCache(10)
+    table = RowsTable(cache, [('a', '1'), ('b', '2')])
+    first = table.present().flattenXML()
+    assert table.presented == ['a', 'b']
+    second = table.present().flattenXML()
+    assert second == first
+    assert table.presented == ['a', 'b']
+    assert '<tr class="a"><td>a</td><td>1</td></tr>' in second
+    assert cache.hits == 2
+
+def testCachedRowSpan():
+    """Test that rows involved in a row span are not cached."""
+    cache = FragmentCache(10)
+    table = RowsTable(cache, [('a', '1'), ('b', '2'), ('c', '3')])
+    table.presentRow = lambda name, value: (
+        row[name, cell(rowspan=2)[value]] if name == 'a' else
+        row[name] if name == 'b' else
+        row[name, value]
+        )
+    table.present()
+    assert len(cache) == 1
+    assert cache.get('c') is not None
@@ -4,7 +4,9 @@
 
 from pytest import raises
 
-from softfab.xmlgen import parseHTML, xhtml
+from softfab.xmlgen import parseHTML, preflatten, xhtml
+
+from pagebenchlib import benchmarkPages, presentPage, renderPage
 
 
 # Test text inside the <script> XHTML element:
@@ -203,3 +205,46 @@ def testIgnoreXMLSyntax():
         'A processing LAZY FOX instruction.'
         '</p>'
         )
+
+# Test reuse of flattened XML:
+
+def testPreflattenNamespace():
+    """Check that a preflattened tree is serialized according to
+    the namespace of its parent.
+    """
+    row = preflatten(xhtml.tr[xhtml.td[ 'a < b' ]])
+    assert preflatten(row) is row
+    standalone = '<tr xmlns="http://www.w3.org/1999/xhtml"><td>a &lt; b</td></tr>'
+    assert row.flattenXML() == standalone
+    nested = '<tbody xmlns="http://www.w3.org/1999/xhtml">' \
+             '<tr><td>a &lt; b</td></tr><tr><td>a &lt; b</td></tr></tbody>'
+    assert xhtml.tbody[row, row].flattenXML() == nested
+    assert row.flattenXML() == standalone
+
+
+# Trees resembling the pages of the Control Center:
+
+def testBenchmarkPages():
+    """Check that the benchmark pages flatten to the expected XHTML."""
+    report = renderPage('ReportIndex')
+    assert report.startswith(
+        '<html xmlns="http://www.w3.org/1999/xhtml"><body><div>'
+        '<table><thead><tr><th scope="col">Create Time</th>'
+        )
+    assert report.count('<tr class="ok">') == 66
+    assert 'build &amp; test "7"' in report
+    assert '<img src="styles/ScheduleSmall.png" width="16" height="16"/>' \
+            in report
+    task = renderPage('Task')
+    assert '<td>value &lt;3&gt; &amp; more</td>' in task
+    execute = renderPage('Execute')
+    assert execute.count(' selected=""') == 50
+    assert execute.count(' checked=""') == 25
+
+def testFlattenFragments():
+    """Check that flattening produces the same output as concatenating
+    the fragments of the tree.
+    """
+    for name in benchmarkPages:
+        page = presentPage(name)
+        assert page.flattenXML() == ''.join(page._toFragments(None))